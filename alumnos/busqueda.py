@@ -0,0 +1,84 @@
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from personal.models import Personal, normalizarBusqueda
+from .models import Alumno
+
+import re
+
+# Candidatos por consulta que se ordenan por relevancia, el resultado se corta después
+MAX_CANDIDATOS = 200
+# innodb_ft_min_token_size, los términos más cortos no están en el índice FULLTEXT
+MIN_TERMINO_FULLTEXT = 3
+
+# Inicio de un número de control (YYSS..., CYYSS... o MYYSS...) o de una CURP (4 letras y la fecha)
+PATRON_NO_CONTROL = re.compile(r'^[CM]?\d{2,}$')
+PATRON_CURP = re.compile(r'^[A-Z]{4}\d')
+
+def buscarPersonal(terminos):
+    """
+    CURPs cuyo nombre tiene todos los términos como inicio de alguna palabra. En MySQL
+    se usa el índice FULLTEXT de clave_busqueda y se ordena por su relevancia; en otras
+    bases (SQLite en pruebas) se usa LIKE sobre la llave normalizada.
+    """
+    consulta = Personal.objects.all()
+    if connections[consulta.db].vendor == 'mysql':
+        largos = [termino for termino in terminos if len(termino) >= MIN_TERMINO_FULLTEXT]
+        if largos:
+            match = 'MATCH(clave_busqueda) AGAINST (%s IN BOOLEAN MODE)'
+            expresion = ' '.join(f'+{termino}*' for termino in largos)
+            consulta = consulta.filter(RawSQL(match, [expresion], output_field=BooleanField()))
+            consulta = consulta.annotate(relevancia=RawSQL(match, [expresion], output_field=FloatField())).order_by('-relevancia')
+            terminos = [termino for termino in terminos if len(termino) < MIN_TERMINO_FULLTEXT]
+    else:
+        consulta = consulta.order_by('clave_busqueda')
+    for termino in terminos:
+        # Inicio de la llave (usa el índice) o inicio de cualquier otra palabra
+        consulta = consulta.filter(Q(clave_busqueda__startswith=termino) | Q(clave_busqueda__contains=f' {termino}'))
+    return list(consulta.values_list('curp', flat=True)[:MAX_CANDIDATOS])
+
+def puntaje(alumno, terminos):
+    """Coincidencias exactas de número de control o CURP, luego palabras completas y al final prefijos"""
+    palabras = alumno.curp.clave_busqueda.split()
+    total = 0
+    for termino in terminos:
+        if termino in (alumno.no_control, alumno.curp_id):
+            total += 100
+        elif alumno.no_control.startswith(termino) or alumno.curp_id.startswith(termino):
+            total += 50
+        elif termino in palabras:
+            total += 10
+        elif any(palabra.startswith(termino) for palabra in palabras):
+            total += 5
+    return total
+
+def buscarAlumnos(texto, limite=20):
+    """
+    Alumnos cuyo número de control o CURP empieza con alguno de los términos, o cuyo
+    nombre contiene todos los demás, ordenados por puntaje. Cada criterio es una
+    consulta sobre un índice: llave primaria, llave foránea curp y clave_busqueda.
+    """
+    terminos = normalizarBusqueda(texto).split()
+    claves = [termino for termino in terminos if PATRON_NO_CONTROL.match(termino) or PATRON_CURP.match(termino)]
+    nombres = [termino for termino in terminos if termino not in claves]
+
+    base = Alumno.objects.select_related('curp', 'plan')
+    consultas = []
+    for termino in claves:
+        if PATRON_NO_CONTROL.match(termino):
+            consultas.append(base.filter(no_control__startswith=termino))
+        else:
+            consultas.append(base.filter(curp__curp__startswith=termino))
+    if nombres:
+        curps = buscarPersonal(nombres)
+        if curps:
+            consultas.append(base.filter(curp__in=curps))
+
+    candidatos = {}
+    for consulta in consultas:
+        for alumno in consulta[:MAX_CANDIDATOS]:
+            candidatos.setdefault(alumno.pk, alumno)
+    for alumno in candidatos.values():
+        alumno.puntaje = puntaje(alumno, terminos)
+    return sorted(candidatos.values(), key=lambda alumno: (-alumno.puntaje, alumno.curp.clave_busqueda, alumno.no_control))[:limite]
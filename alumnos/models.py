@@ -1,4 +1,5 @@
 from django.db import models
+from registros.versiones import VersionadoQuerySet
 from django.core.exceptions import ValidationError
 import re
 
@@ -28,6 +29,7 @@ class Alumno(models.Model):
     no_control = models.CharField(primary_key=True, max_length=9, null=False, blank=False, verbose_name='número de control', validators=[validate_nocontrol])
     curp = models.ForeignKey('personal.Personal', on_delete=models.PROTECT, verbose_name='curp')
     plan = models.ForeignKey('planes.Plan', on_delete=models.PROTECT, verbose_name='plan de estudios')
+    objects = models.Manager.from_queryset(VersionadoQuerySet)()
 
     REQUIRED_FIELDS = [
         'no_control',
@@ -1,7 +1,6 @@
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 
-from registros.models import Ingreso, Egreso, Titulacion, LiberacionIngles
 from registros.periodos import getPeriodoActual, calcularPeriodos
 from .models import Alumno
 
@@ -16,7 +15,33 @@ class AlumnoSerializer(serializers.ModelSerializer):
             )
         ]
 
+class AlumnoBusquedaSerializer(serializers.ModelSerializer):
+    nombre = serializers.CharField(source='curp.nombre')
+    paterno = serializers.CharField(source='curp.paterno')
+    materno = serializers.CharField(source='curp.materno')
+    carrera = serializers.CharField(source='plan.carrera_id')
+    puntaje = serializers.IntegerField()
+
+    class Meta:
+        model = Alumno
+        fields = ['no_control', 'curp', 'nombre', 'paterno', 'materno', 'plan', 'carrera', 'puntaje']
+
+# Carga en bloque los datos que usa HistorialSerializer: una consulta por tipo de
+# registro para toda la página en lugar de varias por alumno
+def prefetchHistorial(queryset):
+    return queryset.select_related('curp', 'plan').prefetch_related(
+        'curp__discapacidades', 'ingreso_set', 'egreso_set', 'titulacion_set', 'liberacioningles_set'
+    )
+
+# Representa un registro con las mismas llaves que .values()
+def valoresRegistro(registro):
+    return {campo.attname: getattr(registro, campo.attname) for campo in registro._meta.concrete_fields}
+
 class HistorialSerializer(serializers.ModelSerializer):
+    """
+    Historial de registros del alumno. Los registros se leen de los related managers,
+    por lo que las vistas deben usar prefetchHistorial() para evitar consultas por alumno.
+    """
     estatus = serializers.SerializerMethodField()
     registros = serializers.SerializerMethodField()
 
@@ -26,14 +51,12 @@ class HistorialSerializer(serializers.ModelSerializer):
         depth = 1
 
     def get_estatus(self, obj):
-        titulado = Titulacion.objects.filter(alumno=obj.pk).exists()
-        if titulado:
+        if obj.titulacion_set.all():
             return "Titulado"
-        egresado = Egreso.objects.filter(alumno=obj.pk).exists()
-        if egresado:
+        if obj.egreso_set.all():
             return "Egresado"
         periodo_actual = getPeriodoActual()
-        inscrito = Ingreso.objects.filter(alumno=obj.pk, periodo=periodo_actual).exists()
+        inscrito = any(ingreso.periodo == periodo_actual for ingreso in obj.ingreso_set.all())
         if inscrito:
             return "Inscrito"
         else:
@@ -43,21 +66,13 @@ class HistorialSerializer(serializers.ModelSerializer):
         request = self.context['request']
         semestres = request.query_params.get('semestres')
         cohorte = request.query_params.get('cohorte')
-        periodos = []
         registros = {}
+        ingresos = obj.ingreso_set.all()
         if semestres is not None and cohorte is not None:
-            periodos = calcularPeriodos(cohorte, int(semestres))
-            ingresos = Ingreso.objects.filter(alumno=obj.pk, periodo__in=periodos).values()
-            registros["ingresos"] = ingresos
-        else:
-            ingresos = Ingreso.objects.filter(alumno=obj.pk).values()
-            registros["ingresos"] = ingresos
-        egreso = Egreso.objects.filter(alumno=obj.pk).values()
-        registros["egreso"] = egreso
-
-        titulacion = Titulacion.objects.filter(alumno=obj.pk).values()
-        registros["titulacion"] = titulacion
-
-        liberacion_ingles = LiberacionIngles.objects.filter(alumno=obj.pk).values()
-        registros["liberacion_ingles"] = liberacion_ingles
-        return registros
\ No newline at end of file
+            periodos = set(calcularPeriodos(cohorte, int(semestres)))
+            ingresos = [ingreso for ingreso in ingresos if ingreso.periodo in periodos]
+        registros["ingresos"] = [valoresRegistro(ingreso) for ingreso in ingresos]
+        registros["egreso"] = [valoresRegistro(egreso) for egreso in obj.egreso_set.all()]
+        registros["titulacion"] = [valoresRegistro(titulacion) for titulacion in obj.titulacion_set.all()]
+        registros["liberacion_ingles"] = [valoresRegistro(liberacion) for liberacion in obj.liberacioningles_set.all()]
+        return registros
@@ -1,3 +1,99 @@
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from carreras.models import Carrera
+from personal.models import Personal
+from planes.models import Plan
+from usuario.models import Usuario
+from .busqueda import buscarPersonal
+from .models import Alumno
+
+import datetime
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        carrera = Carrera.objects.create(clave='ISC', nombre='SISTEMAS')
+        plan = Plan.objects.create(clave='ISIC-2010', fecha_inicio=datetime.date(2010, 1, 1), carrera=carrera)
+        for numero in range(5):
+            curp = Personal.objects.create(
+                curp=f'GODE560101HDFRRN0{numero}', nombre='ANA', paterno='GOMEZ', fecha_nacimiento=datetime.date(1956, 1, 1)
+            )
+            Alumno.objects.create(no_control=f'2001000{5 - numero}', curp=curp, plan=plan)
+        usuario = Usuario.objects.create(username='consulta', first_name='A', paternal_surname='B', email='a@a.com')
+        self.client = APIClient()
+        self.client.force_authenticate(usuario)
+
+    def test_recorre_todas_las_paginas_en_orden(self):
+        respuesta = self.client.get('/alumnos/?limit=2')
+        self.assertEqual(respuesta.data['count'], 5)
+        self.assertIsNone(respuesta.data['previous'])
+        no_controls = []
+        while True:
+            no_controls += [alumno['no_control'] for alumno in respuesta.data['results']]
+            if respuesta.data['next'] is None:
+                break
+            respuesta = self.client.get(respuesta.data['next'])
+        self.assertEqual(no_controls, [f'2001000{numero}' for numero in range(1, 6)])
+
+    def test_sin_conteo(self):
+        respuesta = self.client.get('/alumnos/?limit=2&conteo=0')
+        self.assertIsNone(respuesta.data['count'])
+        self.assertEqual(len(respuesta.data['results']), 2)
+
+    def test_offset_usa_limit_offset(self):
+        respuesta = self.client.get('/alumnos/?limit=2&offset=3')
+        self.assertEqual(respuesta.data['count'], 5)
+        self.assertEqual([alumno['no_control'] for alumno in respuesta.data['results']], ['20010004', '20010005'])
+        self.assertIn('offset=1', respuesta.data['previous'])
+
+class AlumnoBusquedaTests(TestCase):
+    ALUMNOS = [
+        ('20010001', 'GODE560101HDFRRN01', 'José María', 'Peña', 'López'),
+        ('20010002', 'GODE560101HDFRRN02', 'JOSEFINA', 'PEREZ', None),
+        ('19010003', 'MAPA560101HDFRRN03', 'MARIO', 'ÁLVAREZ', 'PEÑA'),
+    ]
+
+    def setUp(self):
+        carrera = Carrera.objects.create(clave='ISC', nombre='SISTEMAS')
+        plan = Plan.objects.create(clave='ISIC-2010', fecha_inicio=datetime.date(2010, 1, 1), carrera=carrera)
+        for no_control, curp, nombre, paterno, materno in self.ALUMNOS:
+            curp = Personal.objects.create(
+                curp=curp, nombre=nombre, paterno=paterno, materno=materno, fecha_nacimiento=datetime.date(1956, 1, 1)
+            )
+            Alumno.objects.create(no_control=no_control, curp=curp, plan=plan)
+        usuario = Usuario.objects.create(username='consulta', first_name='A', paternal_surname='B', email='a@a.com')
+        self.client = APIClient()
+        self.client.force_authenticate(usuario)
+
+    def buscar(self, texto):
+        respuesta = self.client.get('/alumnos/buscar/', {'q': texto})
+        self.assertEqual(respuesta.status_code, 200, respuesta.data)
+        return [alumno['no_control'] for alumno in respuesta.data]
+
+    def test_sin_importar_acentos_ni_mayusculas(self):
+        for texto in ('josé maría', 'JOSE MARIA', 'Jose  Maria!', 'peña lopez'):
+            with self.subTest(texto):
+                self.assertEqual(self.buscar(texto), ['20010001'])
+        # Peña es apellido paterno de uno y materno de otro
+        self.assertEqual(self.buscar('pena'), ['20010001', '19010003'])
+
+    def test_prefijos_y_claves(self):
+        # Palabra completa antes que prefijo
+        self.assertEqual(self.buscar('jose'), ['20010001', '20010002'])
+        self.assertEqual(self.buscar('2001'), ['20010001', '20010002'])
+        self.assertEqual(self.buscar('mapa5601'), ['19010003'])
+        self.assertEqual(self.buscar('alvarez 1901'), ['19010003'])
+        # Todos los términos del nombre deben coincidir
+        self.assertEqual(self.buscar('perez jos'), ['20010002'])
+
+    def test_busqueda_invalida(self):
+        self.assertEqual(self.client.get('/alumnos/buscar/', {'q': 'é'}).status_code, 400)
+        self.assertEqual(self.client.get('/alumnos/buscar/', {'q': 'jose', 'limite': 'x'}).status_code, 400)
+        self.assertEqual(len(self.client.get('/alumnos/buscar/', {'q': 'jose', 'limite': 1}).data), 1)
+
+    def test_busqueda_sin_fulltext(self):
+        # Fuera de MySQL se busca con LIKE sobre la llave normalizada, ordenada por ella
+        self.assertEqual(buscarPersonal(['PE']), ['GODE560101HDFRRN01', 'GODE560101HDFRRN02', 'MAPA560101HDFRRN03'])
+        self.assertEqual(buscarPersonal(['JOSE', 'MA']), ['GODE560101HDFRRN01'])
+        # Solo inicios de palabra
+        self.assertEqual(buscarPersonal(['OSE']), [])
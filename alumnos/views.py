@@ -1,26 +1,61 @@
 from rest_framework.permissions import IsAuthenticated
-from rest_framework import generics
+from rest_framework import generics, views
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
 
 from backend.permissions import IsAdminUserOrReadOnly
-from .serializers import AlumnoSerializer, HistorialSerializer
+from backend.pagination import KeysetPagination
+from backend.filters import QueryParamFilter, SparseFieldsMixin
+from backend.bulk import BulkMixin
+from backend.routers import AnalyticsDatabaseMixin
+from .serializers import AlumnoSerializer, AlumnoBusquedaSerializer, HistorialSerializer, prefetchHistorial
+from .busqueda import buscarAlumnos
+from personal.models import normalizarBusqueda
 from carreras.models import Carrera
 from planes.models import Plan
 from .models import Alumno
 
 
-class AlumnoList(generics.ListCreateAPIView):
+class AlumnoList(SparseFieldsMixin, BulkMixin, generics.ListCreateAPIView):
     queryset = Alumno.objects.all()
     serializer_class = AlumnoSerializer
     permission_classes = [IsAuthenticated&IsAdminUserOrReadOnly]
+    pagination_class = KeysetPagination
+    filter_backends = [QueryParamFilter]
+    query_filters = {'carrera': 'plan__carrera', 'plan': 'plan', 'curp': 'curp'}
+
+    def prepare_instance(self, alumno):
+        # Lo mismo que Alumno.save(), que bulk_create no llama
+        alumno.no_control = alumno.no_control.upper()
 
 class AlumnoDetail(generics.RetrieveUpdateDestroyAPIView):
     queryset = Alumno.objects.all()
     serializer_class = AlumnoSerializer
     permission_classes = [IsAuthenticated&IsAdminUserOrReadOnly]
 
-class HistorialList(generics.ListAPIView):
+class AlumnoBusqueda(views.APIView):
+    """
+    Busca alumnos por nombre, apellidos, CURP o número de control sin importar
+    acentos ni mayúsculas: ?q=juan perez, ?q=2001 o ?q=GAPJ. Regresa los ?limite=
+    (20 por defecto, máximo 100) más relevantes.
+    """
+    permission_classes = [IsAuthenticated]
+    LIMITE_MAXIMO = 100
+
+    def get(self, request, format=None):
+        texto = request.query_params.get('q', '')
+        if len(normalizarBusqueda(texto).replace(' ', '')) < 2:
+            raise ValidationError({'q': 'La búsqueda necesita por lo menos 2 letras o números'})
+        try:
+            limite = min(max(int(request.query_params.get('limite', 20)), 1), self.LIMITE_MAXIMO)
+        except ValueError:
+            raise ValidationError({'limite': 'Debe ser un número'})
+        return Response(AlumnoBusquedaSerializer(buscarAlumnos(texto, limite), many=True).data)
+
+class HistorialList(AnalyticsDatabaseMixin, generics.ListAPIView):
     serializer_class = HistorialSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         queryset = Alumno.objects.all()
@@ -66,9 +101,9 @@ class HistorialList(generics.ListAPIView):
             queryset = queryset.filter(ingreso__periodo=cohorte_param, ingreso__tipo__in=tipos_ingresos)
         else:
             queryset = queryset.filter(ingreso__tipo__in=tipos_ingresos)
-        return queryset
+        return prefetchHistorial(queryset)
 
-class HistorialDetail(generics.RetrieveAPIView):
-    queryset = Alumno.objects.all()
+class HistorialDetail(AnalyticsDatabaseMixin, generics.RetrieveAPIView):
+    queryset = prefetchHistorial(Alumno.objects.all())
     serializer_class = HistorialSerializer
     permission_classes = [IsAuthenticated]
\ No newline at end of file
@@ -0,0 +1,87 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.authentication import SessionAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from backend.routers import default_reads
+from usuario.tokens import CLAIM_REFRESH_JTI
+
+REVOKED_CACHE_KEY = 'jwt_revocados'
+DELETED_CACHE_KEY = 'jwt_usuarios_eliminados'
+
+def revoked():
+    """
+    jtis of unexpired blacklisted refresh tokens and ids of inactive or deleted
+    users, cached for ANALITICA_REVOCADOS_TIMEOUT seconds
+    """
+    data = cache.get(REVOKED_CACHE_KEY)
+    if data is None:
+        with default_reads():
+            data = {
+                'jtis': frozenset(BlacklistedToken.objects.filter(
+                    token__expires_at__gt=timezone.now()
+                ).values_list('token__jti', flat=True)),
+                'usuarios': frozenset(
+                    str(pk) for pk in get_user_model().objects.filter(is_active=False).values_list('pk', flat=True)
+                ) | cache.get(DELETED_CACHE_KEY, frozenset()),
+            }
+        cache.set(REVOKED_CACHE_KEY, data, timeout=settings.ANALITICA_REVOCADOS_TIMEOUT)
+    return data
+
+def clear_revoked(sender, **kwargs):
+    # Connected in UsuarioConfig.ready() to blacklist and user changes
+    cache.delete(REVOKED_CACHE_KEY)
+
+def revoke_deleted_user(sender, instance, using=None, **kwargs):
+    """
+    post_delete receiver of the user model. A deleted user has no row left to
+    mark inactive, so its id is kept in its own cache entry for as long as the
+    access tokens issued to it stay valid
+    """
+    user_id = str(instance.pk)
+
+    def revoke():
+        deleted = cache.get(DELETED_CACHE_KEY, frozenset()) | {user_id}
+        cache.set(DELETED_CACHE_KEY, deleted, timeout=int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()))
+        cache.delete(REVOKED_CACHE_KEY)
+    transaction.on_commit(revoke, using=using)
+
+class AnaliticaJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication for the read-only analytics endpoints.
+
+    With ANALITICA_JWT_STATELESS the user is built from the token claims
+    (TokenUser) without reading the users table; the permitted carreras come
+    from the token too (see carreras.permisos.carrerasDelToken). Revocation is
+    checked against the cached set of blacklisted refresh tokens, so logging out
+    or rotating a refresh token also disables the access tokens issued from it.
+    Tokens issued before the refresh jti claim existed use the regular lookup.
+    """
+
+    def get_user(self, validated_token):
+        if not settings.ANALITICA_JWT_STATELESS or CLAIM_REFRESH_JTI not in validated_token:
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('El token no contiene la identificación del usuario')
+
+        data = revoked()
+        jtis = {validated_token.get(api_settings.JTI_CLAIM), validated_token[CLAIM_REFRESH_JTI]}
+        if jtis & data['jtis']:
+            raise InvalidToken('El token fue revocado')
+        if str(user_id) in data['usuarios']:
+            raise AuthenticationFailed('El usuario está inactivo', code='user_inactive')
+
+        return TokenUser(validated_token)
+
+# Authentication of the analytics views; sessions keep working for the browsable API
+ANALITICA_AUTHENTICATION_CLASSES = [AnaliticaJWTAuthentication, SessionAuthentication]
@@ -0,0 +1,336 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import prefetch_related_objects
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+NON_FIELD_ERRORS = api_settings.NON_FIELD_ERRORS_KEY
+
+class BulkBatch:
+    """
+    The items of one bulk request: the instance built for each valid item and the
+    errors of each failed one, both keyed by the item's index in the request.
+    """
+    def __init__(self, model, items, creating):
+        self.model = model
+        self.items = items
+        self.creating = creating
+        self.instances = {}
+        self.relations = {}
+        self.errors = {}
+
+    def add_error(self, index, message, field=None):
+        self.errors.setdefault(index, {}).setdefault(field or NON_FIELD_ERRORS, []).append(str(message))
+
+    def pending(self):
+        """(index, instance) of the items without errors so far, in request order"""
+        return [(index, self.instances[index]) for index in sorted(self.instances) if index not in self.errors]
+
+    def sent(self, index, *fields):
+        """Whether the item sets any of the fields; on create every field counts as set"""
+        return self.creating or any(field in self.items[index] for field in fields)
+
+class BulkMixin:
+    """
+    Generic view mixin for bulk JSON writes on list endpoints.
+
+    - POST with a list of objects creates all of them.
+    - PATCH with a list of objects updates them, each one identified by its primary key.
+
+    The items are validated as a set: field validators run in memory, while foreign
+    keys, unique fields and constraints and the view's own rules (`validate_batch`)
+    take one query per rule for the whole batch instead of one per item. The valid
+    items are written with bulk_create/bulk_update in a single transaction and the
+    response has one result per item, in request order. With ?atomico=1 nothing is
+    written if any item fails.
+    """
+    bulk_max_items = 1000
+    bulk_batch_size = 500  # Max values per IN query and rows per INSERT/UPDATE
+    atomic_query_param = 'atomico'
+
+    def create(self, request, *args, **kwargs):
+        if isinstance(request.data, list):
+            return self.bulk_write(request, creating=True)
+        return super().create(request, *args, **kwargs)
+
+    def patch(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            raise ValidationError({NON_FIELD_ERRORS: ['Se esperaba una lista de objetos']})
+        return self.bulk_write(request, creating=False)
+
+    def filter_in_batches(self, queryset, lookup, values):
+        """Runs the query with IN filters in batches so the parameter limit is never exceeded"""
+        values = list(values)
+        for i in range(0, len(values), self.bulk_batch_size):
+            yield from queryset.filter(**{f'{lookup}__in': values[i:i + self.bulk_batch_size]})
+
+    def bulk_write(self, request, creating):
+        items = request.data
+        if not items:
+            raise ValidationError({NON_FIELD_ERRORS: ['La lista está vacía']})
+        if len(items) > self.bulk_max_items:
+            raise ValidationError({NON_FIELD_ERRORS: [f'Se admiten como máximo {self.bulk_max_items} objetos por solicitud']})
+
+        batch = BulkBatch(self.get_queryset().model, items, creating)
+        self.build_instances(batch)
+        self.check_foreign_keys(batch)
+        self.check_unique(batch)
+        self.validate_batch(batch)
+
+        valid = batch.pending()
+        atomic = request.query_params.get(self.atomic_query_param, '').lower() in ('1', 'true')
+        written = bool(valid) and not (atomic and batch.errors)
+        if written:
+            try:
+                with transaction.atomic():
+                    if creating:
+                        self.perform_bulk_create(batch, valid)
+                    else:
+                        self.perform_bulk_update(batch, valid)
+            except IntegrityError as ex:
+                # Only possible on races with concurrent writes, the batch was checked before
+                return Response(status=400, data={NON_FIELD_ERRORS: [f'No se guardó ningún objeto: {ex}']})
+
+        return self.bulk_response(batch, valid if written else [], creating)
+
+    def build_instances(self, batch):
+        """Builds each item's instance and runs the field validators that need no queries"""
+        meta = batch.model._meta
+        writable = {
+            field.name: field for field in meta.concrete_fields
+            if field.editable and field is not meta.auto_field and (batch.creating or not field.primary_key)
+        }
+        many_to_many = {field.name: field for field in meta.many_to_many}
+        existing = {} if batch.creating else self.get_existing(batch)
+
+        for index, item in enumerate(batch.items):
+            if not isinstance(item, dict):
+                batch.add_error(index, 'Se esperaba un objeto')
+                continue
+            if batch.creating:
+                instance = batch.model()
+            else:
+                instance = existing.get(self.parse_pk(meta.pk, item.get(meta.pk.name)))
+                if instance is None:
+                    batch.add_error(index, f'No existe el objeto {item.get(meta.pk.name)}', meta.pk.name)
+                    continue
+
+            unknown = set(item) - set(writable) - set(many_to_many) - {meta.pk.name}
+            for name in sorted(unknown):
+                batch.add_error(index, 'Campo desconocido o de solo lectura', name)
+            for name, value in item.items():
+                if name in writable:
+                    setattr(instance, writable[name].attname, value)
+                elif name in many_to_many:
+                    if not isinstance(value, list):
+                        batch.add_error(index, 'Se esperaba una lista', name)
+                    batch.relations.setdefault(index, {})[name] = value
+
+            # Foreign keys are checked for the whole batch later, here only required and type
+            exclude = [field.name for field in meta.concrete_fields if field.is_relation or not batch.sent(index, field.name)]
+            try:
+                instance.clean_fields(exclude=exclude)
+            except DjangoValidationError as ex:
+                for field, messages in ex.message_dict.items():
+                    for message in messages:
+                        batch.add_error(index, message, field)
+            for field in meta.concrete_fields:
+                if field.is_relation and field.name in writable and batch.sent(index, field.name):
+                    self.clean_foreign_key(batch, index, instance, field)
+
+            if index not in batch.errors:
+                self.prepare_instance(instance)
+            batch.instances[index] = instance
+
+    def clean_foreign_key(self, batch, index, instance, field):
+        value = getattr(instance, field.attname)
+        if value in (None, ''):
+            setattr(instance, field.attname, None)
+            if not field.null:
+                batch.add_error(index, 'Este campo es requerido.', field.name)
+            return
+        try:
+            setattr(instance, field.attname, field.target_field.to_python(value))
+        except DjangoValidationError as ex:
+            for message in ex.messages:
+                batch.add_error(index, message, field.name)
+
+    def get_existing(self, batch):
+        """Loads the instances to update in one query per IN batch"""
+        pk = batch.model._meta.pk
+        values = {self.parse_pk(pk, item.get(pk.name)) for item in batch.items if isinstance(item, dict)} - {None}
+        return {instance.pk: instance for instance in self.filter_in_batches(self.get_queryset(), 'pk', values)}
+
+    def parse_pk(self, pk, value):
+        if value is None:
+            return None
+        try:
+            return pk.to_python(value)
+        except DjangoValidationError:
+            return None
+
+    def prepare_instance(self, instance):
+        """Hook for the normalization the model does in save(), which bulk writes skip"""
+
+    def validate_batch(self, batch):
+        """Hook for the model rules (clean(), save()) checked as a set over batch.pending()"""
+
+    def check_foreign_keys(self, batch):
+        """One query per related model for every foreign key and many to many value in the batch"""
+        meta = batch.model._meta
+        for field in meta.concrete_fields:
+            if not field.is_relation:
+                continue
+            values = {
+                getattr(instance, field.attname) for index, instance in batch.pending()
+                if batch.sent(index, field.name)
+            } - {None}
+            existing = self.existing_values(field.related_model, field.target_field.attname, values)
+            for index, instance in batch.pending():
+                value = getattr(instance, field.attname)
+                if batch.sent(index, field.name) and value is not None and value not in existing:
+                    batch.add_error(index, f'Clave primaria "{value}" inválida - objeto no existe.', field.name)
+
+        for field in meta.many_to_many:
+            values = {
+                value for index, _ in batch.pending()
+                for value in batch.relations.get(index, {}).get(field.name, [])
+            }
+            existing = self.existing_values(field.related_model, 'pk', values)
+            for index, _ in batch.pending():
+                for value in batch.relations.get(index, {}).get(field.name, []):
+                    if value not in existing:
+                        batch.add_error(index, f'Clave primaria "{value}" inválida - objeto no existe.', field.name)
+
+    def existing_values(self, model, attname, values):
+        existing = set()
+        values = list(values)
+        for i in range(0, len(values), self.bulk_batch_size):
+            existing.update(model._default_manager.filter(**{f'{attname}__in': values[i:i + self.bulk_batch_size]}).values_list(attname, flat=True))
+        return existing
+
+    def unique_groups(self, model):
+        """(fields, message) of every unique field and unconditional unique constraint"""
+        meta = model._meta
+        groups = [
+            ((field.name,), f'Ya existe un registro con este {field.verbose_name}.')
+            for field in meta.concrete_fields if field.unique and field is not meta.auto_field
+        ]
+        for fields in meta.unique_together:
+            groups.append((tuple(fields), f'Los campos {", ".join(fields)} deben formar un conjunto único.'))
+        for constraint in meta.total_unique_constraints:
+            message = constraint.violation_error_message
+            if message == constraint.default_violation_error_message:
+                message = f'Los campos {", ".join(constraint.fields)} deben formar un conjunto único.'
+            groups.append((tuple(constraint.fields), message))
+        return groups
+
+    def check_unique(self, batch):
+        """Duplicates inside the batch and against the table, one query per unique group"""
+        meta = batch.model._meta
+        for fields, message in self.unique_groups(batch.model):
+            if not batch.creating and fields == (meta.pk.name,):
+                continue
+            attnames = [meta.get_field(name).attname for name in fields]
+            keys = {}
+            for index, instance in batch.pending():
+                if not batch.sent(index, *fields):
+                    continue
+                key = tuple(getattr(instance, attname) for attname in attnames)
+                if None in key:
+                    continue
+                if key in keys:
+                    batch.add_error(index, f'{message.rstrip(".")} (repetido en el objeto {keys[key]} de la solicitud).', fields[0] if len(fields) == 1 else None)
+                else:
+                    keys[key] = index
+
+            first = [key[0] for key in keys]
+            for i in range(0, len(first), self.bulk_batch_size):
+                rows = batch.model._default_manager.filter(
+                    **{f'{attnames[0]}__in': first[i:i + self.bulk_batch_size]}
+                ).values_list('pk', *attnames)
+                for pk, *key in rows:
+                    index = keys.get(tuple(key))
+                    # On update the row found can be the item itself
+                    if index is not None and (batch.creating or batch.instances[index].pk != pk):
+                        batch.add_error(index, message, fields[0] if len(fields) == 1 else None)
+
+    def perform_bulk_create(self, batch, valid):
+        instances = [instance for _, instance in valid]
+        batch.model._default_manager.bulk_create(instances, batch_size=self.bulk_batch_size)
+        if any(instance.pk is None for instance in instances):
+            self.fetch_pks(batch.model, instances)
+        self.write_relations(batch, valid, replace=False)
+
+    def perform_bulk_update(self, batch, valid):
+        meta = batch.model._meta
+        concrete = {field.name: field for field in meta.concrete_fields if not field.primary_key}
+        fields = sorted({name for index, _ in valid for name in batch.items[index] if name in concrete})
+        if fields:
+            batch.model._default_manager.bulk_update([instance for _, instance in valid], fields, batch_size=self.bulk_batch_size)
+        self.write_relations(batch, valid, replace=True)
+
+    def fetch_pks(self, model, instances):
+        """
+        Backends that don't return the ids of a bulk insert (MySQL) leave pk empty,
+        they are read back through the first unique constraint of the model.
+        """
+        fields = next((fields for fields, _ in self.unique_groups(model) if len(fields) > 1 or fields[0] != model._meta.pk.name), None)
+        if fields is None:
+            return
+        attnames = [model._meta.get_field(name).attname for name in fields]
+        keys = {tuple(getattr(instance, attname) for attname in attnames): instance for instance in instances}
+        first = list({key[0] for key in keys})
+        for i in range(0, len(first), self.bulk_batch_size):
+            rows = model._default_manager.filter(**{f'{attnames[0]}__in': first[i:i + self.bulk_batch_size]}).values_list('pk', *attnames)
+            for pk, *key in rows:
+                if tuple(key) in keys:
+                    keys[tuple(key)].pk = pk
+
+    def write_relations(self, batch, valid, replace):
+        """Many to many values are written through their intermediate table, one INSERT per field"""
+        for field in batch.model._meta.many_to_many:
+            through = field.remote_field.through
+            source = through._meta.get_field(field.m2m_field_name()).attname
+            target = through._meta.get_field(field.m2m_reverse_field_name()).attname
+            instances = [(index, instance) for index, instance in valid if field.name in batch.relations.get(index, {})]
+            if not instances:
+                continue
+            if replace:
+                through._default_manager.filter(**{f'{source}__in': [instance.pk for _, instance in instances]}).delete()
+            through._default_manager.bulk_create([
+                through(**{source: instance.pk, target: value})
+                for index, instance in instances
+                for value in set(batch.relations[index][field.name])
+            ], batch_size=self.bulk_batch_size)
+
+    def bulk_response(self, batch, written, creating):
+        item_status = status.HTTP_201_CREATED if creating else status.HTTP_200_OK
+        instances = [instance for _, instance in written]
+        if instances and batch.model._meta.many_to_many:
+            prefetch_related_objects(instances, *[field.name for field in batch.model._meta.many_to_many])
+        data = dict(zip([index for index, _ in written], self.get_serializer(instances, many=True).data))
+
+        results = []
+        for index in range(len(batch.items)):
+            if index in batch.errors:
+                results.append({'index': index, 'status': status.HTTP_400_BAD_REQUEST, 'errors': batch.errors[index]})
+            elif index in data:
+                results.append({'index': index, 'status': item_status, 'data': data[index]})
+            else:
+                # Valid, but not written because another item of an atomic request failed
+                results.append({'index': index, 'status': status.HTTP_424_FAILED_DEPENDENCY})
+
+        if not written:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif batch.errors:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = item_status
+        return Response(status=response_status, data={
+            'created' if creating else 'updated': len(written),
+            'errors': len(batch.errors),
+            'results': results,
+        })
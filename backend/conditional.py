@@ -0,0 +1,73 @@
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from carreras.permisos import carrerasPermitidas, ultimoCambioPermisos
+from registros.periodos import getPeriodoActual, inicioPeriodo
+from registros.versiones import versionDatos
+
+import hashlib
+
+class ConditionalResponse(Exception):
+    # Carries the 304 (or 412) response out of initial()
+    def __init__(self, response):
+        self.response = response
+
+class ConditionalGetMixin:
+    """
+    APIView mixin for conditional GET on the analytics views.
+
+    The ETag combines the registros data version (one primary key lookup, see
+    registros.versiones) with a hash of the view, the query params, the current
+    periodo, the rendered format and the carreras the user can see. Last-Modified
+    is the newest of the last write, the user's last permission change and the
+    start of the current periodo, since the responses change when it rolls over. After authentication and permissions, a matching If-None-Match or
+    If-Modified-Since is answered with 304 before the view computes anything.
+    """
+    conditional_etag = None
+    conditional_last_modified = None
+
+    def get_conditional_key(self, request):
+        params = sorted((key, sorted(values)) for key, values in request.query_params.lists())
+        return repr((
+            self.__class__.__name__,
+            params,
+            getPeriodoActual(),
+            request.accepted_renderer.format,
+            sorted(carrerasPermitidas(request.user)),
+        ))
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method not in ('GET', 'HEAD'):
+            return
+
+        version, modified = versionDatos()
+        digest = hashlib.sha1(self.get_conditional_key(request).encode()).hexdigest()[:20]
+        self.conditional_etag = quote_etag(f'{version}-{digest}')
+        self.conditional_last_modified = int(max(
+            modified.timestamp(),
+            ultimoCambioPermisos(request.user.pk) or 0,
+            inicioPeriodo(getPeriodoActual()).timestamp(),
+        ))
+
+        response = get_conditional_response(
+            request._request,
+            etag=self.conditional_etag,
+            last_modified=self.conditional_last_modified
+        )
+        if response is not None:
+            raise ConditionalResponse(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, ConditionalResponse):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.conditional_etag and response.status_code in (200, 304):
+            response['ETag'] = self.conditional_etag
+            response['Last-Modified'] = http_date(self.conditional_last_modified)
+            # Clients may store the response but must revalidate it on every request
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -0,0 +1,116 @@
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+class QueryParamFilter(BaseFilterBackend):
+    """
+    Filters a queryset with the query params declared by the view in `query_filters`,
+    a dict of {param: lookup}.
+
+    - Lookups ending in __in take a comma separated list.
+    - Boolean fields accept true/false, 1/0 or si/no.
+    - Other values, and each item of a list, are converted with the field's
+      to_python() (the target field for relations).
+    - Unknown params are ignored, invalid values return 400.
+    """
+    TRUE_VALUES = ('true', '1', 'si', 'sí')
+    FALSE_VALUES = ('false', '0', 'no')
+
+    def filter_queryset(self, request, queryset, view):
+        lookups = {}
+        for param, lookup in getattr(view, 'query_filters', {}).items():
+            value = request.query_params.get(param)
+            if value is None or value == '':
+                continue
+            lookups[lookup] = self.parse_value(queryset.model, param, lookup, value)
+        return queryset.filter(**lookups) if lookups else queryset
+
+    def parse_value(self, model, param, lookup, value):
+        field = self.lookup_field(model, lookup)
+        if lookup.endswith('__in'):
+            return [self.convert(field, param, item.strip()) for item in value.split(',') if item.strip()]
+        return self.convert(field, param, value)
+
+    def lookup_field(self, model, lookup):
+        """Model field the lookup ends on, following relations; transforms like __gte are skipped"""
+        field = None
+        for part in lookup.split('__'):
+            try:
+                field = model._meta.get_field(part)
+            except FieldDoesNotExist:
+                break
+            if field.is_relation:
+                model = field.related_model
+        if field is not None and field.is_relation:
+            field = field.target_field
+        return field
+
+    def convert(self, field, param, value):
+        if field is None:
+            return value
+        if field.get_internal_type() == 'BooleanField':
+            if value.lower() in self.TRUE_VALUES:
+                return True
+            if value.lower() in self.FALSE_VALUES:
+                return False
+            raise ValidationError({param: f'Valor inválido: {value}'})
+        try:
+            return field.to_python(value)
+        except (DjangoValidationError, ValueError, TypeError):
+            raise ValidationError({param: f'Valor inválido: {value}'})
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': param,
+                'required': False,
+                'in': 'query',
+                'description': f'Filter by {lookup}',
+                'schema': {'type': 'string'},
+            }
+            for param, lookup in getattr(view, 'query_filters', {}).items()
+        ]
+
+class SparseFieldsMixin:
+    """
+    Generic view mixin for sparse fieldsets: ?fields=a,b,c returns only those
+    serializer fields, and on reads the queryset loads only the matching model
+    columns with only(). Without the param the response is unchanged.
+    """
+    fields_query_param = 'fields'
+
+    def get_requested_fields(self):
+        if not hasattr(self, '_requested_fields'):
+            self._requested_fields = self.parse_requested_fields()
+        return self._requested_fields
+
+    def parse_requested_fields(self):
+        request = getattr(self, 'request', None)
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return None
+        value = request.query_params.get(self.fields_query_param)
+        if not value:
+            return None
+        requested = [field.strip() for field in value.split(',') if field.strip()]
+        available = self.get_serializer_class()().fields
+        unknown = [field for field in requested if field not in available]
+        if unknown:
+            raise ValidationError({self.fields_query_param: f'Campos desconocidos: {", ".join(unknown)}'})
+        return requested
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        requested = self.get_requested_fields()
+        if requested:
+            columns = {field.name for field in queryset.model._meta.concrete_fields}
+            queryset = queryset.only(*[field for field in requested if field in columns])
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        requested = self.get_requested_fields()
+        if requested:
+            target = getattr(serializer, 'child', serializer)
+            for name in set(target.fields) - set(requested):
+                target.fields.pop(name)
+        return serializer
@@ -0,0 +1,154 @@
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from rest_framework import permissions
+from rest_framework.views import APIView
+
+from bisect import bisect_left
+from contextlib import ExitStack
+
+import threading
+import time
+
+# Upper bounds of the histogram buckets, +Inf is added when exporting
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    """
+    In-process aggregates of the instrumented requests, by view and method. Each
+    worker process keeps its own registry; Prometheus adds them up when scraping
+    every worker, or reads a single one with one process.
+    """
+    HISTOGRAMS = {
+        'http_request_duration_seconds': ('Total request time', DURATION_BUCKETS),
+        'http_request_sql_duration_seconds': ('Time spent in SQL queries', DURATION_BUCKETS),
+        'http_request_sql_queries': ('SQL queries per request', QUERY_BUCKETS),
+        'http_response_size_bytes': ('Response body size', SIZE_BUCKETS),
+    }
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {name: {} for name in self.HISTOGRAMS}
+        self.requests = {}
+
+    def observe(self, view, method, status, duration, sql_duration, queries, size):
+        labels = (view, method)
+        values = {
+            'http_request_duration_seconds': duration,
+            'http_request_sql_duration_seconds': sql_duration,
+            'http_request_sql_queries': queries,
+            'http_response_size_bytes': size,
+        }
+        with self.lock:
+            for name, value in values.items():
+                if labels not in self.histograms[name]:
+                    self.histograms[name][labels] = Histogram(self.HISTOGRAMS[name][1])
+                self.histograms[name][labels].observe(value)
+            key = (view, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def clear(self):
+        with self.lock:
+            self.histograms = {name: {} for name in self.HISTOGRAMS}
+            self.requests = {}
+
+    def export(self):
+        """Prometheus text exposition format, version 0.0.4"""
+        lines = []
+        with self.lock:
+            lines.append('# HELP http_requests_total Instrumented requests')
+            lines.append('# TYPE http_requests_total counter')
+            for (view, method, status), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{format_labels(view=view, method=method, status=status)} {count}')
+
+            for name, (description, buckets) in self.HISTOGRAMS.items():
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} histogram')
+                for (view, method), histogram in sorted(self.histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip((*buckets, '+Inf'), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{format_labels(view=view, method=method, le=bound)} {cumulative}')
+                    lines.append(f'{name}_sum{format_labels(view=view, method=method)} {histogram.sum}')
+                    lines.append(f'{name}_count{format_labels(view=view, method=method)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(**labels):
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in labels.items()) + '}'
+
+registry = MetricsRegistry()
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    view_class = getattr(match.func, 'view_class', None)
+    return view_class.__name__ if view_class is not None else match.func.__name__
+
+class QueryMetricsMiddleware:
+    """
+    Records SQL query count, SQL time, total time and response size of each
+    request, by view (class name for class based views). Queries are counted on
+    every database alias with an execute wrapper, so the analytics replica is
+    included. The values go to the in-process registry exported by MetricsView
+    and, with METRICAS_SERVER_TIMING, to a Server-Timing header.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sql = {'count': 0, 'time': 0.0}
+
+        def count_query(execute, query, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(query, params, many, context)
+            finally:
+                sql['count'] += 1
+                sql['time'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count_query))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        if response.streaming:
+            size = int(response.get('Content-Length') or 0)
+        else:
+            size = len(response.content)
+        registry.observe(view_name(request), request.method, response.status_code, duration, sql['time'], sql['count'], size)
+
+        if settings.METRICAS_SERVER_TIMING:
+            response['Server-Timing'] = ', '.join([
+                f'sql;desc="{sql["count"]} consultas";dur={sql["time"] * 1000:.1f}',
+                f'app;dur={(duration - sql["time"]) * 1000:.1f}',
+                f'total;dur={duration * 1000:.1f}',
+            ])
+        return response
+
+class MetricsView(APIView):
+    """Request metrics of this process in Prometheus text format, staff only"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, format=None):
+        return HttpResponse(registry.export(), content_type='text/plain; version=0.0.4; charset=utf-8')
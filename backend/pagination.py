@@ -0,0 +1,69 @@
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+from rest_framework.response import Response
+from collections import OrderedDict
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor (keyset) pagination for large lists.
+
+    Pages are fetched with a WHERE on the ordering key instead of an OFFSET, so
+    deep pages cost the same as the first one. Views set `pagination_ordering`
+    to a unique, indexed key (the primary key by default).
+
+    - ?limit= sets the page size, as in LimitOffsetPagination.
+    - ?conteo=0 skips the COUNT(*) of the total, count is returned as null.
+    - Requests with ?offset= fall back to LimitOffsetPagination, with the same
+      ordering, so clients that compute offsets themselves keep working.
+    """
+    ordering = 'pk'
+    page_size_query_param = 'limit'
+    max_page_size = 1000
+    conteo_query_param = 'conteo'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if LimitOffsetPagination.offset_query_param in request.query_params:
+            # Same ordering as the keyset pages, unordered offsets can repeat or skip rows
+            self.offset_paginator = LimitOffsetPagination()
+            queryset = queryset.order_by(*self.get_ordering(request, queryset, view))
+            return self.offset_paginator.paginate_queryset(queryset, request, view)
+
+        self.offset_paginator = None
+        self.count = None
+        if request.query_params.get(self.conteo_query_param, '1').lower() not in ('0', 'false', 'no'):
+            self.count = queryset.count()
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'pagination_ordering', self.ordering)
+        if isinstance(ordering, str):
+            return (ordering,)
+        return tuple(ordering)
+
+    def get_paginated_response(self, data):
+        if self.offset_paginator is not None:
+            return self.offset_paginator.get_paginated_response(data)
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema['properties'] = {
+            'count': {'type': 'integer', 'nullable': True, 'example': 123},
+            **schema['properties']
+        }
+        return schema
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [
+            {
+                'name': self.conteo_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Set to 0 to skip the total count.',
+                'schema': {'type': 'integer'},
+            }
+        ]
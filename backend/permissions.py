@@ -1,5 +1,5 @@
 from rest_framework.permissions import BasePermission, SAFE_METHODS
-from guardian.shortcuts import get_perms
+from carreras.permisos import carrerasPermitidas
 
 class IsAdminUserOrReadOnly(BasePermission):
     """
@@ -25,5 +25,10 @@ class IsOwnerOrReadOnly(BasePermission):
         )
 
 class CanViewCarrera(BasePermission):
+    """
+    Allows access to a carrera if the user has ver_carrera on it, read from the
+    per-user cache of permitted carreras
+    """
+
     def has_object_permission(self, request, view, obj):
-        return bool('ver_carrera' in get_perms(request.user, obj))
\ No newline at end of file
+        return obj.pk in carrerasPermitidas(request.user)
\ No newline at end of file
@@ -0,0 +1,76 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+ANALYTICS_DB_ALIAS = 'analytics'
+
+# True while an analytics view runs (see AnalyticsDatabaseMixin)
+_analytics_reads = ContextVar('analytics_reads', default=False)
+# True once the current analytics request wrote something, later reads go to default
+_wrote = ContextVar('analytics_wrote', default=False)
+
+def analytics_enabled():
+    return ANALYTICS_DB_ALIAS in settings.DATABASES
+
+@contextmanager
+def analytics_reads():
+    """Sends the reads made inside the block to the analytics database, if configured"""
+    reads_token = _analytics_reads.set(True)
+    wrote_token = _wrote.set(False)
+    try:
+        yield
+    finally:
+        _wrote.reset(wrote_token)
+        _analytics_reads.reset(reads_token)
+
+@contextmanager
+def default_reads():
+    """
+    Reads from default inside an analytics request, for data that is cached after
+    reading it and must not come from a lagging replica
+    """
+    token = _analytics_reads.set(False)
+    try:
+        yield
+    finally:
+        _analytics_reads.reset(token)
+
+class AnalyticsRouter:
+    """
+    Routes the reads of the analytics views to the optional `analytics` alias
+    (a read replica). Everything else uses `default`:
+
+    - All writes, and every read after a write in the same request.
+    - Reads inside a transaction on default, which must see its own writes.
+    - Reads outside analytics_reads(), and every read when the alias is not set.
+
+    The replica is never migrated, it receives the schema through replication.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _analytics_reads.get() or _wrote.get() or not analytics_enabled():
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return ANALYTICS_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if _analytics_reads.get():
+            _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != ANALYTICS_DB_ALIAS
+
+class AnalyticsDatabaseMixin:
+    """APIView mixin that runs the whole request, authentication included, under analytics_reads()"""
+
+    def dispatch(self, request, *args, **kwargs):
+        with analytics_reads():
+            return super().dispatch(request, *args, **kwargs)
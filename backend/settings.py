@@ -61,6 +61,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para medir el tiempo total de la solicitud (ver backend/metrics.py)
+    'backend.metrics.QueryMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -72,6 +74,9 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Agrega a cada respuesta el encabezado Server-Timing con las consultas SQL y los tiempos
+METRICAS_SERVER_TIMING = (config.get('METRICAS_SERVER_TIMING') or '').lower() == 'true'
+
 ROOT_URLCONF = 'backend.urls'
 
 TEMPLATES = [
@@ -107,6 +112,22 @@ DATABASES = {
     }
 }
 
+# Réplica de lectura opcional para las rutas de analítica e historial (backend.routers).
+# Los datos que no se indiquen se toman de la base principal
+if config.get('ANALITICA_DB_HOST') or config.get('ANALITICA_DB_NAME'):
+    DATABASES['analytics'] = {
+        **DATABASES['default'],
+        'NAME': config.get('ANALITICA_DB_NAME') or config['DB_NAME'],
+        'USER': config.get('ANALITICA_DB_USER') or config['DB_USER'],
+        'PASSWORD': config.get('ANALITICA_DB_PASSWORD') or config['DB_PASSWORD'],
+        'HOST': config.get('ANALITICA_DB_HOST') or config['DB_HOST'],
+        'PORT': config.get('ANALITICA_DB_PORT') or config['DB_PORT'],
+        # En las pruebas la réplica apunta a la base de prueba principal
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['backend.routers.AnalyticsRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -165,6 +186,45 @@ LOCALE_PATHS = [
 
 STATIC_URL = 'static/'
 
+# Archivos subidos (cargas de registros que se procesan en segundo plano)
+
+MEDIA_ROOT = BASE_DIR / 'media'
+
+MEDIA_URL = 'media/'
+
+# Número de workers locales para procesar cargas con ?async=1
+CARGAS_MAX_WORKERS = int(config.get('CARGAS_MAX_WORKERS') or 2)
+# Segundos sin avance después de los que una carga pendiente o en proceso se considera
+# abandonada (por ejemplo, si el servidor se reinició) y se puede reanudar
+CARGAS_TIMEOUT = int(config.get('CARGAS_TIMEOUT') or 15 * 60)
+
+# Caché (carreras permitidas por usuario). Con REDIS_URL el caché es compartido por
+# todos los procesos y la invalidación de permisos les llega a todos; sin él cada
+# proceso tiene su propio caché en memoria y los permisos se vuelven a leer al expirar
+
+if config.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': config['REDIS_URL'],
+        }
+    }
+    CARRERAS_PERMITIDAS_TIMEOUT = 60 * 60
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+    CARRERAS_PERMITIDAS_TIMEOUT = 60
+
+# Autenticación sin estado de las rutas de analítica (backend.authentication). El
+# usuario y sus carreras se leen del token; requiere el caché compartido para que
+# los cambios de permisos y las revocaciones lleguen a todos los procesos
+ANALITICA_JWT_STATELESS = (config.get('ANALITICA_JWT_STATELESS') or '').lower() == 'true' and bool(config.get('REDIS_URL'))
+# Segundos que se guardan los tokens revocados y usuarios inactivos
+ANALITICA_REVOCADOS_TIMEOUT = 60
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -17,6 +17,7 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.documentation import include_docs_urls 
+from .metrics import MetricsView
 
 urlpatterns = [
     #Para acceder a la documentación de la API
@@ -35,4 +36,6 @@ urlpatterns = [
     path('reportes/', include('reportes.urls')),
     path('cedulas/', include('cedulas.urls')),
     path('password-reset/', include('django_rest_passwordreset.urls', namespace='password_reset')),
+    #Métricas de las solicitudes en formato de Prometheus, solo para staff
+    path('metricas/', MetricsView.as_view(), name='metricas'),
 ]
@@ -1,6 +1,22 @@
 from django.apps import AppConfig
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete, m2m_changed
 
 
 class CarrerasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'carreras'
+
+    def ready(self):
+        from guardian.models import UserObjectPermission, GroupObjectPermission
+        from . import permisos
+        from .models import Carrera
+
+        # Invalidación del caché de carreras permitidas (ver permisos.py)
+        Usuario = get_user_model()
+        for nombre, senal in (('save', post_save), ('delete', post_delete)):
+            senal.connect(permisos.permisoUsuarioCambiado, sender=UserObjectPermission, dispatch_uid=f'permisos_usuario_{nombre}')
+            senal.connect(permisos.permisoGrupoCambiado, sender=GroupObjectPermission, dispatch_uid=f'permisos_grupo_{nombre}')
+            senal.connect(permisos.usuarioCambiado, sender=Usuario, dispatch_uid=f'permisos_superusuario_{nombre}')
+            senal.connect(permisos.carreraCambiada, sender=Carrera, dispatch_uid=f'permisos_carrera_{nombre}')
+        m2m_changed.connect(permisos.gruposUsuarioCambiados, sender=Usuario.groups.through, dispatch_uid='permisos_grupos_usuario')
@@ -0,0 +1,181 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import transaction
+from guardian.shortcuts import get_objects_for_user
+from guardian.utils import get_user_obj_perms_model
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from backend.routers import default_reads
+from .models import Carrera
+
+import time
+
+# Claves de las carreras que puede ver cada usuario, guardadas en el caché para no
+# consultar las tablas de permisos de guardian en cada solicitud. La versión global
+# invalida a todos los usuarios a la vez (cambios en carreras o en permisos de grupos)
+CLAVE_VERSION = 'carreras_permitidas:version'
+CLAVE_TODAS = 'carreras_permitidas:todas'
+
+# Claims de los tokens de acceso con las carreras permitidas (ver agregarClaimsCarreras)
+CLAIM_CARRERAS = 'carreras'
+CLAIM_CARRERAS_EN = 'carreras_en'
+CLAIM_CARRERAS_VERSION = 'carreras_version'
+
+def claveUsuario(usuario_id):
+    return f'carreras_permitidas:{usuario_id}'
+
+def claveCambio(usuario_id):
+    # Momento del último cambio de permisos del usuario, para descartar claims anteriores
+    return f'carreras_permitidas:cambio:{usuario_id}'
+
+def versionPermisos():
+    return cache.get_or_set(CLAVE_VERSION, 1, timeout=None)
+
+def todasLasCarreras():
+    version = versionPermisos()
+    claves = cache.get(CLAVE_TODAS, version=version)
+    if claves is None:
+        with default_reads():
+            claves = frozenset(Carrera.objects.values_list('pk', flat=True))
+        cache.set(CLAVE_TODAS, claves, timeout=settings.CARRERAS_PERMITIDAS_TIMEOUT, version=version)
+    return claves
+
+def carrerasPermitidas(user):
+    """frozenset con las claves de las carreras en las que el usuario tiene ver_carrera"""
+    if user is None or not user.is_authenticated:
+        return frozenset()
+    if isinstance(user, TokenUser):
+        claves = carrerasDelToken(user.token)
+        if claves is not None:
+            return claves
+        # Los permisos cambiaron después de emitir el token
+        user = get_user_model().objects.filter(pk=user.pk).first()
+        if user is None:
+            # El usuario se eliminó y su token de acceso sigue vigente
+            return frozenset()
+    version = versionPermisos()
+    claves = cache.get(claveUsuario(user.pk), version=version)
+    if claves is None:
+        # Se guarda en el caché, se lee de la base principal aunque haya réplica
+        with default_reads():
+            claves = frozenset(get_objects_for_user(user, 'ver_carrera', klass=Carrera).values_list('pk', flat=True))
+        cache.set(claveUsuario(user.pk), claves, timeout=settings.CARRERAS_PERMITIDAS_TIMEOUT, version=version)
+    return claves
+
+def invalidarPermisos(*usuarios_ids):
+    """Sin usuarios invalida a todos"""
+    if not usuarios_ids:
+        try:
+            cache.incr(CLAVE_VERSION)
+        except ValueError:
+            cache.set(CLAVE_VERSION, 2, timeout=None)
+        return
+    version = versionPermisos()
+    cache.delete_many([claveUsuario(usuario_id) for usuario_id in usuarios_ids], version=version)
+    # Se guarda mientras pueda existir un token de acceso emitido antes del cambio
+    vigencia = int(jwt_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+    cache.set_many({claveCambio(usuario_id): time.time() for usuario_id in usuarios_ids}, timeout=vigencia)
+
+def ultimoCambioPermisos(usuario_id):
+    """Timestamp del último cambio de permisos del usuario, si fue durante la vigencia de un token"""
+    return cache.get(claveCambio(usuario_id))
+
+def agregarClaimsCarreras(token, user):
+    """
+    Agrega al token las carreras permitidas ("*" para superusuarios), cuándo se
+    calcularon y la versión global de permisos, para leerlas sin consultar la base
+    """
+    token[CLAIM_CARRERAS] = '*' if user.is_superuser else ','.join(sorted(carrerasPermitidas(user)))
+    token[CLAIM_CARRERAS_EN] = time.time()
+    token[CLAIM_CARRERAS_VERSION] = versionPermisos()
+
+def carrerasDelToken(token):
+    """Carreras del claim del token, o None si falta o los permisos cambiaron después"""
+    claim = token.get(CLAIM_CARRERAS)
+    if claim is None or token.get(CLAIM_CARRERAS_VERSION) != versionPermisos():
+        return None
+    cambio = ultimoCambioPermisos(token[jwt_settings.USER_ID_CLAIM])
+    if cambio is not None and cambio >= token.get(CLAIM_CARRERAS_EN, 0):
+        return None
+    if claim == '*':
+        return todasLasCarreras()
+    return frozenset(claim.split(',')) if claim else frozenset()
+
+def permisosCarrera():
+    """Modelo de permisos por objeto de guardian y filtro base de ver_carrera sobre carreras"""
+    content_type = ContentType.objects.get_for_model(Carrera)
+    permiso = Permission.objects.get(content_type=content_type, codename='ver_carrera')
+    return get_user_obj_perms_model(Carrera), {'content_type': content_type, 'permission': permiso}
+
+def asignarPermisos(usuarios_ids, claves):
+    """
+    Asigna ver_carrera a cada usuario en cada carrera con un SELECT de los permisos
+    existentes y un INSERT en bloque de los faltantes. Regresa cuántos se crearon.
+    """
+    modelo, filtro = permisosCarrera()
+    claves = [str(clave) for clave in claves]
+    with transaction.atomic():
+        existentes = set(modelo.objects.filter(
+            **filtro, user_id__in=usuarios_ids, object_pk__in=claves
+        ).values_list('user_id', 'object_pk'))
+        nuevos = [
+            modelo(**filtro, user_id=usuario_id, object_pk=clave)
+            for usuario_id in usuarios_ids
+            for clave in claves
+            if (usuario_id, clave) not in existentes
+        ]
+        modelo.objects.bulk_create(nuevos, batch_size=1000, ignore_conflicts=True)
+        # bulk_create no envía señales
+        transaction.on_commit(lambda: invalidarPermisos(*usuarios_ids))
+    return len(nuevos)
+
+def removerPermisos(usuarios_ids, claves=None, excepto=None):
+    """
+    Quita ver_carrera a los usuarios en las carreras indicadas (todas sin claves),
+    salvo las de excepto, con un DELETE en bloque. Regresa cuántos se quitaron.
+    """
+    modelo, filtro = permisosCarrera()
+    consulta = modelo.objects.filter(**filtro, user_id__in=usuarios_ids)
+    if claves is not None:
+        consulta = consulta.filter(object_pk__in=[str(clave) for clave in claves])
+    if excepto is not None:
+        consulta = consulta.exclude(object_pk__in=[str(clave) for clave in excepto])
+    with transaction.atomic():
+        removidos, _ = consulta.delete()
+        # Los receptores de post_delete invalidan antes de confirmar; una lectura concurrente
+        # puede guardar otra vez los permisos anteriores, se invalida de nuevo al confirmar
+        transaction.on_commit(lambda: invalidarPermisos(*usuarios_ids))
+    return removidos
+
+# Receptores de señales, conectados en CarrerasConfig.ready(). Cubren assign_perm,
+# remove_perm y el admin; las escrituras en bloque deben llamar a invalidarPermisos
+
+def permisoUsuarioCambiado(sender, instance, **kwargs):
+    invalidarPermisos(instance.user_id)
+
+def permisoGrupoCambiado(sender, instance, **kwargs):
+    invalidarPermisos()
+
+def usuarioCambiado(sender, instance, update_fields=None, **kwargs):
+    # is_superuser da acceso a todas las carreras; el inicio de sesión solo guarda last_login
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    invalidarPermisos(instance.pk)
+
+def gruposUsuarioCambiados(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidarPermisos(instance.pk)
+    elif pk_set:
+        # Cambiaron los usuarios de un grupo
+        invalidarPermisos(*pk_set)
+    else:
+        invalidarPermisos()
+
+def carreraCambiada(sender, **kwargs):
+    invalidarPermisos()
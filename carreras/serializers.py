@@ -7,4 +7,21 @@ class CarreraSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Carrera
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+class PermisosLoteSerializer(serializers.Serializer):
+    """
+    Permisos ver_carrera de varios usuarios en varias carreras:
+    - asignar: agrega los permisos que falten
+    - remover: quita los permisos, de todas las carreras si no se indican
+    - reemplazar: deja a cada usuario exactamente con las carreras indicadas
+    """
+    ACCIONES = ['asignar', 'remover', 'reemplazar']
+
+    accion = serializers.ChoiceField(choices=ACCIONES)
+    usuarios = serializers.ListField(child=serializers.CharField(), allow_empty=False, max_length=1000, help_text='Ids o nombres de usuario')
+    carreras = serializers.ListField(child=serializers.CharField(), required=False, help_text='Claves de carrera, "*" para todas')
+
+    def validate(self, data):
+        if 'carreras' not in data and data['accion'] != 'remover':
+            raise serializers.ValidationError({'carreras': 'Este campo es requerido.'})
+        return data
@@ -1,3 +1,121 @@
+from django.core.cache import cache
 from django.test import TestCase
+from guardian.shortcuts import assign_perm
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from usuario.models import Usuario
+from .models import Carrera
+from .permisos import (
+    asignarPermisos, carrerasPermitidas, claveUsuario, permisosCarrera, removerPermisos, versionPermisos
+)
+
+class PermisosCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        for clave in ('ISC', 'IIA', 'LAE'):
+            Carrera.objects.create(clave=clave, nombre=clave)
+        self.usuario = Usuario.objects.create(username='coordinador', first_name='A', paternal_surname='B', email='c@a.com')
+
+    def test_asignar_invalida_al_confirmar(self):
+        self.assertEqual(carrerasPermitidas(self.usuario), frozenset())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(asignarPermisos([self.usuario.pk], ['ISC', 'IIA']), 2)
+        self.assertEqual(carrerasPermitidas(self.usuario), {'ISC', 'IIA'})
+
+    def test_remover_invalida_al_confirmar(self):
+        assign_perm('ver_carrera', self.usuario, Carrera.objects.get(pk='ISC'))
+        self.assertEqual(carrerasPermitidas(self.usuario), {'ISC'})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(removerPermisos([self.usuario.pk]), 1)
+            # Una lectura concurrente antes de confirmar todavía ve el permiso y lo guarda
+            cache.set(claveUsuario(self.usuario.pk), frozenset({'ISC'}), version=versionPermisos())
+        self.assertEqual(carrerasPermitidas(self.usuario), frozenset())
+
+    def test_reemplazar_en_lote(self):
+        admin = Usuario.objects.create(
+            username='admin', first_name='A', paternal_surname='B', email='a@a.com', is_staff=True, is_superuser=True
+        )
+        client = APIClient()
+        client.force_authenticate(admin)
+        assign_perm('ver_carrera', self.usuario, Carrera.objects.get(pk='LAE'))
+        self.assertEqual(carrerasPermitidas(self.usuario), {'LAE'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = client.post('/carreras/permisos/lote/', {
+                'accion': 'reemplazar', 'usuarios': ['coordinador'], 'carreras': ['isc', 'IIA']
+            }, format='json')
+        self.assertEqual(respuesta.status_code, 200, respuesta.data)
+        self.assertEqual((respuesta.data['asignados'], respuesta.data['removidos']), (2, 1))
+        self.assertEqual(carrerasPermitidas(self.usuario), {'ISC', 'IIA'})
+
+class PermisosLoteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        for clave in ('ISC', 'IIA', 'LAE'):
+            Carrera.objects.create(clave=clave, nombre=clave)
+        self.coordinador = Usuario.objects.create(username='coordinador', first_name='A', paternal_surname='B', email='c@a.com')
+        self.jefe = Usuario.objects.create(username='jefe', first_name='A', paternal_surname='B', email='j@a.com')
+        admin = Usuario.objects.create(
+            username='admin', first_name='A', paternal_surname='B', email='a@a.com', is_staff=True, is_superuser=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def lote(self, **datos):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/carreras/permisos/lote/', datos, format='json')
+
+    def test_asignar_y_remover_en_lote(self):
+        # Los permisos en caché se invalidan al confirmar cada operación
+        self.assertEqual(carrerasPermitidas(self.coordinador), frozenset())
+        respuesta = self.lote(accion='asignar', usuarios=['coordinador', str(self.jefe.pk)], carreras=['*'])
+        self.assertEqual(respuesta.status_code, 200, respuesta.data)
+        self.assertEqual((respuesta.data['usuarios'], respuesta.data['carreras'], respuesta.data['asignados']), (2, 3, 6))
+        self.assertEqual(carrerasPermitidas(self.coordinador), {'ISC', 'IIA', 'LAE'})
+        # Los permisos existentes no se duplican
+        self.assertEqual(self.lote(accion='asignar', usuarios=['jefe'], carreras=['isc']).data['asignados'], 0)
+
+        respuesta = self.lote(accion='remover', usuarios=['coordinador', 'jefe'], carreras=['ISC', 'LAE'])
+        self.assertEqual(respuesta.status_code, 200, respuesta.data)
+        self.assertEqual(respuesta.data['removidos'], 4)
+        self.assertEqual(carrerasPermitidas(self.coordinador), {'IIA'})
+        self.assertEqual(carrerasPermitidas(self.jefe), {'IIA'})
+
+        # Sin carreras se quitan todas
+        self.assertEqual(self.lote(accion='remover', usuarios=['jefe']).data['removidos'], 1)
+        self.assertEqual(carrerasPermitidas(self.jefe), frozenset())
+        self.assertEqual(carrerasPermitidas(self.coordinador), {'IIA'})
+
+    def test_referencias_inexistentes_no_escriben(self):
+        asignarPermisos([self.coordinador.pk], ['LAE'])
+        modelo, filtro = permisosCarrera()
+        for datos, campo in (
+            ({'accion': 'asignar', 'usuarios': ['coordinador', 'nadie', '999'], 'carreras': ['ISC']}, 'usuarios'),
+            ({'accion': 'reemplazar', 'usuarios': ['coordinador'], 'carreras': ['ISC', 'XXX']}, 'carreras'),
+            ({'accion': 'remover', 'usuarios': ['nadie'], 'carreras': ['LAE']}, 'usuarios'),
+        ):
+            with self.subTest(datos):
+                respuesta = self.lote(**datos)
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertIn(campo, respuesta.data)
+                self.assertEqual(
+                    list(modelo.objects.filter(**filtro).values_list('user_id', 'object_pk')), [(self.coordinador.pk, 'LAE')]
+                )
+        self.assertIn('999, nadie', self.lote(accion='asignar', usuarios=['nadie', '999'], carreras=['ISC']).data['usuarios'])
+
+    def test_remover_todos_los_permisos(self):
+        asignarPermisos([self.coordinador.pk, self.jefe.pk], ['ISC', 'IIA'])
+        self.assertEqual(carrerasPermitidas(self.coordinador), {'ISC', 'IIA'})
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.get('/carreras/remover-permisos/todos/', {'usuario': self.coordinador.pk})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(carrerasPermitidas(self.coordinador), frozenset())
+        self.assertEqual(carrerasPermitidas(self.jefe), {'ISC', 'IIA'})
+
+        # Sin usuario se quitan los del usuario de la solicitud
+        self.client.force_authenticate(self.jefe)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.get('/carreras/remover-permisos/todos/').status_code, 200)
+        self.assertEqual(carrerasPermitidas(self.jefe), frozenset())
@@ -7,6 +7,7 @@ urlpatterns = [
     path('usuario/', views.CarreraListForUser.as_view(), name='carrera-list'),
     path('permisos/', views.AsignarPermisos.as_view(), name='carrera-permisos'),
     path('remover-permisos/', views.RemoverPermisos.as_view(), name='carrera-remover-permisos'),
+    path('permisos/lote/', views.PermisosLote.as_view(), name='carrera-permisos-lote'),
     path('remover-permisos/todos/', views.RemoverTodosPermisos.as_view(), name='carrera-remover-permisos'),
     path('<str:pk>/', views.CarreraDetail.as_view(), name='carrera-detail'),
 ]
\ No newline at end of file
@@ -1,12 +1,15 @@
 from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from backend.permissions import IsAdminUserOrReadOnly, CanViewCarrera
-from .serializers import CarreraSerializer
+from .serializers import CarreraSerializer, PermisosLoteSerializer
 from .models import Carrera
+from .permisos import carrerasPermitidas, asignarPermisos, removerPermisos
 from usuario.models import Usuario
-from guardian.shortcuts import get_objects_for_user, assign_perm, remove_perm, get_perms
+from guardian.shortcuts import assign_perm, remove_perm, get_perms
+from django.db import transaction
+from django.db.models import Q
 
 
 class CarreraList(ListCreateAPIView):
@@ -15,7 +18,7 @@ class CarreraList(ListCreateAPIView):
     permission_classes = [IsAuthenticated&IsAdminUserOrReadOnly]
     def get_queryset(self):
         user = self.request.user
-        queryset = get_objects_for_user(user, 'ver_carrera', klass=Carrera)
+        queryset = Carrera.objects.filter(pk__in=carrerasPermitidas(user))
         return queryset
 
 class CarreraListForUser(ListCreateAPIView):
@@ -24,7 +27,7 @@ class CarreraListForUser(ListCreateAPIView):
     def get_queryset(self):
         userId = self.request.GET.get('usuario')
         user = Usuario.objects.get(id=userId)
-        queryset = get_objects_for_user(user, 'ver_carrera', klass=Carrera)
+        queryset = Carrera.objects.filter(pk__in=carrerasPermitidas(user))
         return queryset
 
 class CarreraListAll(ListCreateAPIView):
@@ -74,8 +77,57 @@ class RemoverTodosPermisos(APIView):
     permission_classes = [IsAuthenticated]
     def get(self, request, format=None):
         userId = request.GET.get('usuario') if request.GET.get('usuario') else request.user.id
-        carreras = Carrera.objects.all()
         user = Usuario.objects.get(id=userId)
-        for c in carreras:
-            remove_perm('ver_carrera', user, c)
-        return Response(status=200, data={'message': 'Permiso removido'})
\ No newline at end of file
+        removerPermisos([user.id])
+        return Response(status=200, data={'message': 'Permiso removido'})
+
+class PermisosLote(APIView):
+    """
+    Asigna, remueve o reemplaza el permiso ver_carrera de varios usuarios en varias
+    carreras en una sola transacción, con inserciones y borrados en bloque.
+
+    {"accion": "asignar", "usuarios": [3, "coordinador"], "carreras": ["ISC", "II"]}
+    """
+    permission_classes = [IsAuthenticated&IsAdminUser]
+
+    def post(self, request, format=None):
+        serializer = PermisosLoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        datos = serializer.validated_data
+
+        referencias = set(datos['usuarios'])
+        ids = [int(referencia) for referencia in referencias if referencia.isnumeric()]
+        usuarios = list(Usuario.objects.filter(Q(id__in=ids) | Q(username__in=referencias)).values_list('id', 'username'))
+        encontrados = {str(usuario_id) for usuario_id, _ in usuarios} | {username for _, username in usuarios}
+        faltantes = sorted(referencias - encontrados)
+        if faltantes:
+            return Response(status=400, data={'usuarios': f'No existen los usuarios: {", ".join(faltantes)}'})
+        usuarios_ids = sorted({usuario_id for usuario_id, _ in usuarios})
+
+        claves = None
+        if 'carreras' in datos:
+            if '*' in datos['carreras']:
+                claves = list(Carrera.objects.values_list('clave', flat=True))
+            else:
+                solicitadas = {clave.upper() for clave in datos['carreras']}
+                claves = list(Carrera.objects.filter(clave__in=solicitadas).values_list('clave', flat=True))
+                faltantes = sorted(solicitadas - set(claves))
+                if faltantes:
+                    return Response(status=400, data={'carreras': f'No existen las carreras: {", ".join(faltantes)}'})
+
+        asignados = removidos = 0
+        with transaction.atomic():
+            if datos['accion'] == 'remover':
+                removidos = removerPermisos(usuarios_ids, claves)
+            else:
+                if datos['accion'] == 'reemplazar':
+                    removidos = removerPermisos(usuarios_ids, excepto=claves)
+                asignados = asignarPermisos(usuarios_ids, claves)
+
+        return Response(status=200, data={
+            'message': 'Permisos actualizados',
+            'usuarios': len(usuarios_ids),
+            'carreras': len(claves) if claves is not None else None,
+            'asignados': asignados,
+            'removidos': removidos,
+        })
\ No newline at end of file
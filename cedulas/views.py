@@ -4,15 +4,19 @@ from django.db.models import Count, F, Q
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import permissions
+from backend.authentication import ANALITICA_AUTHENTICATION_CLASSES
+from backend.conditional import ConditionalGetMixin
+from backend.routers import AnalyticsDatabaseMixin
 
 from registros.models import Ingreso, Egreso, Titulacion
 from registros.periodos import calcularPeriodos, getPeriodoActual
 
 from decimal import Decimal
 
-class CedulasCACEI(APIView):
+class CedulasCACEI(AnalyticsDatabaseMixin, ConditionalGetMixin, APIView):
     """Vista para generar la tabla de cédulas CACEI."""
     permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = ANALITICA_AUTHENTICATION_CLASSES
 
     def get_population_data(self, tipos, periodo, carrera):
         """Obtiene datos de población en una sola consulta"""
@@ -123,9 +127,10 @@ class CedulasCACEI(APIView):
         except Exception as e:
             return Response({'error': str(e)}, status=500)
 
-class CedulasCACECA(APIView):
+class CedulasCACECA(AnalyticsDatabaseMixin, ConditionalGetMixin, APIView):
     """Vista para generar la tabla de cédulas CACECA."""
     permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = ANALITICA_AUTHENTICATION_CLASSES
 
     def get_population_data(self, tipos, periodo, carrera):
         """Obtiene datos de población inicial en una sola consulta"""
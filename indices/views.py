@@ -4,6 +4,9 @@ from django.db.models import Count, F, Q
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import permissions
+from backend.authentication import ANALITICA_AUTHENTICATION_CLASSES
+from backend.conditional import ConditionalGetMixin
+from backend.routers import AnalyticsDatabaseMixin
 
 from registros.models import Ingreso, Egreso, Titulacion
 from registros.periodos import calcularPeriodos
@@ -158,9 +161,10 @@ def obtenerEgresadosAcumulados(alumnos, periodos, periodo_actual=None):
 
 from abc import ABC, abstractmethod
 
-class IndicesBase(APIView, ABC):
+class IndicesBase(AnalyticsDatabaseMixin, ConditionalGetMixin, APIView, ABC):
     """Clase base abstracta para todos los índices"""
     permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = ANALITICA_AUTHENTICATION_CLASSES
 
     def get_params(self, request):
         """Obtiene y valida parámetros comunes"""
@@ -650,9 +654,10 @@ class IndicesDesercion(IndicesBase):
         """Calcula tasa de deserción"""
         return calcularTasa(desercion_total, poblacion_nuevo_ingreso)
     
-class IndicesGeneracionalBase(APIView):
+class IndicesGeneracionalBase(AnalyticsDatabaseMixin, ConditionalGetMixin, APIView):
     """Clase base para índices generacionales"""
     permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = ANALITICA_AUTHENTICATION_CLASSES
 
     def get_generaciones(self, cohorte, num_generaciones=9):
         """Obtiene las generaciones a analizar"""
@@ -1,6 +1,31 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+# Índice FULLTEXT de la llave de búsqueda. Django no puede declararlo en Meta.indexes,
+# se crea después de migrar y solo en MySQL; en otras bases la búsqueda usa LIKE
+INDICE_FULLTEXT = 'ft_personal_busqueda'
+
+def crearIndiceFullText(sender, using, **kwargs):
+    from django.db import connections
+    from .models import Personal
+
+    connection = connections[using]
+    if connection.vendor != 'mysql':
+        return
+    tabla = Personal._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT COUNT(*) FROM information_schema.statistics '
+            'WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s',
+            [tabla, INDICE_FULLTEXT]
+        )
+        if cursor.fetchone()[0] == 0:
+            cursor.execute(f'CREATE FULLTEXT INDEX {INDICE_FULLTEXT} ON {connection.ops.quote_name(tabla)} (clave_busqueda)')
 
 
 class PersonalConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'personal'
+
+    def ready(self):
+        post_migrate.connect(crearIndiceFullText, sender=self)
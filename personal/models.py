@@ -2,9 +2,11 @@ from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
 from django.db.models import Q
 from django.db import models
+from registros.versiones import VersionadoQuerySet
 
 import datetime
 import re
+import unicodedata
 
 def obtenerFechaNac(curp: str):
     fecha_str = curp[4:10]
@@ -20,6 +22,31 @@ def obtenerGenero(curp: str):
     else:
         return 'X'
 
+def normalizarBusqueda(texto: str):
+    """Mayúsculas sin acentos ni signos, con los términos separados por un espacio"""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(caracter for caracter in texto if not unicodedata.combining(caracter))
+    return ' '.join(re.sub(r'[^A-Z0-9]+', ' ', texto.upper()).split())
+
+class PersonalManager(models.Manager.from_queryset(VersionadoQuerySet)):
+    # bulk_create y bulk_update no llaman a save(), la llave de búsqueda se calcula aquí
+    # para que todas las cargas en bloque la mantengan
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for personal in objs:
+            personal.actualizar_clave_busqueda()
+        if set(kwargs.get('update_fields') or []) & set(Personal.CAMPOS_BUSQUEDA):
+            kwargs['update_fields'] = [*kwargs['update_fields'], 'clave_busqueda']
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        if set(fields) & set(Personal.CAMPOS_BUSQUEDA):
+            for personal in objs:
+                personal.actualizar_clave_busqueda()
+            fields = [*fields, 'clave_busqueda']
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
 class Personal(models.Model):
     class Gender(models.TextChoices):
         MALE = 'H', _('Hombre')
@@ -50,6 +77,11 @@ class Personal(models.Model):
     genero = models.CharField(choices=Gender.choices, default=Gender.OTHER, max_length=1, null=False)
     discapacidades = models.ManyToManyField('discapacidades.Discapacidad', related_name='discapacidades', blank=True)
     habla_lengua_indigena = models.BooleanField(default=False)
+    # Nombre y apellidos normalizados (ver normalizarBusqueda), para buscar sin importar acentos
+    clave_busqueda = models.CharField(max_length=460, editable=False, default='')
+    objects = PersonalManager()
+
+    CAMPOS_BUSQUEDA = ['nombre', 'paterno', 'materno']
 
     REQUIRED_FIELDS = [
         'curp',
@@ -63,8 +95,15 @@ class Personal(models.Model):
         self.nombre = self.nombre.upper()
         self.paterno = self.paterno.upper() if self.paterno else None
         self.materno = self.materno.upper() if self.materno else None
+        self.actualizar_clave_busqueda()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & set(self.CAMPOS_BUSQUEDA):
+            kwargs['update_fields'] = [*update_fields, 'clave_busqueda']
         super().save(*args, **kwargs)
 
+    def actualizar_clave_busqueda(self):
+        self.clave_busqueda = normalizarBusqueda(' '.join(valor for valor in (self.nombre, self.paterno, self.materno) if valor))
+
     def __str__(self):
         fullname = self.nombre
         if self.paterno:
@@ -76,6 +115,10 @@ class Personal(models.Model):
     class Meta:
         verbose_name = 'información personal'
         verbose_name_plural = 'información personal'
+        indexes = [
+            # Prefijo del nombre; en MySQL además hay un índice FULLTEXT (ver apps.py)
+            models.Index(fields=['clave_busqueda'], name='idx_personal_busqueda')
+        ]
         constraints = [
             models.CheckConstraint(
                 name="%(class)s_paterno_o_materno",
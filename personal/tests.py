@@ -1,3 +1,85 @@
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from usuario.models import Usuario
+from .models import Personal
+
+import datetime
+
+def personal(curp, nombre='ANA', **campos):
+    return {'curp': curp, 'nombre': nombre, 'paterno': 'GOMEZ', 'fecha_nacimiento': '1956-01-01', **campos}
+
+class PersonalBulkTests(TestCase):
+    def setUp(self):
+        admin = Usuario.objects.create(
+            username='admin', first_name='A', paternal_surname='B', email='a@a.com', is_staff=True, is_superuser=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        Personal.objects.create(curp='GODE560101HDFRRN00', nombre='LUIS', paterno='GOMEZ', fecha_nacimiento=datetime.date(1956, 1, 1))
+
+    def test_crear_en_bloque_con_errores_por_objeto(self):
+        respuesta = self.client.post('/personal/', [
+            personal('GODE560101HDFRRN01', nombre='maria'),
+            personal('GODE560101HDFRRN00'),
+            personal('GODE560101HDFRRN02', fecha_nacimiento='2999-01-01'),
+            personal('GODE560101HDFRRN03', paterno=None),
+        ], format='json')
+        self.assertEqual(respuesta.status_code, 207, respuesta.data)
+        self.assertEqual((respuesta.data['created'], respuesta.data['errors']), (1, 3))
+        self.assertEqual([resultado['status'] for resultado in respuesta.data['results']], [201, 400, 400, 400])
+        self.assertIn('curp', respuesta.data['results'][1]['errors'])
+        self.assertIn('fecha_nacimiento', respuesta.data['results'][2]['errors'])
+        # Lo mismo que Personal.save()
+        self.assertEqual(Personal.objects.get(pk='GODE560101HDFRRN01').nombre, 'MARIA')
+
+    def test_atomico_no_escribe_si_un_objeto_falla(self):
+        respuesta = self.client.post('/personal/?atomico=1', [
+            personal('GODE560101HDFRRN01'),
+            personal('GODE560101HDFRRN01'),
+        ], format='json')
+        self.assertEqual(respuesta.status_code, 400, respuesta.data)
+        self.assertEqual(respuesta.data['created'], 0)
+        self.assertEqual(Personal.objects.count(), 1)
+
+    def test_actualizar_en_bloque(self):
+        respuesta = self.client.patch('/personal/', [
+            {'curp': 'GODE560101HDFRRN00', 'materno': 'diaz'},
+            {'curp': 'GODE560101HDFRRN09', 'materno': 'DIAZ'},
+        ], format='json')
+        self.assertEqual(respuesta.status_code, 207, respuesta.data)
+        self.assertEqual([resultado['status'] for resultado in respuesta.data['results']], [200, 400])
+        self.assertEqual(Personal.objects.get().materno, 'DIAZ')
+
+class ClaveBusquedaTests(TestCase):
+    def setUp(self):
+        self.personal = Personal.objects.create(
+            curp='GODE560101HDFRRN00', nombre='Luis', paterno='Gómez', fecha_nacimiento=datetime.date(1956, 1, 1)
+        )
+
+    def clave(self):
+        return Personal.objects.values_list('clave_busqueda', flat=True).get(pk=self.personal.pk)
+
+    def test_se_calcula_al_guardar(self):
+        self.assertEqual(self.clave(), 'LUIS GOMEZ')
+        self.personal.materno = 'Núñez'
+        self.personal.save(update_fields=['materno'])
+        self.assertEqual(self.clave(), 'LUIS GOMEZ NUNEZ')
+
+    def test_escrituras_en_bloque_la_mantienen(self):
+        # clave_busqueda no se indica en los campos a actualizar
+        self.personal.nombre = 'José'
+        Personal.objects.bulk_update([self.personal], ['nombre'])
+        self.assertEqual(self.clave(), 'JOSE GOMEZ')
+
+        Personal.objects.bulk_create([
+            Personal(curp='GODE560101HDFRRN01', nombre='ÁNGEL', paterno='PEÑA', fecha_nacimiento=datetime.date(1956, 1, 1))
+        ])
+        self.assertEqual(Personal.objects.get(pk='GODE560101HDFRRN01').clave_busqueda, 'ANGEL PENA')
+
+    def test_upsert_en_bloque_la_mantiene(self):
+        self.personal.paterno = 'Pérez'
+        Personal.objects.bulk_create(
+            [self.personal], update_conflicts=True, unique_fields=['curp'], update_fields=['paterno']
+        )
+        self.assertEqual(self.clave(), 'LUIS PEREZ')
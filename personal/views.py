@@ -3,11 +3,33 @@ from .serializers import PersonalSerializer
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
 from backend.permissions import IsAdminUserOrReadOnly
+from backend.pagination import KeysetPagination
+from backend.filters import QueryParamFilter, SparseFieldsMixin
+from backend.bulk import BulkMixin
+import datetime
 
-class PersonalList(generics.ListCreateAPIView):
+class PersonalList(SparseFieldsMixin, BulkMixin, generics.ListCreateAPIView):
     queryset = Personal.objects.all()
     serializer_class = PersonalSerializer
     permission_classes = [IsAuthenticated&IsAdminUserOrReadOnly]
+    pagination_class = KeysetPagination
+    filter_backends = [QueryParamFilter]
+    query_filters = {'genero': 'genero'}
+
+    def prepare_instance(self, personal):
+        # Lo mismo que Personal.save(), que bulk_create no llama
+        personal.curp = personal.curp.upper()
+        personal.nombre = personal.nombre.upper()
+        personal.paterno = personal.paterno.upper() if personal.paterno else None
+        personal.materno = personal.materno.upper() if personal.materno else None
+
+    def validate_batch(self, batch):
+        # Reglas de PersonalSerializer y de la restricción paterno_o_materno, sin consultas
+        for index, personal in batch.pending():
+            if batch.sent(index, 'fecha_nacimiento') and personal.fecha_nacimiento > datetime.date.today():
+                batch.add_error(index, 'Fecha de nacimiento no puede ser una fecha futura', 'fecha_nacimiento')
+            if not personal.paterno and not personal.materno:
+                batch.add_error(index, 'Necesita por lo menos un apellido paterno o materno')
 
 class PersonalDetail(generics.RetrieveUpdateDestroyAPIView):
     queryset = Personal.objects.all()
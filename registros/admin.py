@@ -1,4 +1,4 @@
 from django.contrib import admin
-from .models import Ingreso, Egreso, Titulacion, LiberacionIngles
+from .models import Ingreso, Egreso, Titulacion, LiberacionIngles, Carga, Corte
 
-admin.site.register([Ingreso, Egreso, Titulacion, LiberacionIngles])
+admin.site.register([Ingreso, Egreso, Titulacion, LiberacionIngles, Carga, Corte])
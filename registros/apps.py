@@ -1,6 +1,29 @@
 from django.apps import AppConfig
+from django.db import router
+from django.db.models.signals import post_migrate, post_save, post_delete
 
 
 class RegistrosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'registros'
+
+    def ready(self):
+        from alumnos.models import Alumno
+        from carreras.models import Carrera
+        from personal.models import Personal
+        from planes.models import Plan
+        from . import versiones
+        from .models import Ingreso, Egreso, Titulacion, LiberacionIngles, Corte
+
+        # Versión de los datos de analítica (ver versiones.py)
+        for modelo in (Ingreso, Egreso, Titulacion, LiberacionIngles, Corte, Alumno, Personal, Plan, Carrera):
+            for nombre, senal in (('save', post_save), ('delete', post_delete)):
+                senal.connect(versiones.datosCambiados, sender=modelo, dispatch_uid=f'version_datos_{modelo._meta.model_name}_{nombre}')
+
+        # Los cortes realizados antes de la bitácora se registran al migrar
+        post_migrate.connect(registrarCortesExistentes, sender=self, dispatch_uid='registrar_cortes_existentes')
+
+def registrarCortesExistentes(sender, using, **kwargs):
+    from .models import Corte
+    if router.allow_migrate_model(using, Corte):
+        Corte.objects.registrar_existentes(using=using)
@@ -0,0 +1,159 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Inicializa Django en cada proceso del pool, los procesos se crean con 'spawn'
+# para no heredar conexiones a la base de datos ni hilos del proceso web
+def iniciarWorker():
+    import django
+    django.setup()
+
+# Pool compartido por todas las cargas del proceso web. Iniciar los procesos e
+# importar Django en cada uno cuesta más que validar un archivo mediano, así que
+# se paga una sola vez: el pool se crea con la primera carga grande y se reutiliza
+_pool = None
+_pool_procesos = 0
+_pool_lock = threading.Lock()
+
+def obtenerPool(num_procesos):
+    """Regresa el pool compartido con por lo menos num_procesos procesos"""
+    global _pool, _pool_procesos
+    with _pool_lock:
+        if _pool is None or _pool_procesos < num_procesos:
+            if _pool is not None:
+                # Las tareas ya enviadas al pool anterior terminan antes de cerrarlo
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(
+                max_workers=num_procesos,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=iniciarWorker
+            )
+            _pool_procesos = num_procesos
+            logger.info(f"Pool de ingesta iniciado con {num_procesos} procesos")
+        return _pool
+
+def descartarPool(pool):
+    """Descarta el pool compartido si es el indicado, por ejemplo si un proceso murió"""
+    global _pool, _pool_procesos
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+            _pool_procesos = 0
+    pool.shutdown(wait=False, cancel_futures=True)
+
+# Valida un lote de filas de ingresos recibido por columnas.
+# Solo realiza trabajo de CPU (expresiones regulares y validación de campos), nunca
+# consulta la base de datos, por lo que puede ejecutarse en otro proceso. Regresa una
+# lista en el mismo orden de entrada con tuplas (fila, error, carrera, personal, ingreso),
+# donde error es None si la fila es válida y personal e ingreso son diccionarios con los
+# campos de cada modelo: los modelos se construyen en el proceso web (construirModelos),
+# enviar diccionarios entre procesos es mucho más barato que enviar instancias del ORM
+def validarColumnas(columnas, carreras):
+    from personal.models import Personal, obtenerFechaNac, obtenerGenero
+    from alumnos.models import Alumno
+    from registros.models import Ingreso
+
+    resultados = []
+    for i, fila in enumerate(columnas['fila']):
+        curp = columnas['curp'][i]
+        no_control = columnas['no_control'][i]
+        carrera = columnas['carrera'][i]
+        try:
+            Personal.validate_curp(curp)
+            Alumno.validate_nocontrol(no_control)
+
+            if carrera not in carreras:
+                resultados.append((fila, {
+                    'type': 'CarreraDoesNotExist',
+                    'message': f'La carrera {carrera} no existe',
+                    'row_index': fila
+                }, carrera, None, None))
+                continue
+
+            ingreso = {
+                'alumno_id': no_control,
+                'periodo': columnas['periodo'][i],
+                'tipo': columnas['tipo'][i],
+            }
+            # Las validaciones que dependen de otros registros se hacen después con los datos precargados
+            Ingreso(**ingreso).clean_fields(exclude=['alumno', 'num_semestre'])
+
+            personal = {
+                'curp': curp,
+                'paterno': columnas['paterno'][i],
+                'materno': columnas['materno'][i],
+                'nombre': columnas['nombre'][i],
+                'fecha_nacimiento': obtenerFechaNac(curp),
+                'genero': obtenerGenero(curp),
+            }
+            resultados.append((fila, None, carrera, personal, ingreso))
+
+        except Exception as ex:
+            resultados.append((fila, {
+                'type': str(type(ex)),
+                'message': str(ex),
+                'row_index': fila
+            }, carrera, None, None))
+    return resultados
+
+def construirModelos(resultados):
+    """Convierte los diccionarios de validarColumnas en instancias de Personal e Ingreso"""
+    from personal.models import Personal
+    from registros.models import Ingreso
+
+    return [
+        (fila, error, carrera, None, None) if error is not None
+        else (fila, error, carrera, Personal(**personal), Ingreso(**ingreso))
+        for fila, error, carrera, personal, ingreso in resultados
+    ]
+
+class MotorIngesta:
+    """
+    Ejecuta validarColumnas sobre lotes de filas en el pool compartido de procesos.
+
+    Con un solo proceso la validación se ejecuta en el proceso actual, lo que
+    evita el pool en archivos pequeños. En ambos casos enviar() regresa un Future
+    con los resultados de validarColumnas, y quien lo usa es responsable de
+    consumirlos en el orden en que envió los lotes. Al salir se cancelan los lotes
+    que no se alcanzaron a procesar, el pool sigue disponible para otras cargas.
+    """
+    def __init__(self, num_procesos=1):
+        self.num_procesos = num_procesos
+        self.pool = None
+        self.futures = []
+
+    def __enter__(self):
+        if self.num_procesos > 1:
+            self.pool = obtenerPool(self.num_procesos)
+        return self
+
+    def __exit__(self, *args):
+        for future in self.futures:
+            future.cancel()
+        self.futures = []
+        self.pool = None
+
+    def enviar(self, columnas, carreras):
+        if self.pool is None:
+            future = Future()
+            try:
+                future.set_result(validarColumnas(columnas, carreras))
+            except Exception as ex:
+                future.set_exception(ex)
+            return future
+
+        try:
+            future = self.pool.submit(validarColumnas, columnas, carreras)
+        except BrokenProcessPool:
+            # Un proceso del pool murió (por ejemplo por falta de memoria), se crea otro pool
+            descartarPool(self.pool)
+            self.pool = obtenerPool(self.num_procesos)
+            future = self.pool.submit(validarColumnas, columnas, carreras)
+        # Solo se guardan los lotes pendientes, los terminados ya no se pueden cancelar
+        self.futures = [pendiente for pendiente in self.futures if not pendiente.done()]
+        self.futures.append(future)
+        return future
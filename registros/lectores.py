@@ -0,0 +1,350 @@
+import openpyxl
+import pandas as pd
+import datetime
+import itertools
+import math
+import os
+
+# Normaliza el valor de una celda a un tipo uniforme para los importadores
+# - None, NaN y cadenas vacías se devuelven como None
+# - Los números enteros (aunque Excel los guarde como float) se devuelven como cadena sin decimales
+# - Las fechas se conservan como date/datetime
+# - Cualquier otro valor se devuelve como cadena sin espacios al inicio y al final
+def limpiarCelda(value):
+    if value is None:
+        return None
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value
+    if isinstance(value, bool):
+        return str(value)
+    if isinstance(value, float):
+        if math.isnan(value):
+            return None
+        if value.is_integer():
+            return str(int(value))
+    value = str(value).strip()
+    return value if value else None
+
+def tamanoArchivo(file_obj):
+    """Tamaño en bytes del archivo, de los archivos subidos o buscando el final"""
+    tamano = getattr(file_obj, 'size', None)
+    if tamano is None:
+        posicion = file_obj.tell()
+        tamano = file_obj.seek(0, os.SEEK_END)
+        file_obj.seek(posicion)
+    return tamano
+
+def estimarFilas(tamano, filas_muestra, bytes_muestra):
+    """Filas del archivo completo según las filas y los bytes de una muestra"""
+    if not filas_muestra or not bytes_muestra:
+        return None
+    return max(filas_muestra, round(tamano * filas_muestra / bytes_muestra))
+
+class LectorBase:
+    """
+    Interfaz común de los lectores de archivos de carga.
+
+    Cada lector expone los encabezados normalizados y entrega las filas conforme
+    se van leyendo, por lo que el procesamiento puede comenzar de inmediato y el
+    consumo de memoria se mantiene acotado sin importar el tamaño del archivo.
+
+    Cada fila se entrega como una tupla (numero_fila, valores), donde numero_fila
+    es el renglón que ocupa en el archivo (la fila de encabezados es la 1).
+    Las subclases implementan leer_encabezados() y leer_filas().
+    """
+    FILA_ENCABEZADOS = 1
+
+    def __init__(self, file_obj, num_columnas=None):
+        self.file_obj = file_obj
+        encabezados = self.leer_encabezados()
+        if encabezados is None:
+            self.close()
+            raise Exception('Archivo vacío')
+        if num_columnas is None:
+            # Ignorar columnas vacías al final de los encabezados
+            num_columnas = len(encabezados)
+            while num_columnas > 0 and limpiarCelda(encabezados[num_columnas - 1]) is None:
+                num_columnas -= 1
+        self.num_columnas = num_columnas
+        self.encabezados = self.normalizar(encabezados)
+        self._numero_fila = self.FILA_ENCABEZADOS
+        self._filas = None
+        self.tamano_lote = 500
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        pass
+
+    @property
+    def total_filas(self):
+        """Número estimado de filas de datos, None si el formato no lo permite conocer"""
+        return None
+
+    def leer_encabezados(self):
+        raise NotImplementedError("Las subclases deben implementar leer_encabezados")
+
+    def leer_filas(self):
+        raise NotImplementedError("Las subclases deben implementar leer_filas")
+
+    def normalizar(self, fila):
+        """Recorta o rellena la fila al número de columnas esperado y limpia sus valores"""
+        valores = tuple(limpiarCelda(value) for value in fila[:self.num_columnas])
+        if len(valores) < self.num_columnas:
+            valores += (None,) * (self.num_columnas - len(valores))
+        return valores
+
+    def filas(self):
+        """
+        Iterador de las filas de datos, omitiendo las que están completamente vacías.
+        Es el mismo en cada llamada: el archivo se lee una sola vez y quien lo vuelve
+        a pedir continúa donde se quedó la lectura anterior.
+        """
+        if self._filas is None:
+            self._filas = self.generar_filas()
+        return self._filas
+
+    def generar_filas(self):
+        for fila in self.leer_filas():
+            self._numero_fila += 1
+            valores = self.normalizar(fila)
+            if all(value is None for value in valores):
+                continue
+            yield self._numero_fila, valores
+
+    def lotes(self, tamano=500):
+        """
+        Genera listas de hasta `tamano` filas de datos. El tamaño se puede ajustar
+        entre lotes con `tamano_lote`, por ejemplo después de medir el primero.
+        """
+        self.tamano_lote = tamano
+        lote = []
+        for fila in self.filas():
+            lote.append(fila)
+            if len(lote) >= self.tamano_lote:
+                yield lote
+                lote = []
+        if lote:
+            yield lote
+
+class LectorExcel(LectorBase):
+    """
+    Lector de archivos de Excel en modo de solo lectura.
+
+    Utiliza openpyxl con read_only=True y values_only=True, por lo que nunca se
+    construyen objetos de celda.
+    """
+    def leer_encabezados(self):
+        self.wb = openpyxl.load_workbook(self.file_obj, read_only=True, data_only=True)
+        self.ws = self.wb.active
+        self._renglones = self.ws.iter_rows(min_row=self.FILA_ENCABEZADOS, values_only=True)
+        return next(self._renglones, None)
+
+    def leer_filas(self):
+        return self._renglones
+
+    def close(self):
+        # En modo solo lectura el archivo permanece abierto hasta cerrar el libro
+        self.wb.close()
+
+    @property
+    def total_filas(self):
+        """Número estimado de filas de datos según las dimensiones declaradas en el archivo"""
+        max_row = self.ws.max_row
+        if max_row is None:
+            return None
+        return max(0, max_row - self.FILA_ENCABEZADOS)
+
+class LectorCSV(LectorBase):
+    """
+    Lector de archivos CSV.
+
+    El archivo se lee por bloques con pandas, todas las columnas como texto,
+    para que los números de control y periodos no pierdan su formato. El total
+    de filas se estima con el tamaño del archivo y las líneas de una muestra.
+    """
+    TAMANO_BLOQUE = 5000
+    BYTES_MUESTRA = 64 * 1024
+
+    def leer_encabezados(self):
+        self._num_filas = self.estimar_filas()
+        self._bloques = pd.read_csv(
+            self.file_obj,
+            header=None,
+            dtype=str,
+            keep_default_na=False,
+            na_values=[''],
+            skip_blank_lines=False,
+            encoding='utf-8-sig',
+            chunksize=self.TAMANO_BLOQUE
+        )
+        self._bloque_actual = None
+        for bloque in self._bloques:
+            filas = bloque.itertuples(index=False, name=None)
+            encabezados = next(filas, None)
+            if encabezados is not None:
+                self._bloque_actual = filas
+                return encabezados
+        return None
+
+    def leer_filas(self):
+        if self._bloque_actual is not None:
+            yield from self._bloque_actual
+            self._bloque_actual = None
+        for bloque in self._bloques:
+            yield from bloque.itertuples(index=False, name=None)
+
+    def close(self):
+        self._bloques.close()
+
+    def estimar_filas(self):
+        posicion = self.file_obj.tell()
+        muestra = self.file_obj.read(self.BYTES_MUESTRA)
+        self.file_obj.seek(posicion)
+        salto = b'\n' if isinstance(muestra, bytes) else '\n'
+        lineas = muestra.count(salto)
+        tamano = tamanoArchivo(self.file_obj) - posicion
+        if len(muestra) >= tamano:
+            # La muestra es el archivo completo, la última línea puede no terminar en salto
+            if muestra and not muestra.endswith(salto):
+                lineas += 1
+            return max(0, lineas - 1)
+        total = estimarFilas(tamano, lineas, len(muestra))
+        return None if total is None else total - 1
+
+    @property
+    def total_filas(self):
+        """Número estimado de filas de datos, con líneas vacías incluidas"""
+        return self._num_filas
+
+class LectorArrow(LectorBase):
+    """
+    Lector de archivos columnares Parquet y Arrow (IPC/Feather, como archivo o
+    como stream).
+
+    Los datos se leen por record batches de pyarrow y cada columna del batch se
+    convierte a valores de Python de una vez (una copia por batch, no es una
+    lectura sin copia), sin parsear texto celda por celda. Los encabezados son
+    los nombres de las columnas del esquema. El total de filas sale de los
+    metadatos de Parquet y de los record batches del archivo IPC; en un stream
+    se estima con el tamaño del archivo y el primer batch.
+    """
+    TAMANO_BLOQUE = 5000
+
+    def __init__(self, file_obj, num_columnas=None, formato='parquet'):
+        self.formato = formato
+        super().__init__(file_obj, num_columnas)
+
+    def leer_encabezados(self):
+        try:
+            import pyarrow.parquet as pq
+            import pyarrow.ipc as ipc
+        except ImportError:
+            raise Exception('Se necesita el paquete pyarrow para leer archivos Parquet o Arrow')
+
+        if self.formato == 'parquet':
+            self._archivo = pq.ParquetFile(self.file_obj)
+            self._num_filas = self._archivo.metadata.num_rows
+            self._batches = self._archivo.iter_batches(batch_size=self.TAMANO_BLOQUE)
+            nombres = self._archivo.schema_arrow.names
+        else:
+            import pyarrow as pa
+            posicion = self.file_obj.tell()
+            try:
+                self._archivo = ipc.open_file(self.file_obj)
+            except pa.ArrowInvalid:
+                # No es un archivo IPC con pie, se lee como stream
+                self.file_obj.seek(posicion)
+                return self.abrir_stream(ipc, posicion)
+            self._num_filas = self.contar_filas_ipc()
+            self._batches = (
+                self._archivo.get_batch(i)
+                for i in range(self._archivo.num_record_batches)
+            )
+            nombres = self._archivo.schema.names
+        return tuple(nombres) if nombres else None
+
+    def abrir_stream(self, ipc, posicion):
+        self._archivo = ipc.open_stream(self.file_obj)
+        nombres = self._archivo.schema.names
+        try:
+            primero = self._archivo.read_next_batch()
+        except StopIteration:
+            self._num_filas = 0
+            self._batches = iter(())
+        else:
+            # El stream no declara su número de filas, se estima con lo que ocupa el primer batch
+            self._num_filas = estimarFilas(
+                tamanoArchivo(self.file_obj) - posicion,
+                primero.num_rows,
+                self.file_obj.tell() - posicion
+            )
+            self._batches = itertools.chain([primero], self._archivo)
+        return tuple(nombres) if nombres else None
+
+    def contar_filas_ipc(self):
+        # count_rows lee solo los metadatos de cada record batch (pyarrow 15 o posterior)
+        if hasattr(self._archivo, 'count_rows'):
+            return self._archivo.count_rows()
+        if not self._archivo.num_record_batches:
+            return 0
+        primero = self._archivo.get_batch(0)
+        return estimarFilas(tamanoArchivo(self.file_obj), primero.num_rows, primero.nbytes)
+
+    def leer_filas(self):
+        for batch in self._batches:
+            columnas = [columna.to_pylist() for columna in batch.columns]
+            yield from zip(*columnas)
+
+    @property
+    def total_filas(self):
+        return self._num_filas
+
+# Formatos soportados por extensión y por tipo de contenido
+FORMATOS_EXTENSION = {
+    '.xlsx': 'excel',
+    '.xlsm': 'excel',
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.arrow': 'arrow',
+    '.arrows': 'arrow',
+    '.feather': 'arrow',
+}
+
+FORMATOS_CONTENT_TYPE = {
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': 'excel',
+    'application/vnd.ms-excel.sheet.macroenabled.12': 'excel',
+    'text/csv': 'csv',
+    'application/csv': 'csv',
+    'application/vnd.apache.parquet': 'parquet',
+    'application/x-parquet': 'parquet',
+    'application/vnd.apache.arrow.file': 'arrow',
+    'application/vnd.apache.arrow.stream': 'arrow',
+}
+
+def detectarFormato(filename=None, content_type=None):
+    """Determina el formato del archivo por su extensión o, si no se reconoce, por su tipo de contenido"""
+    if filename:
+        extension = os.path.splitext(filename)[1].lower()
+        if extension in FORMATOS_EXTENSION:
+            return FORMATOS_EXTENSION[extension]
+    if content_type:
+        content_type = content_type.split(';')[0].strip().lower()
+        if content_type in FORMATOS_CONTENT_TYPE:
+            return FORMATOS_CONTENT_TYPE[content_type]
+    # Por compatibilidad, lo que no se reconoce se trata como Excel
+    return 'excel'
+
+def obtenerLector(file_obj, filename=None, num_columnas=None):
+    """Crea el lector adecuado para el archivo recibido"""
+    formato = detectarFormato(filename, getattr(file_obj, 'content_type', None))
+    if formato == 'csv':
+        return LectorCSV(file_obj, num_columnas)
+    if formato in ('parquet', 'arrow'):
+        return LectorArrow(file_obj, num_columnas, formato=formato)
+    return LectorExcel(file_obj, num_columnas)
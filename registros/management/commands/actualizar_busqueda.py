@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from personal.models import Personal
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula la llave de búsqueda (nombre y apellidos sin acentos) de la información '
+        'personal. Se necesita una vez después de agregar la columna a una base con datos; '
+        'después la mantienen save() y las cargas en bloque.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        consulta = Personal.objects.only('curp', *Personal.CAMPOS_BUSQUEDA).order_by('curp')
+        actualizados = 0
+        lote = []
+        for personal in consulta.iterator(chunk_size=batch_size):
+            lote.append(personal)
+            if len(lote) >= batch_size:
+                actualizados += self.actualizar(lote)
+                lote = []
+        if lote:
+            actualizados += self.actualizar(lote)
+        self.stdout.write(self.style.SUCCESS(f'{actualizados} registros de información personal actualizados'))
+
+    def actualizar(self, lote):
+        for personal in lote:
+            personal.actualizar_clave_busqueda()
+        Personal.objects.bulk_update(lote, ['clave_busqueda'])
+        return len(lote)
@@ -0,0 +1,300 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from registros.models import Ingreso, Egreso, Titulacion, LiberacionIngles
+from registros.periodos import calcularPeriodo, getPeriodoActual
+from personal.models import Personal, obtenerFechaNac, obtenerGenero
+from alumnos.models import Alumno
+from carreras.models import Carrera
+from planes.models import Plan
+
+import datetime
+import openpyxl
+import os
+import random
+import re
+import time
+
+NOMBRES_H = [
+    'JOSE', 'JUAN', 'LUIS', 'CARLOS', 'JORGE', 'MIGUEL', 'PEDRO', 'RICARDO', 'FERNANDO', 'DANIEL',
+    'ALEJANDRO', 'ROBERTO', 'FRANCISCO', 'EDUARDO', 'SERGIO', 'JAVIER', 'RAUL', 'ARTURO', 'DIEGO', 'MARIO',
+]
+NOMBRES_M = [
+    'MARIA', 'GUADALUPE', 'ANA', 'LAURA', 'PATRICIA', 'ROSA', 'SOFIA', 'ELENA', 'VERONICA', 'DANIELA',
+    'FERNANDA', 'GABRIELA', 'ALEJANDRA', 'ADRIANA', 'MONICA', 'CLAUDIA', 'LETICIA', 'PAOLA', 'KARLA', 'VALERIA',
+]
+APELLIDOS = [
+    'HERNANDEZ', 'GARCIA', 'MARTINEZ', 'LOPEZ', 'GONZALEZ', 'PEREZ', 'RODRIGUEZ', 'SANCHEZ', 'RAMIREZ', 'CRUZ',
+    'FLORES', 'GOMEZ', 'MORALES', 'VAZQUEZ', 'REYES', 'JIMENEZ', 'TORRES', 'DIAZ', 'GUTIERREZ', 'RUIZ',
+    'MENDOZA', 'AGUILAR', 'ORTIZ', 'MORENO', 'CASTILLO', 'ROMERO', 'ALVAREZ', 'MENDEZ', 'CHAVEZ', 'RIVERA',
+    'JUAREZ', 'RAMOS', 'DOMINGUEZ', 'HERRERA', 'MEDINA', 'CASTRO', 'VARGAS', 'GUZMAN', 'VELAZQUEZ', 'ROJAS',
+]
+ENTIDADES = [
+    'AS', 'BC', 'BS', 'CC', 'CL', 'CM', 'CS', 'CH', 'DF', 'DG', 'GT', 'GR', 'HG', 'JC', 'MC', 'MN',
+    'MS', 'NT', 'NL', 'OC', 'PL', 'QT', 'QR', 'SP', 'SL', 'SR', 'TC', 'TS', 'TL', 'VZ', 'YN', 'ZS',
+]
+CONSONANTES = 'BCDFGHJKLMNPQRSTVWXYZ'
+HOMOCLAVE = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+
+# Probabilidades de las trayectorias de los alumnos
+TIPOS_NUEVO_INGRESO = [('EX', 0.88), ('EQ', 0.04), ('TR', 0.04), ('CO', 0.04)]
+TIPOS_TITULACION = [('RE', 0.70), ('TE', 0.20), ('DU', 0.10)]
+SEMESTRES_PLAN = 9
+PROB_BAJA_TEMPORAL = 0.03
+PROB_TITULACION = 0.70
+PROB_LIBERACION = 0.85
+
+def riesgoDesercion(num_semestre):
+    """Probabilidad de abandonar la carrera al terminar un semestre, mayor en los primeros"""
+    if num_semestre <= 2:
+        return 0.10
+    if num_semestre <= 4:
+        return 0.05
+    return 0.02
+
+def elegir(rng, opciones):
+    """Elige un valor de una lista de (valor, probabilidad)"""
+    return rng.choices([valor for valor, _ in opciones], weights=[peso for _, peso in opciones])[0]
+
+def consonanteInterna(palabra):
+    for letra in palabra[1:]:
+        if letra in CONSONANTES:
+            return letra
+    return 'X'
+
+def generarCurp(rng, paterno, materno, nombre, fecha, genero, usadas):
+    """Genera una CURP con la estructura oficial a partir de los datos de la persona, sin repetir"""
+    vocal = next((letra for letra in paterno[1:] if letra in 'AEIOU'), 'X')
+    base = (
+        f'{paterno[0]}{vocal}{materno[0]}{nombre[0]}'
+        f'{fecha:%y%m%d}{genero}{rng.choice(ENTIDADES)}'
+        f'{consonanteInterna(paterno)}{consonanteInterna(materno)}{consonanteInterna(nombre)}'
+    )
+    while True:
+        curp = f'{base}{rng.choice(HOMOCLAVE)}{rng.randint(0, 9)}'
+        if curp not in usadas:
+            usadas.add(curp)
+            return curp
+
+class Command(BaseCommand):
+    help = (
+        'Genera una institución sintética (carreras, planes, alumnos y sus registros) con '
+        'trayectorias realistas de reingreso, deserción, egreso y titulación. Los datos se '
+        'insertan en la base de datos o, con --salida, se escriben en archivos de Excel con '
+        'el formato de las vistas de subida de registros.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--carreras', type=int, default=5, help='Número de carreras, se usan las existentes y se crean las que falten')
+        parser.add_argument('--planes', type=int, default=1, help='Planes de estudio por carrera')
+        parser.add_argument('--anios', type=int, default=5, help='Años de cohortes a generar, dos cohortes por año')
+        parser.add_argument('--alumnos-por-cohorte', type=int, default=100, help='Alumnos de nuevo ingreso por carrera en cada cohorte')
+        parser.add_argument('--hasta', default=None, help='Último periodo a generar (por defecto el periodo actual)')
+        parser.add_argument('--semilla', type=int, default=0, help='Semilla para obtener siempre los mismos datos')
+        parser.add_argument('--salida', default=None, help='Directorio donde escribir los archivos de Excel en lugar de insertar en la base de datos')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Registros por inserción')
+
+    def handle(self, *args, **options):
+        inicio = time.time()
+        self.rng = random.Random(options['semilla'])
+        self.batch_size = options['batch_size']
+        hasta = options['hasta'] or getPeriodoActual()
+        if not re.match(r'^[12][0-9]{3}[13]$', hasta):
+            raise CommandError(f'Formato de periodo inválido: {hasta}')
+        if not 1 <= options['carreras'] <= 99:
+            raise CommandError('El número de carreras debe estar entre 1 y 99')
+        if options['alumnos_por_cohorte'] * 2 > 9999:
+            raise CommandError('No se pueden generar más de 9999 números de control por carrera y año')
+        if options['salida'] is None and options['hasta'] and options['hasta'] > getPeriodoActual():
+            raise CommandError('No se pueden insertar registros de periodos futuros')
+
+        anio_final = int(hasta[:4])
+        cohortes = [
+            f'{anio}{semestre}'
+            for anio in range(anio_final - options['anios'] + 1, anio_final + 1)
+            for semestre in (1, 3)
+            if f'{anio}{semestre}' <= hasta
+        ]
+        planes = self.preparar_catalogos(options['carreras'], options['planes'], cohortes[0])
+
+        self.salida = options['salida']
+        self.libros = {}
+        self.pendientes = {modelo: [] for modelo in (Personal, Alumno, Ingreso, Egreso, Titulacion, LiberacionIngles)}
+        self.totales = {modelo.__name__: 0 for modelo in self.pendientes}
+        # Se evitan las CURP y números de control que ya existen en la base de datos
+        self.curps = set(Personal.objects.values_list('curp', flat=True))
+        self.no_controls = set(Alumno.objects.values_list('no_control', flat=True))
+        self.consecutivos = {}
+
+        with transaction.atomic():
+            for cohorte in cohortes:
+                for indice, (carrera, planes_carrera) in enumerate(planes.items(), start=1):
+                    self.generar_cohorte(cohorte, carrera, indice, planes_carrera, options['alumnos_por_cohorte'], hasta)
+                    if sum(len(objetos) for objetos in self.pendientes.values()) >= self.batch_size:
+                        self.guardar()
+                self.stdout.write(f'Cohorte {cohorte} generada')
+            self.guardar()
+
+        if self.salida:
+            self.cerrar_libros()
+
+        resumen = ', '.join(f'{modelo}: {total}' for modelo, total in self.totales.items())
+        self.stdout.write(self.style.SUCCESS(f'{resumen} en {time.time() - inicio:.1f}s'))
+
+    def preparar_catalogos(self, num_carreras, num_planes, primera_cohorte):
+        """Obtiene las carreras y planes a usar, creando los que falten. Regresa {carrera: [planes]}"""
+        carreras = list(Carrera.objects.order_by('clave')[:num_carreras])
+        for i in range(len(carreras), num_carreras):
+            # El nombre de una carrera solo admite letras
+            sufijo = ''.join(chr(ord('A') + int(digito)) for digito in str(i + 1))
+            carreras.append(Carrera.objects.create(clave=f'SINT{i + 1:02d}', nombre=f'CARRERA SINTETICA {sufijo}'))
+
+        anio_inicial = int(primera_cohorte[:4])
+        planes = {}
+        for carrera in carreras:
+            planes_carrera = list(Plan.objects.filter(carrera=carrera).order_by('fecha_inicio'))
+            for i in range(len(planes_carrera), num_planes):
+                anio = anio_inicial + i * 5
+                planes_carrera.append(Plan.objects.create(
+                    clave=f'{carrera.clave}-SINT-{anio}',
+                    fecha_inicio=datetime.date(anio, 1, 1),
+                    carrera=carrera
+                ))
+            planes[carrera.clave] = planes_carrera
+        return planes
+
+    def generar_cohorte(self, cohorte, carrera, indice_carrera, planes, num_alumnos, hasta):
+        """Genera los alumnos de nuevo ingreso de una carrera en un periodo y todos sus registros"""
+        anio = int(cohorte[:4])
+        # El plan vigente es el más reciente que inició antes de la cohorte
+        fecha_cohorte = datetime.date(anio, 1 if cohorte[4] == '1' else 8, 1)
+        plan = next((p for p in reversed(planes) if p.fecha_inicio <= fecha_cohorte), planes[0])
+
+        for _ in range(num_alumnos):
+            genero = self.rng.choice('HM')
+            nombre = self.rng.choice(NOMBRES_H if genero == 'H' else NOMBRES_M)
+            paterno = self.rng.choice(APELLIDOS)
+            materno = self.rng.choice(APELLIDOS)
+            nacimiento = datetime.date(anio - self.rng.choice((17, 18, 18, 18, 19, 20)), self.rng.randint(1, 12), self.rng.randint(1, 28))
+            curp = generarCurp(self.rng, paterno, materno, nombre, nacimiento, genero, self.curps)
+            no_control = self.siguiente_no_control(anio, indice_carrera)
+
+            self.agregar_alumno(curp, no_control, paterno, materno, nombre, carrera, plan)
+            self.generar_trayectoria(no_control, cohorte, hasta, carrera, (curp, paterno, materno, nombre))
+
+    def siguiente_no_control(self, anio, indice_carrera):
+        """Siguiente número de control libre de la carrera en el año, omitiendo los que ya existen"""
+        clave = (anio % 100, indice_carrera)
+        while True:
+            consecutivo = self.consecutivos.get(clave, 0) + 1
+            if consecutivo > 9999:
+                raise CommandError(f'No quedan números de control disponibles para la carrera {indice_carrera} en {anio}')
+            self.consecutivos[clave] = consecutivo
+            no_control = f'{clave[0]:02d}{indice_carrera:02d}{consecutivo:04d}'
+            if no_control not in self.no_controls:
+                self.no_controls.add(no_control)
+                return no_control
+
+    def generar_trayectoria(self, no_control, cohorte, hasta, carrera, datos):
+        """Genera los ingresos semestrales del alumno hasta que egresa, deserta o se alcanza el periodo final"""
+        rng = self.rng
+        tipo = elegir(rng, TIPOS_NUEVO_INGRESO)
+        num_inicial = 1 if tipo == 'EX' else rng.randint(2, 4)
+        # Algunos alumnos necesitan más semestres para terminar
+        duracion = SEMESTRES_PLAN - num_inicial + 1 + elegir(rng, [(0, 0.70), (1, 0.20), (2, 0.07), (3, 0.03)])
+
+        ingresos = []
+        egreso = None
+        desplazamiento = 1
+        while True:
+            periodo = calcularPeriodo(cohorte, desplazamiento)
+            num_semestre = num_inicial + desplazamiento - 1
+            if periodo > hasta or num_semestre > 16:
+                break
+            ingresos.append((periodo, tipo if not ingresos else 'RE', num_semestre))
+            if len(ingresos) >= duracion:
+                egreso = periodo
+                break
+            if rng.random() < riesgoDesercion(num_semestre):
+                break
+            # Baja temporal, el alumno regresa un periodo después
+            if rng.random() < PROB_BAJA_TEMPORAL:
+                desplazamiento += 1
+            desplazamiento += 1
+
+        for periodo, tipo_ingreso, num_semestre in ingresos:
+            self.agregar_registro(Ingreso, no_control, periodo, tipo=tipo_ingreso, num_semestre=num_semestre, carrera=carrera, datos=datos)
+
+        if egreso is not None:
+            self.agregar_registro(Egreso, no_control, egreso)
+            if rng.random() < PROB_TITULACION:
+                periodo = calcularPeriodo(egreso, 1 + elegir(rng, [(0, 0.4), (1, 0.4), (2, 0.2)]))
+                if periodo <= hasta:
+                    self.agregar_registro(Titulacion, no_control, periodo, tipo=elegir(rng, TIPOS_TITULACION))
+
+        # La liberación de inglés se obtiene en los últimos semestres
+        avanzados = [periodo for periodo, _, num_semestre in ingresos if num_semestre >= 6]
+        if avanzados and rng.random() < (PROB_LIBERACION if egreso else PROB_LIBERACION / 2):
+            self.agregar_registro(LiberacionIngles, no_control, rng.choice(avanzados))
+
+    def agregar_alumno(self, curp, no_control, paterno, materno, nombre, carrera, plan):
+        if self.salida:
+            # Los datos del alumno van en las filas de sus ingresos
+            self.totales['Personal'] += 1
+            self.totales['Alumno'] += 1
+            return
+        self.pendientes[Personal].append(Personal(
+            curp=curp,
+            paterno=paterno,
+            materno=materno,
+            nombre=nombre,
+            fecha_nacimiento=obtenerFechaNac(curp),
+            genero=obtenerGenero(curp)
+        ))
+        self.pendientes[Alumno].append(Alumno(no_control=no_control, curp_id=curp, plan=plan))
+
+    def agregar_registro(self, modelo, no_control, periodo, carrera=None, datos=None, **campos):
+        if not self.salida:
+            self.pendientes[modelo].append(modelo(alumno_id=no_control, periodo=periodo, **campos))
+            return
+
+        # Cada archivo corresponde a una subida: un tipo de registro en un periodo
+        if modelo is Ingreso:
+            curp, paterno, materno, nombre = datos
+            self.escribir('ingresos', periodo, [curp, no_control, paterno, materno, nombre, carrera, campos['tipo']])
+        elif modelo is Egreso:
+            self.escribir('egresos', periodo, [no_control])
+        elif modelo is Titulacion:
+            self.escribir('titulaciones', periodo, [no_control, campos['tipo']])
+        else:
+            self.escribir('liberaciones-ingles', periodo, [no_control])
+        self.totales[modelo.__name__] += 1
+
+    def guardar(self):
+        """Inserta los registros pendientes respetando el orden de las llaves foráneas"""
+        for modelo, objetos in self.pendientes.items():
+            if objetos:
+                modelo.objects.bulk_create(objetos, batch_size=self.batch_size)
+                self.totales[modelo.__name__] += len(objetos)
+                objetos.clear()
+
+    def escribir(self, tipo, periodo, fila):
+        clave = (tipo, periodo)
+        if clave not in self.libros:
+            libro = openpyxl.Workbook(write_only=True)
+            hoja = libro.create_sheet()
+            if tipo == 'ingresos':
+                hoja.append(['CURP', 'NO_CONTROL', 'PATERNO', 'MATERNO', 'NOMBRE', 'CARRERA', periodo])
+            else:
+                hoja.append(['no_control', periodo])
+            self.libros[clave] = (libro, hoja)
+        self.libros[clave][1].append(fila)
+
+    def cerrar_libros(self):
+        os.makedirs(self.salida, exist_ok=True)
+        for (tipo, periodo), (libro, _) in sorted(self.libros.items()):
+            libro.save(os.path.join(self.salida, f'{tipo}_{periodo}.xlsx'))
+        self.stdout.write(
+            f'{len(self.libros)} archivos escritos en {self.salida}. Súbelos en orden de periodo: '
+            'primero ingresos, después egresos, titulaciones y liberaciones de inglés.'
+        )
@@ -0,0 +1,215 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from rest_framework.test import APIClient
+
+from registros.periodos import getPeriodoActual
+from personal.models import Personal
+from alumnos.models import Alumno
+from carreras.models import Carrera
+from usuario.models import Usuario
+
+from contextlib import ExitStack
+
+import datetime
+import io
+import json
+import statistics
+import time
+import tracemalloc
+
+# Rutas de analítica a medir y su presupuesto de consultas SQL: (consultas fijas,
+# consultas por alumno por carrera y cohorte). Si una ruta rebasa su presupuesto en
+# cualquier tamaño el comando termina con error. Los valores parten de lo medido con
+# tamaños de 2 a 100 y unas cuantas consultas de margen; las rutas cuyo número de
+# consultas crece con los alumnos tienen un presupuesto por alumno que se debe bajar
+# conforme se corrijan.
+PRESUPUESTOS = {
+    'indices/permanencia/': (55, 0.6),
+    'indices/egreso/': (66, 0.6),
+    'indices/titulacion/': (66, 0.6),
+    'indices/desercion/': (53, 0.6),
+    'indices/permanencia/generacional': (30, 0),
+    'indices/egreso/generacional': (180, 0),
+    'indices/titulacion/generacional': (200, 0),
+    'indices/desercion/generacional': (220, 9.5),
+    'reportes/nuevo-ingreso/': (5, 0),
+    'reportes/egreso/': (20, 0),
+    'reportes/titulacion/': (30, 0),
+    'cedulas/cacei/': (45, 0),
+    'cedulas/caceca/': (18, 0),
+    'tablas/poblacion/': (13, 0),
+    'tablas/crecimiento/': (12, 0),
+    'alumnos/historial': (10, 0),
+    'alumnos/buscar/': (3, 0),
+}
+
+def presupuesto(ruta, tamano):
+    fijas, por_alumno = PRESUPUESTOS[ruta]
+    return int(fijas + por_alumno * tamano)
+
+class Command(BaseCommand):
+    help = (
+        'Mide las rutas de analítica (índices, reportes, cédulas, tablas e historial) sobre '
+        'instituciones sintéticas de distintos tamaños en una base de datos de prueba. '
+        'Registra tiempo, número de consultas SQL y memoria pico de cada ruta, verifica los '
+        'presupuestos de consultas y escribe los resultados en un archivo JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', default='20,100', help='Alumnos por carrera en cada cohorte, separados por comas')
+        parser.add_argument('--carreras', type=int, default=3)
+        parser.add_argument('--anios', type=int, default=5)
+        parser.add_argument('--repeticiones', type=int, default=3, help='Veces que se mide cada ruta, se reporta la mediana')
+        parser.add_argument('--semilla', type=int, default=0)
+        parser.add_argument('--rutas', default=None, help='Medir solo las rutas que contengan este texto')
+        parser.add_argument('--salida', default='benchmark_analitica.json', help='Archivo JSON de resultados')
+        parser.add_argument('--comparar', default=None, help='Archivo JSON de una ejecución anterior para comparar tiempos')
+
+    def handle(self, *args, **options):
+        try:
+            tamanos = [int(tamano) for tamano in options['tamanos'].split(',')]
+        except ValueError:
+            raise CommandError('--tamanos debe ser una lista de números separados por comas')
+        rutas = [ruta for ruta in PRESUPUESTOS if not options['rutas'] or options['rutas'] in ruta]
+        anterior = self.cargar_anterior(options['comparar'])
+
+        # Las mediciones se hacen sobre una base de datos de prueba, nunca sobre la real
+        try:
+            setup_test_environment()
+        except RuntimeError:
+            # Dentro de las pruebas (registros.tests) ya se usa la base de datos de prueba
+            resultados = [self.medir_tamano(tamano, rutas, options, anterior) for tamano in tamanos]
+        else:
+            runner = DiscoverRunner(verbosity=0)
+            try:
+                bases = runner.setup_databases()
+                try:
+                    resultados = [self.medir_tamano(tamano, rutas, options, anterior) for tamano in tamanos]
+                finally:
+                    runner.teardown_databases(bases)
+            finally:
+                teardown_test_environment()
+
+        artefacto = {
+            'fecha': datetime.datetime.now().isoformat(timespec='seconds'),
+            'base_datos': connection.vendor,
+            'opciones': {clave: options[clave] for clave in ('carreras', 'anios', 'repeticiones', 'semilla')},
+            'tamanos': resultados,
+        }
+        with open(options['salida'], 'w', encoding='utf-8') as archivo:
+            json.dump(artefacto, archivo, indent=2, ensure_ascii=False)
+        self.stdout.write(f'Resultados escritos en {options["salida"]}')
+
+        fallidas = [
+            f'{ruta} (status {medicion["status"]}) con {tamano["alumnos"]} alumnos'
+            for tamano in resultados
+            for ruta, medicion in tamano['rutas'].items()
+            if medicion['status'] != 200
+        ]
+        if fallidas:
+            raise CommandError('Rutas con error: ' + '; '.join(fallidas))
+        excedidos = [
+            f'{ruta} ({medicion["consultas"]} > {medicion["presupuesto_consultas"]}) con {tamano["alumnos"]} alumnos'
+            for tamano in resultados
+            for ruta, medicion in tamano['rutas'].items()
+            if not medicion['dentro_presupuesto']
+        ]
+        if excedidos:
+            raise CommandError('Rutas fuera de su presupuesto de consultas: ' + '; '.join(excedidos))
+        self.stdout.write(self.style.SUCCESS('Todas las rutas dentro de su presupuesto de consultas'))
+
+    def cargar_anterior(self, ruta_archivo):
+        """Regresa {(alumnos, ruta): mediana_ms} de una ejecución anterior"""
+        if not ruta_archivo:
+            return {}
+        with open(ruta_archivo, encoding='utf-8') as archivo:
+            datos = json.load(archivo)
+        return {
+            (tamano['alumnos_por_cohorte'], ruta): medicion['tiempo_ms']['mediana']
+            for tamano in datos['tamanos']
+            for ruta, medicion in tamano['rutas'].items()
+        }
+
+    def medir_tamano(self, tamano, rutas, options, anterior):
+        # Cada tamaño parte de una institución nueva generada con la misma semilla
+        Alumno.objects.all().delete()
+        Personal.objects.all().delete()
+        call_command(
+            'generar_institucion',
+            carreras=options['carreras'],
+            anios=options['anios'],
+            alumnos_por_cohorte=tamano,
+            semilla=options['semilla'],
+            stdout=io.StringIO()
+        )
+        usuario, _ = Usuario.objects.get_or_create(
+            username='benchmark',
+            defaults={'first_name': 'Benchmark', 'paternal_surname': 'Benchmark', 'email': 'benchmark@example.com', 'is_staff': True, 'is_superuser': True}
+        )
+        cliente = APIClient()
+        cliente.force_authenticate(usuario)
+
+        # La primera cohorte generada tiene la trayectoria más larga
+        anio_final = int(getPeriodoActual()[:4])
+        parametros = {
+            'cohorte': f'{anio_final - options["anios"] + 1}1',
+            'carrera': Carrera.objects.order_by('clave').values_list('clave', flat=True).first(),
+            'semestres': '9',
+            'nuevo-ingreso': 'true',
+            'traslado-equivalencia': 'true',
+            'q': 'garc',
+        }
+        alumnos = Personal.objects.count()
+        self.stdout.write(f'{alumnos} alumnos ({tamano} por carrera y cohorte)')
+
+        # Una solicitud previa llena los cachés (permisos, versión de datos) para que su
+        # costo no se cuente en la primera ruta medida
+        cliente.get(f'/{rutas[0]}', parametros)
+
+        mediciones = {}
+        for ruta in rutas:
+            mediciones[ruta] = self.medir_ruta(cliente, ruta, parametros, options['repeticiones'], presupuesto(ruta, tamano))
+            medicion = mediciones[ruta]
+            linea = f'  {ruta:<36} {medicion["tiempo_ms"]["mediana"]:>9.1f} ms {medicion["consultas"]:>5} consultas {medicion["memoria_pico_kb"]:>9.0f} KB'
+            previo = anterior.get((tamano, ruta))
+            if previo:
+                linea += f'  ({medicion["tiempo_ms"]["mediana"] / previo:.2f}x)'
+            if not medicion['dentro_presupuesto']:
+                linea = self.style.ERROR(linea + f'  presupuesto: {medicion["presupuesto_consultas"]}')
+            self.stdout.write(linea)
+
+        return {'alumnos_por_cohorte': tamano, 'alumnos': alumnos, 'parametros': parametros, 'rutas': mediciones}
+
+    def medir_ruta(self, cliente, ruta, parametros, repeticiones, maximo):
+        """Mide tiempo y consultas en cada repetición, y la memoria pico en una ejecución aparte"""
+        url = f'/{ruta}'
+        tiempos = []
+        consultas = 0
+        status = None
+        for _ in range(max(1, repeticiones)):
+            # Con la réplica de analítica las consultas se reparten entre ambas conexiones
+            with ExitStack() as pila:
+                capturadas = [pila.enter_context(CaptureQueriesContext(conexion)) for conexion in connections.all()]
+                inicio = time.perf_counter()
+                respuesta = cliente.get(url, parametros)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            consultas = max(consultas, sum(len(captura) for captura in capturadas))
+            status = respuesta.status_code
+
+        # tracemalloc agrega costo a cada asignación, por eso no se mezcla con la medición de tiempo
+        tracemalloc.start()
+        cliente.get(url, parametros)
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            'status': status,
+            'tiempo_ms': {'mediana': statistics.median(tiempos), 'minimo': min(tiempos), 'maximo': max(tiempos)},
+            'consultas': consultas,
+            'presupuesto_consultas': maximo,
+            'dentro_presupuesto': consultas <= maximo,
+            'memoria_pico_kb': pico / 1024,
+        }
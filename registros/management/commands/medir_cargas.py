@@ -0,0 +1,264 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from registros.lectores import obtenerLector
+from registros.periodos import getPeriodoActual
+from registros.tareas import ProgresoCarga
+from registros.views import IngresoUpload, EgresoUpload, TitulacionUpload, LiberacionInglesUpload
+from registros.management.commands.generar_institucion import (
+    APELLIDOS, NOMBRES_H, NOMBRES_M, generarCurp
+)
+from personal.models import Personal
+from alumnos.models import Alumno
+from carreras.models import Carrera
+from planes.models import Plan
+
+import datetime
+import json
+import openpyxl
+import os
+import psutil
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+# Números de control por carrera, el consecutivo del número de control tiene cuatro dígitos
+ALUMNOS_POR_CARRERA = 9999
+
+class MonitorMemoria:
+    """
+    Registra el RSS máximo del proceso y sus hijos (el pool de validación) mientras
+    está activo, consultándolo cada INTERVALO segundos en un hilo aparte.
+    """
+    INTERVALO = 0.01
+
+    def __init__(self):
+        self.proceso = psutil.Process()
+        self.pico = 0
+        self._detener = threading.Event()
+
+    def rss(self):
+        total = self.proceso.memory_info().rss
+        for hijo in self.proceso.children(recursive=True):
+            try:
+                total += hijo.memory_info().rss
+            except psutil.NoSuchProcess:
+                pass
+        return total
+
+    def muestrear(self):
+        while not self._detener.is_set():
+            self.pico = max(self.pico, self.rss())
+            self._detener.wait(self.INTERVALO)
+
+    def __enter__(self):
+        self.pico = self.rss()
+        self._hilo = threading.Thread(target=self.muestrear, daemon=True)
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *args):
+        self._detener.set()
+        self._hilo.join()
+        self.pico = max(self.pico, self.rss())
+
+def vistaAjustada(vista_cls, chunk_size=None, procesos=None):
+    """Subclase de la vista de ingresos con tamaño de chunk y número de procesos fijos"""
+    atributos = {}
+    if chunk_size:
+        atributos['get_optimal_chunk_size'] = lambda self, total_records: chunk_size
+        atributos['get_optimal_chunk_configuration'] = lambda self, df, total_records=None: chunk_size
+    if procesos:
+        atributos['MIN_ROWS_PROCESS_POOL'] = 0
+        atributos['get_optimal_workers'] = lambda self, total_records: procesos
+    return type(vista_cls.__name__, (vista_cls,), atributos)
+
+class Command(BaseCommand):
+    help = (
+        'Mide el rendimiento de las subidas de ingresos, egresos, titulaciones y liberaciones '
+        'de inglés con archivos de Excel generados de distintos tamaños y una proporción de '
+        'filas inválidas. Para cada archivo registra el tiempo de lectura, validación y '
+        'escritura, las filas por segundo y el RSS pico, en una base de datos de prueba.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', default='1000,10000,100000', help='Filas por archivo, separadas por comas')
+        parser.add_argument('--invalidos', type=float, default=0.05, help='Proporción de filas inválidas (0 a 1)')
+        parser.add_argument('--chunk-sizes', default='auto', help='Tamaños de chunk a probar en ingresos, "auto" usa la heurística de la vista')
+        parser.add_argument('--procesos', default='auto', help='Procesos de validación a probar en ingresos, "auto" usa la heurística de la vista')
+        parser.add_argument('--semilla', type=int, default=0)
+        parser.add_argument('--salida', default='benchmark_cargas.json', help='Archivo JSON de resultados')
+
+    def handle(self, *args, **options):
+        try:
+            tamanos = [int(tamano) for tamano in options['tamanos'].split(',')]
+            chunk_sizes = [None if valor == 'auto' else int(valor) for valor in options['chunk_sizes'].split(',')]
+            procesos = [None if valor == 'auto' else int(valor) for valor in options['procesos'].split(',')]
+        except ValueError:
+            raise CommandError('--tamanos, --chunk-sizes y --procesos deben ser listas de números separados por comas')
+        if not 0 <= options['invalidos'] < 1:
+            raise CommandError('--invalidos debe estar entre 0 y 1')
+        if max(tamanos) > ALUMNOS_POR_CARRERA * 99:
+            raise CommandError(f'El tamaño máximo es {ALUMNOS_POR_CARRERA * 99} filas')
+
+        self.rng = random.Random(options['semilla'])
+        self.invalidos = options['invalidos']
+        self.periodo = getPeriodoActual()
+        self.directorio = tempfile.mkdtemp(prefix='medir_cargas_')
+
+        # Las mediciones se hacen sobre una base de datos de prueba, nunca sobre la real
+        setup_test_environment()
+        runner = DiscoverRunner(verbosity=0)
+        bases = runner.setup_databases()
+        try:
+            resultados = []
+            for tamano in tamanos:
+                resultados.extend(self.medir_tamano(tamano, chunk_sizes, procesos))
+        finally:
+            runner.teardown_databases(bases)
+            teardown_test_environment()
+            shutil.rmtree(self.directorio, ignore_errors=True)
+
+        artefacto = {
+            'fecha': datetime.datetime.now().isoformat(timespec='seconds'),
+            'base_datos': connection.vendor,
+            'cpus': os.cpu_count(),
+            'invalidos': self.invalidos,
+            'mediciones': resultados,
+        }
+        with open(options['salida'], 'w', encoding='utf-8') as archivo:
+            json.dump(artefacto, archivo, indent=2, ensure_ascii=False)
+        self.stdout.write(self.style.SUCCESS(f'Resultados escritos en {options["salida"]}'))
+
+    def medir_tamano(self, tamano, chunk_sizes, procesos):
+        self.stdout.write(f'{tamano} filas ({self.invalidos:.0%} inválidas)')
+        archivos = self.generar_archivos(tamano)
+        resultados = []
+
+        # Cada configuración de ingresos parte de una base de datos sin alumnos
+        for chunk_size in chunk_sizes:
+            for num_procesos in procesos:
+                self.limpiar()
+                vista_cls = vistaAjustada(IngresoUpload, chunk_size, num_procesos)
+                configuracion = {'chunk_size': chunk_size or 'auto', 'procesos': num_procesos or 'auto'}
+                resultados.append(self.medir(vista_cls, 'ingresos', archivos['ingresos'], tamano, configuracion))
+
+        # Los demás registros se suben sobre los alumnos creados por la última carga de ingresos
+        for tipo, vista_cls in (
+            ('egresos', EgresoUpload),
+            ('titulaciones', TitulacionUpload),
+            ('liberaciones-ingles', LiberacionInglesUpload),
+        ):
+            resultados.append(self.medir(vista_cls, tipo, archivos[tipo], tamano, {}))
+        return resultados
+
+    def medir(self, vista_cls, tipo, ruta, tamano, configuracion):
+        """
+        Lectura: recorrer el archivo con el lector. Validación: dry-run menos lectura.
+        Escritura: carga real menos dry-run.
+        """
+        with MonitorMemoria() as memoria:
+            inicio = time.perf_counter()
+            with open(ruta, 'rb') as archivo, obtenerLector(archivo, ruta) as lector:
+                for _ in lector.filas():
+                    pass
+            lectura = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            with open(ruta, 'rb') as archivo:
+                vista_cls().procesar(archivo, ruta, ProgresoCarga(), {'modo': 'crear', 'dry_run': True})
+            dry_run = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            with open(ruta, 'rb') as archivo:
+                status, resultado = vista_cls().procesar(archivo, ruta, ProgresoCarga(), {'modo': 'crear', 'dry_run': False})
+            total = time.perf_counter() - inicio
+
+        medicion = {
+            'tipo': tipo,
+            'filas': tamano,
+            **configuracion,
+            'status': status,
+            'creados': resultado.get('created', 0),
+            'errores': len(resultado.get('errors', [])),
+            'lectura_s': lectura,
+            'validacion_s': max(0.0, dry_run - lectura),
+            'escritura_s': max(0.0, total - dry_run),
+            'total_s': total,
+            'filas_por_segundo': tamano / total if total else None,
+            'rss_pico_mb': memoria.pico / (1024 * 1024),
+        }
+        etiqueta = tipo
+        if configuracion:
+            etiqueta += f' chunk={configuracion["chunk_size"]} procesos={configuracion["procesos"]}'
+        self.stdout.write(
+            f'  {etiqueta:<42} lectura {lectura:7.2f}s  validación {medicion["validacion_s"]:7.2f}s  '
+            f'escritura {medicion["escritura_s"]:7.2f}s  {medicion["filas_por_segundo"]:9.0f} filas/s  '
+            f'{medicion["rss_pico_mb"]:7.0f} MB  ({medicion["creados"]} creados, {medicion["errores"]} errores)'
+        )
+        return medicion
+
+    def limpiar(self):
+        Alumno.objects.all().delete()
+        Personal.objects.all().delete()
+
+    def preparar_carreras(self, num_carreras):
+        """Crea las carreras y planes necesarios para los números de control del archivo"""
+        claves = []
+        for i in range(1, num_carreras + 1):
+            clave = f'BENCH{i:02d}'
+            # El nombre de una carrera solo admite letras
+            sufijo = ''.join(chr(ord('A') + int(digito)) for digito in str(i))
+            carrera, _ = Carrera.objects.get_or_create(clave=clave, defaults={'nombre': f'CARRERA DE PRUEBA {sufijo}'})
+            Plan.objects.get_or_create(clave=f'{clave}-2000', defaults={'fecha_inicio': datetime.date(2000, 1, 1), 'carrera': carrera})
+            claves.append(clave)
+        return claves
+
+    def es_invalida(self):
+        return self.rng.random() < self.invalidos
+
+    def generar_archivos(self, tamano):
+        """Genera un archivo por tipo de registro; las filas inválidas se eligen al azar en cada uno"""
+        carreras = self.preparar_carreras((tamano - 1) // ALUMNOS_POR_CARRERA + 1)
+        anio = int(self.periodo[:4]) % 100
+        curps = set()
+        libros = {tipo: openpyxl.Workbook(write_only=True) for tipo in ('ingresos', 'egresos', 'titulaciones', 'liberaciones-ingles')}
+        hojas = {tipo: libro.create_sheet() for tipo, libro in libros.items()}
+        hojas['ingresos'].append(['CURP', 'NO_CONTROL', 'PATERNO', 'MATERNO', 'NOMBRE', 'CARRERA', self.periodo])
+        for tipo in ('egresos', 'titulaciones', 'liberaciones-ingles'):
+            hojas[tipo].append(['no_control', self.periodo])
+
+        for i in range(tamano):
+            indice_carrera, consecutivo = divmod(i, ALUMNOS_POR_CARRERA)
+            no_control = f'{anio:02d}{indice_carrera + 1:02d}{consecutivo + 1:04d}'
+            genero = self.rng.choice('HM')
+            nombre = self.rng.choice(NOMBRES_H if genero == 'H' else NOMBRES_M)
+            paterno = self.rng.choice(APELLIDOS)
+            materno = self.rng.choice(APELLIDOS)
+            nacimiento = datetime.date(2000 + self.rng.randint(0, 6), self.rng.randint(1, 12), self.rng.randint(1, 28))
+            curp = generarCurp(self.rng, paterno, materno, nombre, nacimiento, genero, curps)
+            carrera = carreras[indice_carrera]
+
+            if self.es_invalida():
+                # Cada fila inválida falla por una razón distinta
+                curp, no_control, carrera = self.rng.choice([
+                    ('CURP-INVALIDA', no_control, carrera),
+                    (curp, 'X' + no_control, carrera),
+                    (curp, no_control, 'NOEXISTE'),
+                ])
+            hojas['ingresos'].append([curp, no_control, paterno, materno, nombre, carrera, 'EX'])
+
+            # En los demás archivos las filas inválidas apuntan a alumnos inexistentes o tipos inválidos
+            hojas['egresos'].append(['99999999' if self.es_invalida() else no_control])
+            hojas['titulaciones'].append([no_control, 'XX' if self.es_invalida() else 'RE'])
+            hojas['liberaciones-ingles'].append(['99999999' if self.es_invalida() else no_control])
+
+        archivos = {}
+        for tipo, libro in libros.items():
+            archivos[tipo] = os.path.join(self.directorio, f'{tipo}_{tamano}.xlsx')
+            libro.save(archivos[tipo])
+        return archivos
@@ -1,18 +1,46 @@
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 from .periodos import getPeriodoActual, getNumSemestre
+from .versiones import VersionadoQuerySet
+from contextlib import contextmanager
+from contextvars import ContextVar
 import re
+import uuid
 
-class RegistroManager(models.Manager):
-    def contiene_corte(self, periodo):
-        return self.filter(periodo=periodo, es_corte=True).exists()
+# Periodos cuyo corte ya se revisó para todo un lote (ver periodosRevisados)
+_periodos_revisados = ContextVar('periodos_revisados', default=frozenset())
 
+@contextmanager
+def periodosRevisados(*periodos):
+    """
+    Dentro del bloque BaseRegistro.save() no consulta la bitácora de cortes para estos
+    periodos. Lo usan las cargas que guardan fila por fila después de revisar los
+    periodos del archivo una sola vez (ver CargaMixin.validar_periodos_abiertos)
+    """
+    token = _periodos_revisados.set(_periodos_revisados.get() | set(periodos))
+    try:
+        yield
+    finally:
+        _periodos_revisados.reset(token)
+
+class RegistroQuerySet(VersionadoQuerySet):
+    # Registros de periodos abiertos (los que reciben cargas) y de periodos con corte,
+    # que ya no cambian. El índice (es_corte, periodo) separa ambos grupos, por lo que
+    # el trabajo sobre el periodo abierto no crece con los años de historial
+    def abiertos(self):
+        return self.filter(es_corte=False)
+
+    def cerrados(self):
+        return self.filter(es_corte=True)
+
+class RegistroManager(models.Manager.from_queryset(RegistroQuerySet)):
     def realizar_corte(self, periodo):
-        registros = self.filter(periodo=periodo, es_corte=False)
-        for registro in registros:
-            registro.es_corte = True
-        return self.bulk_update(registros, ['es_corte'])
+        # Un solo UPDATE sin cargar los registros en memoria
+        return self.abiertos().filter(periodo=periodo).update(es_corte=True)
 
 class BaseRegistro(models.Model):
     def validate_registro(value):
@@ -37,6 +65,8 @@ class BaseRegistro(models.Model):
     def save(self, *args, **kwargs):
         if self.pk and self.es_corte:
             raise ValidationError('Este registro ya no puede ser modificado')
+        if self.periodo not in _periodos_revisados.get() and Corte.objects.cerrado(self.periodo):
+            raise ValidationError(f'El periodo {self.periodo} ya tiene corte, no se pueden agregar ni modificar sus registros')
         super(BaseRegistro, self).save(*args, **kwargs)
 
     def delete(self, *args, **kwargs):
@@ -52,6 +82,9 @@ class BaseRegistro(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['alumno', 'periodo'], name='unique_%(class)s', violation_error_message='Ya existe un registro con este periodo para el alumno')
         ]
+        indexes = [
+            models.Index(fields=['es_corte', 'periodo'], name='idx_%(class)s_corte')
+        ]
 
 class Ingreso(BaseRegistro):
     class TiposIngresos(models.TextChoices):
@@ -64,13 +97,16 @@ class Ingreso(BaseRegistro):
     tipo = models.CharField(max_length=2, choices=TiposIngresos.choices, default=TiposIngresos.EXAMEN, null=False, blank=False)
     num_semestre = models.PositiveIntegerField(null=False, blank=False, validators=[MinValueValidator(1), MaxValueValidator(16)])
 
+    # Solo puede existir un ingreso de alguno de estos tipos por alumno
+    TIPOS_EXCLUSIVOS = [
+        TiposIngresos.EXAMEN.value,
+        TiposIngresos.EQUIVALENCIA.value,
+        TiposIngresos.TRASLADO.value,
+        TiposIngresos.CONVALIDACION.value
+    ]
+
     def clean(self):
-        exclusive_tipos = [
-            Ingreso.TiposIngresos.EXAMEN.value,
-            Ingreso.TiposIngresos.EQUIVALENCIA.value,
-            Ingreso.TiposIngresos.TRASLADO.value,
-            Ingreso.TiposIngresos.CONVALIDACION.value
-        ]
+        exclusive_tipos = Ingreso.TIPOS_EXCLUSIVOS
         if self.tipo in exclusive_tipos and Ingreso.objects.filter(alumno=self.alumno, tipo__in=exclusive_tipos).count() >= 1:
             raise ValidationError({'tipo': 'Solo puede existir un ingreso de EXAMEN, EQUIVALENCIA, TRASLADO o CONVALIDACION'})
         if Egreso.objects.filter(alumno=self.alumno).exists():
@@ -98,7 +134,7 @@ class Ingreso(BaseRegistro):
             )
         ]
         # Añadir índices manteniendo las restricciones existentes
-        indexes = [
+        indexes = BaseRegistro.Meta.indexes + [
             models.Index(fields=['alumno', 'periodo'], name='idx_ingreso_alumno_periodo'),
             models.Index(fields=['periodo', 'tipo'], name='idx_ingreso_periodo_tipo'),
             models.Index(fields=['tipo'], name='idx_ingreso_tipo')
@@ -156,3 +192,134 @@ class LiberacionIngles(BaseRegistro):
     class Meta(BaseRegistro.Meta):
         verbose_name = 'liberación de inglés'
         verbose_name_plural = 'liberaciones de inglés'
+
+class CorteManager(models.Manager):
+    def cerrado(self, periodo):
+        return self.filter(periodo=periodo).exists()
+
+    def periodos_cerrados(self):
+        return set(self.values_list('periodo', flat=True))
+
+    def registrar_existentes(self, using=None):
+        """
+        Agrega a la bitácora los periodos que ya tenían registros con corte antes
+        de que existiera, con el número de registros de cada tipo. Los periodos
+        que ya están en la bitácora no se modifican. Regresa los cortes creados.
+        """
+        db = using or self.db
+        registrados = set(self.using(db).values_list('periodo', flat=True))
+        conteos = {}
+        for campo, modelo in (
+            ('ingresos', Ingreso),
+            ('egresos', Egreso),
+            ('titulaciones', Titulacion),
+            ('liberaciones_ingles', LiberacionIngles),
+        ):
+            # Una consulta agrupada por tipo de registro
+            por_periodo = modelo.objects.using(db).cerrados().values('periodo').annotate(total=models.Count('pk'))
+            for fila in por_periodo:
+                if fila['periodo'] not in registrados:
+                    conteos.setdefault(fila['periodo'], {})[campo] = fila['total']
+        return self.using(db).bulk_create(
+            [self.model(periodo=periodo, **totales) for periodo, totales in sorted(conteos.items())],
+            ignore_conflicts=True
+        )
+
+class Corte(models.Model):
+    """
+    Bitácora de cortes: periodo cerrado, cuándo y quién lo realizó y cuántos
+    registros de cada tipo quedaron en el corte. Un periodo con corte ya no
+    admite registros nuevos ni cambios.
+    """
+    periodo = models.CharField(max_length=5, unique=True, null=False, blank=False)
+    fecha = models.DateTimeField(auto_now_add=True)
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    ingresos = models.PositiveIntegerField(default=0)
+    egresos = models.PositiveIntegerField(default=0)
+    titulaciones = models.PositiveIntegerField(default=0)
+    liberaciones_ingles = models.PositiveIntegerField(default=0)
+    objects = CorteManager()
+
+    def __str__(self):
+        return f'[{self.pk}] Corte {self.periodo}'
+
+    class Meta:
+        ordering = ['-periodo']
+
+class VersionDatosManager(models.Manager):
+    def actual(self):
+        version = self.filter(pk=1).values_list('version', 'modificado').first()
+        if version is None:
+            registro, _ = self.get_or_create(pk=1)
+            version = (registro.version, registro.modificado)
+        return version
+
+    def incrementar(self):
+        # Un UPDATE atómico, sin leer la versión anterior
+        if not self.filter(pk=1).update(version=F('version') + 1, modificado=timezone.now()):
+            self.get_or_create(pk=1)
+
+class VersionDatos(models.Model):
+    """
+    Fila única con la versión de los datos de analítica y la fecha de la última
+    escritura (ver versiones.py)
+    """
+    version = models.PositiveBigIntegerField(default=1)
+    modificado = models.DateTimeField(default=timezone.now)
+    objects = VersionDatosManager()
+
+    def __str__(self):
+        return f'Versión {self.version} ({self.modificado})'
+
+    class Meta:
+        verbose_name = 'versión de datos'
+        verbose_name_plural = 'versión de datos'
+
+class Carga(models.Model):
+    """
+    Bitácora de archivos de registros recibidos: contenido (hash), periodo,
+    conteo de filas, progreso y resultado de cada carga.
+    """
+    class Tipos(models.TextChoices):
+        INGRESOS = 'ingresos', 'Ingresos'
+        EGRESOS = 'egresos', 'Egresos'
+        TITULACIONES = 'titulaciones', 'Titulaciones'
+        LIBERACIONES_INGLES = 'liberaciones-ingles', 'Liberaciones de inglés'
+        HISTORIAL = 'historial', 'Historial de ingresos'
+
+    class Estados(models.TextChoices):
+        PENDIENTE = 'PE', 'Pendiente'
+        PROCESANDO = 'PR', 'Procesando'
+        COMPLETADA = 'CO', 'Completada'
+        ERROR = 'ER', 'Error'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tipo = models.CharField(max_length=20, choices=Tipos.choices, null=False, blank=False)
+    archivo = models.FileField(upload_to='cargas/')
+    nombre_archivo = models.CharField(max_length=255, null=False, blank=False)
+    opciones = models.JSONField(default=dict, blank=True)
+    hash_contenido = models.CharField(max_length=64, blank=True, db_index=True)
+    periodo = models.CharField(max_length=5, null=True, blank=True)
+    estado = models.CharField(max_length=2, choices=Estados.choices, default=Estados.PENDIENTE, null=False, blank=False)
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    filas_leidas = models.PositiveIntegerField(default=0)
+    filas_validadas = models.PositiveIntegerField(default=0)
+    creados = models.PositiveIntegerField(default=0)
+    errores = models.PositiveIntegerField(default=0)
+    resultado = models.JSONField(null=True, blank=True)
+    # Último lote escrito y los resultados hasta ese momento, para reanudar la carga si se interrumpe
+    punto_control = models.JSONField(null=True, blank=True)
+    # Proceso que tiene la carga pendiente o en proceso (host:pid), para detectar cargas abandonadas
+    worker = models.CharField(max_length=100, blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    @property
+    def terminada(self):
+        return self.estado in (Carga.Estados.COMPLETADA, Carga.Estados.ERROR)
+
+    def __str__(self):
+        return f'[{self.pk}] {self.tipo} - {self.nombre_archivo} ({self.get_estado_display()})'
+
+    class Meta:
+        ordering = ['-fecha_creacion']
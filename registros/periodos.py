@@ -1,4 +1,5 @@
-from django.utils.timezone import now
+from django.utils.timezone import make_aware, now
+import datetime
 import math
 
 # Calcula el periodo correspondiente a un cohorte tras una cantidad de semestres
@@ -39,6 +40,11 @@ def getPeriodoActual():
     semestre = 1 if date.month < 8 else 3
     return f"{date.year}{semestre}"
 
+# Devuelve la fecha (con zona horaria) en que inicia un periodo, ver getPeriodoActual
+def inicioPeriodo(periodo: str):
+    mes = 1 if periodo[4:] == '1' else 8
+    return make_aware(datetime.datetime(int(periodo[:4]), mes, 1))
+
 # Calcula la diferencia entre dos periodos, se ajusta de acuerdo a un numero de semestre inicial
 def getNumSemestre(primer_periodo: str, primer_num_semestre: int, nuevo_periodo: str):
     # divide la anualidad y semestre
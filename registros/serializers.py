@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Ingreso, Egreso, Titulacion, LiberacionIngles
+from .models import Ingreso, Egreso, Titulacion, LiberacionIngles, Carga, Corte
 
 class IngresoSerializer(serializers.ModelSerializer):
     class Meta:
@@ -20,3 +20,15 @@ class LiberacionInglesSerializer(serializers.ModelSerializer):
     class Meta:
         model = LiberacionIngles
         fields = '__all__'
+
+class CargaSerializer(serializers.ModelSerializer):
+    terminada = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = Carga
+        exclude = ['archivo', 'punto_control']
+
+class CorteSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Corte
+        fields = '__all__'
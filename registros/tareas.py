@@ -0,0 +1,213 @@
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+# Pool local de workers para procesar cargas fuera del ciclo de la solicitud HTTP
+from concurrent.futures import ThreadPoolExecutor
+
+from .models import Carga
+
+import datetime
+import os
+import socket
+import threading
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def obtenerExecutor():
+    """Crea el pool de workers la primera vez que se necesita"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'CARGAS_MAX_WORKERS', 2),
+                thread_name_prefix='cargas'
+            )
+    return _executor
+
+class ProgresoCarga:
+    """
+    Lleva los contadores de una carga (filas leídas, validadas, creadas y con error).
+
+    Si se asocia a una Carga, los contadores se guardan en la base de datos como
+    máximo una vez cada INTERVALO segundos para no saturarla con escrituras.
+    Sin Carga solo se cuentan en memoria (validación con dry-run).
+
+    Las vistas que escriben por lotes llaman a confirmar_lote() dentro de la
+    transacción de cada lote; si la carga se interrumpe, al reanudarla los
+    contadores, los resultados y el número de lotes ya escritos se recuperan
+    del punto de control.
+    """
+    INTERVALO = 1.0
+
+    def __init__(self, carga=None):
+        self.carga = carga
+        self.filas_leidas = 0
+        self.filas_validadas = 0
+        self.creados = 0
+        self.errores = 0
+        self.lotes_confirmados = 0
+        self.resultado_parcial = None
+        self._ultimo_guardado = 0
+        self._lock = threading.Lock()
+
+        punto_control = carga.punto_control if carga is not None else None
+        if punto_control:
+            self.lotes_confirmados = punto_control['lotes']
+            self.resultado_parcial = punto_control['resultado']
+            for campo, valor in punto_control['contadores'].items():
+                setattr(self, campo, valor)
+
+    def actualizar(self, leidas=0, validadas=0, creados=0, errores=0):
+        with self._lock:
+            self.filas_leidas += leidas
+            self.filas_validadas += validadas
+            self.creados += creados
+            self.errores += errores
+        if time.monotonic() - self._ultimo_guardado >= self.INTERVALO:
+            self.guardar()
+
+    def confirmar_lote(self, leidas, results):
+        """
+        Actualiza los contadores con los resultados acumulados después de escribir un
+        lote de filas y guarda el punto de control. Se llama dentro de la transacción
+        del lote para que el punto de control corresponda con lo escrito.
+        """
+        with self._lock:
+            self.filas_leidas += leidas
+            self.creados = results['created']
+            self.errores = len(results['errors'])
+            self.filas_validadas = max(0, self.filas_leidas - self.errores)
+            self.lotes_confirmados += 1
+        self.guardar(punto_control={
+            'lotes': self.lotes_confirmados,
+            'resultado': results,
+            'contadores': {
+                'filas_leidas': self.filas_leidas,
+                'filas_validadas': self.filas_validadas,
+                'creados': self.creados,
+                'errores': self.errores,
+            }
+        })
+
+    def registrar_periodo(self, periodo):
+        """Guarda en la bitácora el periodo del archivo"""
+        self.guardar(periodo=periodo)
+
+    def guardar(self, **campos):
+        if self.carga is None:
+            return
+        self._ultimo_guardado = time.monotonic()
+        Carga.objects.filter(pk=self.carga.pk).update(
+            filas_leidas=self.filas_leidas,
+            filas_validadas=self.filas_validadas,
+            creados=self.creados,
+            errores=self.errores,
+            fecha_actualizacion=timezone.now(),
+            **campos
+        )
+
+    def finalizar(self, status, resultado):
+        """Guarda el resultado final de la carga"""
+        if isinstance(resultado, dict) and 'created' in resultado:
+            self.creados = resultado['created']
+            self.errores = len(resultado.get('errors', []))
+        estado = Carga.Estados.COMPLETADA if status < 400 else Carga.Estados.ERROR
+        self.guardar(estado=estado, resultado=resultado)
+        # Una carga completada ya no se reanuda, en la bitácora basta con su hash
+        if estado == Carga.Estados.COMPLETADA and self.carga is not None and self.carga.archivo:
+            self.carga.archivo.delete(save=False)
+            Carga.objects.filter(pk=self.carga.pk).update(archivo='')
+
+def identificadorWorker():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+def cargaAbandonada(carga):
+    """
+    Una carga pendiente o en proceso está abandonada si no avanza desde hace más de
+    CARGAS_TIMEOUT segundos, o si el proceso que la tenía en este mismo servidor ya
+    no existe. Los procesos de otros servidores solo se detectan por el tiempo.
+    """
+    if carga.estado not in (Carga.Estados.PENDIENTE, Carga.Estados.PROCESANDO):
+        return False
+    limite = datetime.timedelta(seconds=getattr(settings, 'CARGAS_TIMEOUT', 15 * 60))
+    if carga.fecha_actualizacion is None or timezone.now() - carga.fecha_actualizacion > limite:
+        return True
+    host, _, pid = carga.worker.rpartition(':')
+    if host == socket.gethostname() and pid.isdigit():
+        return not procesoVivo(int(pid))
+    return False
+
+def procesoVivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Existe pero es de otro usuario
+        return True
+    return True
+
+def reclamarCarga(carga):
+    """
+    Marca como pendiente una carga con error o abandonada para reanudarla en este
+    proceso. El UPDATE es condicional al estado leído, así que si dos solicitudes
+    la reclaman a la vez solo una lo consigue. Regresa si se reclamó.
+    """
+    if carga.estado != Carga.Estados.ERROR and not cargaAbandonada(carga):
+        return False
+    ahora = timezone.now()
+    reclamada = Carga.objects.filter(
+        pk=carga.pk,
+        estado=carga.estado,
+        fecha_actualizacion=carga.fecha_actualizacion
+    ).update(estado=Carga.Estados.PENDIENTE, worker=identificadorWorker(), fecha_actualizacion=ahora)
+    if reclamada:
+        carga.estado = Carga.Estados.PENDIENTE
+        carga.worker = identificadorWorker()
+        carga.fecha_actualizacion = ahora
+    return bool(reclamada)
+
+def procesarCarga(carga_pk, vista_cls, cerrar_conexiones=True):
+    """
+    Procesa una carga almacenada con la misma lógica que la vista de subida.
+    Si la carga tiene punto de control se reanuda desde el último lote escrito.
+    Regresa (status, resultado).
+    """
+    try:
+        carga = Carga.objects.get(pk=carga_pk)
+        Carga.objects.filter(pk=carga_pk).update(
+            estado=Carga.Estados.PROCESANDO,
+            worker=identificadorWorker(),
+            fecha_actualizacion=timezone.now()
+        )
+        progreso = ProgresoCarga(carga)
+        if progreso.lotes_confirmados:
+            logger.info(f"Reanudando carga {carga_pk} después del lote {progreso.lotes_confirmados}")
+        with carga.archivo.open('rb') as file_obj:
+            status, resultado = vista_cls().procesar(file_obj, carga.nombre_archivo, progreso, carga.opciones)
+        progreso.finalizar(status, resultado)
+        logger.info(f"Carga {carga_pk} terminada con estado {status}")
+        return status, resultado
+    except Exception as ex:
+        logger.error(f"Error procesando carga {carga_pk}: {str(ex)}")
+        resultado = {'message': f'Error procesando archivo: {str(ex)}'}
+        Carga.objects.filter(pk=carga_pk).update(
+            estado=Carga.Estados.ERROR,
+            resultado=resultado,
+            fecha_actualizacion=timezone.now()
+        )
+        return 500, resultado
+    finally:
+        # Cada worker usa su propia conexión, se libera al terminar
+        if cerrar_conexiones:
+            connections.close_all()
+
+def encolarCarga(carga, vista_cls):
+    """Envía la carga al pool de workers y regresa de inmediato"""
+    return obtenerExecutor().submit(procesarCarga, carga.pk, vista_cls)
@@ -1,3 +1,644 @@
-from django.test import TestCase
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import DatabaseError, IntegrityError, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from unittest import mock
 
-# Create your tests here.
+from rest_framework.exceptions import ValidationError as DRFValidationError
+
+from backend.filters import QueryParamFilter
+from backend.routers import ANALYTICS_DB_ALIAS, AnalyticsRouter
+from carreras.models import Carrera
+from planes.models import Plan
+from usuario.models import Usuario
+from alumnos.models import Alumno
+from personal.models import Personal
+from .lectores import LectorArrow, LectorCSV, LectorExcel, obtenerLector
+from .models import Carga, Corte, Egreso, Ingreso, LiberacionIngles, Titulacion, VersionDatos, periodosRevisados
+from .tareas import ProgresoCarga, identificadorWorker, procesarCarga
+from .ingesta import MotorIngesta
+from .views import EgresoUpload, IngresoUpload, LiberacionInglesUpload
+
+import datetime
+import hashlib
+import io
+import json
+import shutil
+import socket
+import tempfile
+
+import openpyxl
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+ENCABEZADOS_INGRESO = ['CURP', 'NO_CONTROL', 'PATERNO', 'MATERNO', 'NOMBRE', 'CARRERA']
+
+def curpValida(numero):
+    """CURP válida y distinta para cada número de 0 a 10079"""
+    homoclave = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'[numero // 10 % 36]
+    return f'GODE5601{numero // 360 + 1:02d}HDFRRN{homoclave}{numero % 10}'
+
+def filasIngreso(total, periodo='20201', carrera='ISC'):
+    return [
+        [curpValida(numero), f'2001{numero + 1:04d}', 'GOMEZ', 'DIAZ', f'ALUMNO {numero}', carrera, 'EX']
+        for numero in range(total)
+    ]
+
+def archivoExcel(filas):
+    libro = openpyxl.Workbook()
+    hoja = libro.active
+    for fila in filas:
+        hoja.append(fila)
+    contenido = io.BytesIO()
+    libro.save(contenido)
+    return contenido.getvalue()
+
+def archivoParquet(encabezados, filas, filas_por_grupo=None):
+    tabla = pa.table({
+        str(encabezado): [None if fila[indice] is None else str(fila[indice]) for fila in filas]
+        for indice, encabezado in enumerate(encabezados)
+    })
+    contenido = io.BytesIO()
+    pq.write_table(tabla, contenido, row_group_size=filas_por_grupo)
+    return contenido.getvalue()
+
+class CargaTestMixin:
+    """Catálogos, usuario administrador y archivos subidos en un directorio temporal"""
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        configuracion = override_settings(MEDIA_ROOT=media)
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+
+        carrera = Carrera.objects.create(clave='ISC', nombre='SISTEMAS')
+        Plan.objects.create(clave='ISIC-2010', fecha_inicio=datetime.date(2010, 1, 1), carrera=carrera)
+        self.admin = Usuario.objects.create(
+            username='admin', first_name='A', paternal_surname='B', email='a@a.com', is_staff=True, is_superuser=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def subir(self, ruta, contenido, extension='xlsx', parametros=''):
+        return self.client.post(
+            f'/registros/{ruta}/subir/archivo.{extension}{parametros}',
+            data=contenido,
+            content_type='application/octet-stream',
+            HTTP_CONTENT_DISPOSITION=f'attachment; filename=archivo.{extension}'
+        )
+
+class LectoresTests(SimpleTestCase):
+    def test_csv_conserva_formato_y_omite_filas_vacias(self):
+        contenido = io.BytesIO('no_control,periodo\n0012,20201\n,\n20010002,20203\n'.encode())
+        with LectorCSV(contenido) as lector:
+            self.assertEqual(lector.encabezados, ('no_control', 'periodo'))
+            self.assertEqual(list(lector.filas()), [(2, ('0012', '20201')), (4, ('20010002', '20203'))])
+
+    def test_excel_normaliza_numeros(self):
+        contenido = io.BytesIO(archivoExcel([['no_control', 20201], [20010001.0], [None, None], ['  20010002 ']]))
+        with LectorExcel(contenido) as lector:
+            self.assertEqual(lector.encabezados, ('no_control', '20201'))
+            self.assertEqual(list(lector.filas()), [(2, ('20010001', None)), (4, ('20010002', None))])
+
+    def test_arrow_lee_todos_los_batches(self):
+        filas = [[f'2001{numero:04d}'] for numero in range(1, 110)]
+        contenido = io.BytesIO(archivoParquet(['no_control'], filas, filas_por_grupo=10))
+        with LectorArrow(contenido) as lector:
+            lector.TAMANO_BLOQUE = 7
+            self.assertEqual(lector.total_filas, 109)
+            self.assertEqual([valores[0] for _, valores in lector.filas()], [fila[0] for fila in filas])
+
+    def test_total_de_filas_estimado(self):
+        texto = 'no_control,periodo\n' + ''.join(f'2001{numero:04d},20201\n' for numero in range(20000))
+        with LectorCSV(io.BytesIO(texto.encode())) as lector:
+            self.assertAlmostEqual(lector.total_filas, 20000, delta=1000)
+        with LectorCSV(io.BytesIO(b'no_control\n20010001\n20010002')) as lector:
+            self.assertEqual(lector.total_filas, 2)
+
+        tabla = pa.table({'no_control': [f'2001{numero:04d}' for numero in range(9000)]})
+        for escritor, margen in ((ipc.new_file, 0), (ipc.new_stream, 1000)):
+            contenido = io.BytesIO()
+            with escritor(contenido, tabla.schema) as archivo:
+                for batch in tabla.to_batches(max_chunksize=1000):
+                    archivo.write_batch(batch)
+            contenido.seek(0)
+            with self.subTest(escritor.__name__), LectorArrow(contenido, formato='arrow') as lector:
+                self.assertAlmostEqual(lector.total_filas, 9000, delta=margen)
+                self.assertEqual(sum(1 for _ in lector.filas()), 9000)
+
+    def test_lotes_continuan_la_misma_lectura(self):
+        filas = [[str(numero)] for numero in range(25)]
+        archivos = {
+            'archivo.xlsx': archivoExcel([['valor'], *filas]),
+            'archivo.csv': ('valor\n' + ''.join(f'{fila[0]}\n' for fila in filas)).encode(),
+            'archivo.parquet': archivoParquet(['valor'], filas),
+        }
+        for nombre, contenido in archivos.items():
+            with self.subTest(nombre), obtenerLector(io.BytesIO(contenido), nombre) as lector:
+                lotes = lector.lotes(10)
+                primero = next(lotes)
+                lector.tamano_lote = 4
+                resto = list(lotes)
+                # Una segunda llamada continúa donde se quedó la primera
+                self.assertEqual(list(lector.lotes(10)), [])
+                self.assertEqual([len(lote) for lote in [primero, *resto]], [10, 4, 4, 4, 3])
+                valores = [valores[0] for lote in [primero, *resto] for _, valores in lote]
+                self.assertEqual(valores, [fila[0] for fila in filas])
+
+class IngresoUploadTests(CargaTestMixin, TestCase):
+    def test_parquet_con_mas_de_un_lote(self):
+        contenido = archivoParquet([*ENCABEZADOS_INGRESO, '20201'], filasIngreso(109))
+        respuesta = self.subir('ingresos', contenido, 'parquet')
+        self.assertEqual(respuesta.status_code, 200, respuesta.data)
+        self.assertEqual(respuesta.data['errors'], [])
+        self.assertEqual(respuesta.data['created'], 109 * 3)
+        self.assertEqual(Ingreso.objects.count(), 109)
+
+    def test_csv_grande_valida_en_el_pool(self):
+        total = IngresoUpload.MIN_ROWS_PROCESS_POOL + 1
+        texto = ','.join([*ENCABEZADOS_INGRESO, '20201']) + '\n'
+        texto += ''.join(','.join(fila) + '\n' for fila in filasIngreso(total))
+        with mock.patch('registros.views.MotorIngesta', wraps=MotorIngesta) as motor, \
+                mock.patch('registros.views.multiprocessing.cpu_count', return_value=2):
+            respuesta = self.subir('ingresos', texto.encode(), 'csv')
+        self.assertEqual(respuesta.status_code, 200, respuesta.data)
+        self.assertEqual(motor.call_args.args[0], 2)
+        self.assertEqual(respuesta.data['errors'], [])
+        self.assertEqual(Ingreso.objects.count(), total)
+
+    def test_upsert_actualiza_sin_duplicar(self):
+        filas = filasIngreso(3)
+        self.assertEqual(self.subir('ingresos', archivoExcel([[*ENCABEZADOS_INGRESO, 20201], *filas])).data['created'], 9)
+
+        # Dos nombres corregidos y un alumno que cambia de carrera
+        carrera = Carrera.objects.create(clave='IIA', nombre='INDUSTRIAL')
+        Plan.objects.create(clave='IIND-2010', fecha_inicio=datetime.date(2010, 1, 1), carrera=carrera)
+        filas[0][4] = 'ALUMNA 0'
+        filas[1][3] = 'DIAS'
+        filas[2][5] = 'IIA'
+        respuesta = self.subir('ingresos', archivoExcel([[*ENCABEZADOS_INGRESO, 20201], *filas]), parametros='?modo=upsert')
+        self.assertEqual(respuesta.status_code, 200, respuesta.data)
+        self.assertEqual(respuesta.data['errors'], [])
+        self.assertEqual((respuesta.data['created'], respuesta.data['updated']), (0, 3))
+
+        self.assertEqual((Personal.objects.count(), Alumno.objects.count(), Ingreso.objects.count()), (3, 3, 3))
+        self.assertEqual(Personal.objects.get(curp=filas[0][0]).nombre, 'ALUMNA 0')
+        self.assertEqual(Personal.objects.get(curp=filas[1][0]).materno, 'DIAS')
+        self.assertEqual(Alumno.objects.get(pk=filas[2][1]).plan_id, 'IIND-2010')
+
+    def test_modo_invalido(self):
+        respuesta = self.subir('ingresos', archivoExcel([[*ENCABEZADOS_INGRESO, 20201], *filasIngreso(1)]), parametros='?modo=reemplazar')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('reemplazar', respuesta.data['message'])
+        self.assertFalse(Carga.objects.exists())
+        self.assertFalse(Alumno.objects.exists())
+
+    def test_conteos_de_una_escritura_revertida(self):
+        original = IngresoUpload.bulk_create_with_progress
+
+        def fallar_en_ingresos(vista, model, objects, *args, **kwargs):
+            if model is Ingreso:
+                raise IntegrityError('falla simulada')
+            return original(vista, model, objects, *args, **kwargs)
+
+        contenido = archivoExcel([[*ENCABEZADOS_INGRESO, 20201], *filasIngreso(3)])
+        with mock.patch.object(IngresoUpload, 'bulk_create_with_progress', fallar_en_ingresos):
+            respuesta = self.subir('ingresos', contenido)
+        self.assertEqual(respuesta.status_code, 500)
+        self.assertEqual(respuesta.data['created'], 0)
+        self.assertIn('falla simulada', respuesta.data['errors'][-1]['message'])
+        self.assertFalse(Personal.objects.exists())
+        self.assertFalse(Alumno.objects.exists())
+        self.assertEqual(Carga.objects.get(pk=respuesta.data['carga']).estado, Carga.Estados.ERROR)
+
+        # Al subir de nuevo el archivo la carga se reanuda en lugar de regresar el resultado fallido
+        respuesta = self.subir('ingresos', contenido)
+        self.assertEqual(respuesta.status_code, 200, respuesta.data)
+        self.assertNotIn('duplicado', respuesta.data)
+        self.assertEqual(respuesta.data['created'], 9)
+        self.assertEqual(Carga.objects.count(), 1)
+
+class IngresoHistorialUploadTests(CargaTestMixin, TestCase):
+    def test_primera_carga_en_base_vacia(self):
+        filas = [
+            [curpValida(0), '20010001', 'GOMEZ', 'DIAZ', 'ANA', 'ISC', 'EX', 'RE', 'RE'],
+            [curpValida(1), '20010002', 'GOMEZ', 'DIAZ', 'LUIS', 'ISC', None, 'TR', 'RE'],
+        ]
+        contenido = archivoExcel([[*[campo.lower() for campo in ENCABEZADOS_INGRESO], 20191, 20193, 20201], *filas])
+        respuesta = self.subir('ingresos/historial', contenido)
+        self.assertEqual(respuesta.status_code, 200, respuesta.data)
+        self.assertEqual(respuesta.data['errors'], [])
+        semestres = dict(
+            ((no_control, periodo), num_semestre)
+            for no_control, periodo, num_semestre in Ingreso.objects.values_list('alumno', 'periodo', 'num_semestre')
+        )
+        self.assertEqual(semestres, {
+            ('20010001', '20191'): 1, ('20010001', '20193'): 2, ('20010001', '20201'): 3,
+            ('20010002', '20193'): 1, ('20010002', '20201'): 2,
+        })
+
+    def test_continua_desde_el_primer_ingreso_registrado(self):
+        self.subir('ingresos/historial', archivoExcel([
+            [*[campo.lower() for campo in ENCABEZADOS_INGRESO], 20191],
+            [curpValida(0), '20010001', 'GOMEZ', 'DIAZ', 'ANA', 'ISC', 'EX'],
+        ]))
+        respuesta = self.subir('ingresos/historial', archivoExcel([
+            [*[campo.lower() for campo in ENCABEZADOS_INGRESO], 20201],
+            [curpValida(0), '20010001', 'GOMEZ', 'DIAZ', 'ANA', 'ISC', 'RE'],
+        ]))
+        self.assertEqual(respuesta.data['errors'], [])
+        self.assertEqual(Ingreso.objects.get(periodo='20201').num_semestre, 3)
+
+class CargaReanudacionTests(CargaTestMixin, TestCase):
+    OPCIONES = {'modo': 'crear', 'dry_run': False}
+
+    def setUp(self):
+        super().setUp()
+        self.contenido = archivoExcel([[*ENCABEZADOS_INGRESO, 20201], *filasIngreso(2)])
+
+    def cargaEnProceso(self, worker, antiguedad=datetime.timedelta()):
+        carga = Carga.objects.create(
+            tipo=Carga.Tipos.INGRESOS,
+            archivo=ContentFile(self.contenido, name='archivo.xlsx'),
+            nombre_archivo='archivo.xlsx',
+            opciones=self.OPCIONES,
+            hash_contenido=hashlib.sha256(self.contenido).hexdigest(),
+            estado=Carga.Estados.PROCESANDO,
+            worker=worker
+        )
+        Carga.objects.filter(pk=carga.pk).update(fecha_actualizacion=timezone.now() - antiguedad)
+        return carga
+
+    def test_carga_activa_no_se_procesa_dos_veces(self):
+        carga = self.cargaEnProceso(identificadorWorker())
+        respuesta = self.subir('ingresos', self.contenido)
+        self.assertEqual(respuesta.status_code, 202)
+        self.assertFalse(Ingreso.objects.exists())
+
+        with mock.patch('registros.views.encolarCarga') as encolar:
+            respuesta = self.client.post(f'/registros/cargas/{carga.pk}/reanudar/')
+        self.assertEqual(respuesta.status_code, 409)
+        encolar.assert_not_called()
+
+    def test_carga_sin_avance_se_reanuda(self):
+        self.cargaEnProceso('otro-servidor:1', antiguedad=datetime.timedelta(hours=1))
+        respuesta = self.subir('ingresos', self.contenido)
+        self.assertEqual(respuesta.status_code, 200, respuesta.data)
+        self.assertEqual(respuesta.data['created'], 6)
+        self.assertEqual(Carga.objects.get().estado, Carga.Estados.COMPLETADA)
+
+    def test_carga_de_un_proceso_terminado_se_reanuda(self):
+        # Un pid mayor al máximo de Linux nunca existe
+        carga = self.cargaEnProceso(f'{socket.gethostname()}:4194305')
+        with mock.patch('registros.views.encolarCarga') as encolar:
+            respuesta = self.client.post(f'/registros/cargas/{carga.pk}/reanudar/')
+        self.assertEqual(respuesta.status_code, 202)
+        encolar.assert_called_once()
+        carga.refresh_from_db()
+        self.assertEqual(carga.estado, Carga.Estados.PENDIENTE)
+        self.assertEqual(carga.worker, identificadorWorker())
+
+class CorteTests(CargaTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.subir('ingresos/historial', archivoExcel([
+            [*[campo.lower() for campo in ENCABEZADOS_INGRESO], 20191, 20193, 20201],
+            [curpValida(0), '20010001', 'GOMEZ', 'DIAZ', 'ANA', 'ISC', 'EX', 'RE', 'RE'],
+            [curpValida(1), '20010002', 'GOMEZ', 'DIAZ', 'LUIS', 'ISC', None, 'EX', 'RE'],
+        ]))
+
+    def test_corte_registra_conteos_y_cierra_el_periodo(self):
+        with mock.patch('registros.views.getPeriodoActual', return_value='20201'):
+            respuesta = self.client.post('/registros/realizar-corte/')
+            self.assertEqual(respuesta.status_code, 200, respuesta.data)
+            self.assertEqual(respuesta.data['updated']['ingresos'], 2)
+            self.assertEqual(self.client.post('/registros/realizar-corte/').status_code, 400)
+
+        corte = Corte.objects.get()
+        self.assertEqual((corte.periodo, corte.ingresos, corte.usuario), ('20201', 2, self.admin))
+        self.assertEqual(Ingreso.objects.cerrados().count(), 2)
+        with self.assertRaises(ValidationError):
+            Ingreso(alumno_id='20010002', periodo='20201', num_semestre=3).save()
+
+    def test_cargas_revisan_el_corte_una_vez_por_lote(self):
+        with mock.patch.object(Corte.objects, 'cerrado', return_value=False) as cerrado, \
+                mock.patch.object(EgresoUpload, 'validar_periodos_abiertos', autospec=True) as validar:
+            respuesta = self.subir('egresos', archivoExcel([['no_control', 20203], ['20010001'], ['20010002']]))
+        self.assertEqual((respuesta.status_code, respuesta.data['created']), (200, 2), respuesta.data)
+        # Una vez al leer los encabezados y otra en la transacción del único lote, ninguna por fila
+        self.assertEqual([llamada.args[1:] for llamada in validar.call_args_list], [('20203',), ('20203',)])
+        cerrado.assert_not_called()
+
+        for ruta, filas in (
+            ('titulaciones', [['no_control', 20203], ['20010001', 'TE'], ['20010002', 'TE']]),
+            ('liberaciones-ingles', [['no_control', 20203], ['20010001'], ['20010002']]),
+        ):
+            with self.subTest(ruta), mock.patch.object(Corte.objects, 'cerrado') as cerrado:
+                respuesta = self.subir(ruta, archivoExcel(filas))
+                self.assertEqual((respuesta.status_code, respuesta.data['created']), (200, 2), respuesta.data)
+                cerrado.assert_not_called()
+
+    def test_periodos_revisados_solo_dentro_del_bloque(self):
+        Corte.objects.create(periodo='20203')
+        with periodosRevisados('20203'):
+            Egreso(alumno_id='20010001', periodo='20203').save()
+        with self.assertRaises(ValidationError):
+            Egreso(alumno_id='20010002', periodo='20203').save()
+
+    def test_archivo_danado_marca_la_carga_con_error(self):
+        for ruta in ('egresos', 'titulaciones', 'liberaciones-ingles'):
+            with self.subTest(ruta):
+                respuesta = self.subir(ruta, b'no es un archivo de excel')
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertIn('Error procesando archivo', respuesta.data['message'])
+                self.assertEqual(Carga.objects.get(pk=respuesta.data['carga']).estado, Carga.Estados.ERROR)
+
+    def test_corte_durante_la_carga(self):
+        # El periodo se cerró después de leer los encabezados, antes de escribir el lote
+        original = LiberacionInglesUpload.validar_periodos_abiertos
+        revisiones = []
+
+        def cerrar_al_escribir(vista, *periodos):
+            revisiones.append(periodos)
+            if len(revisiones) == 2:
+                Corte.objects.create(periodo='20203')
+            return original(vista, *periodos)
+
+        with mock.patch.object(LiberacionInglesUpload, 'validar_periodos_abiertos', cerrar_al_escribir):
+            respuesta = self.subir('liberaciones-ingles', archivoExcel([['no_control', 20203], ['20010001']]))
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('ya tiene corte', respuesta.data['message'])
+        self.assertFalse(LiberacionIngles.objects.exists())
+        self.assertEqual(Carga.objects.get(pk=respuesta.data['carga']).estado, Carga.Estados.ERROR)
+
+    def test_registra_cortes_anteriores_a_la_bitacora(self):
+        # Cortes hechos antes de la bitácora: solo se marcaron los registros
+        Ingreso.objects.filter(periodo__in=['20191', '20193']).update(es_corte=True)
+        Corte.objects.create(periodo='20193', ingresos=99)
+
+        creados = Corte.objects.registrar_existentes()
+        self.assertEqual([corte.periodo for corte in creados], ['20191'])
+        self.assertEqual(
+            dict(Corte.objects.values_list('periodo', 'ingresos')),
+            {'20191': 1, '20193': 99}
+        )
+        self.assertEqual(Corte.objects.registrar_existentes(), [])
+
+class VersionDatosTests(CargaTestMixin, TestCase):
+    def setUp(self):
+        # Los datos se confirman: cada prueba empieza sin un incremento pendiente
+        with self.captureOnCommitCallbacks(execute=True):
+            super().setUp()
+            self.subir('ingresos', archivoExcel([[*ENCABEZADOS_INGRESO, 20201], *filasIngreso(2)]))
+
+    def test_escritura_en_bloque_incrementa_la_version_al_confirmar(self):
+        version, _ = VersionDatos.objects.actual()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Alumno.objects.filter(pk='20010001').update(plan_id='ISIC-2010')
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(VersionDatos.objects.actual()[0], version + 1)
+
+    def test_una_sola_actualizacion_por_transaccion(self):
+        version, _ = VersionDatos.objects.actual()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            for alumno in Alumno.objects.all():
+                alumno.save()
+            Ingreso.objects.filter(periodo='20201').update(tipo='TR')
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(VersionDatos.objects.actual()[0], version + 1)
+        # Confirmada la transacción, la siguiente vuelve a registrar su cambio
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Alumno.objects.first().save()
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(VersionDatos.objects.actual()[0], version + 2)
+
+    def test_cambio_revertido_en_savepoint_se_vuelve_a_registrar(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            try:
+                with transaction.atomic():
+                    Alumno.objects.first().save()
+                    raise DatabaseError
+            except DatabaseError:
+                pass
+            Alumno.objects.first().save()
+        self.assertEqual(len(callbacks), 1)
+
+    def test_escritura_fallida_no_registra_cambio(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with self.assertRaises(FieldDoesNotExist):
+                Alumno.objects.update(no_existe=1)
+        self.assertEqual(callbacks, [])
+
+    def test_cambio_se_registra_en_la_base_de_escritura(self):
+        # Las lecturas van a la réplica, el cambio debe registrarse en la transacción de default
+        with mock.patch.object(AnalyticsRouter, 'db_for_read', return_value=ANALYTICS_DB_ALIAS), \
+                mock.patch('registros.versiones.registrarCambio') as registrar:
+            Ingreso.objects.filter(periodo='20201').update(tipo='TR')
+            Alumno.objects.filter(pk='20010002').delete()
+        # También lo registran las señales de los ingresos borrados en cascada
+        self.assertTrue(registrar.called)
+        self.assertEqual({llamada.args for llamada in registrar.call_args_list}, {('default',)})
+
+class MedirAnaliticaTests(TestCase):
+    def test_rutas_dentro_de_su_presupuesto_de_consultas(self):
+        # Termina con CommandError si una ruta falla o rebasa su presupuesto
+        with tempfile.TemporaryDirectory() as directorio:
+            call_command(
+                'medir_analitica', tamanos='2', repeticiones=1,
+                salida=f'{directorio}/analitica.json', stdout=io.StringIO()
+            )
+
+class RegistroBulkTests(CargaTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.subir('ingresos', archivoExcel([[*ENCABEZADOS_INGRESO, 20201], *filasIngreso(2)]))
+        Corte.objects.create(periodo='20193')
+
+    def test_crear_ingresos_en_bloque(self):
+        respuesta = self.client.post('/registros/ingresos/', [
+            {'alumno': '20010001', 'periodo': '20203', 'tipo': 'RE', 'num_semestre': 2},
+            {'alumno': '20010002', 'periodo': '20193', 'tipo': 'RE', 'num_semestre': 2},
+            {'alumno': '20010002', 'periodo': '20203', 'tipo': 'TR', 'num_semestre': 3},
+            {'alumno': '20019999', 'periodo': '20203', 'tipo': 'RE', 'num_semestre': 2},
+        ], format='json')
+        self.assertEqual(respuesta.status_code, 207, respuesta.data)
+        resultados = respuesta.data['results']
+        self.assertEqual([resultado['status'] for resultado in resultados], [201, 400, 400, 400])
+        self.assertIn('periodo', resultados[1]['errors'])
+        self.assertIn('tipo', resultados[2]['errors'])
+        self.assertIn('alumno', resultados[3]['errors'])
+        self.assertEqual(Ingreso.objects.filter(periodo='20203').count(), 1)
+
+class QueryParamFilterTests(CargaTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.subir('ingresos', archivoExcel([[*ENCABEZADOS_INGRESO, 20201], *filasIngreso(2)]))
+
+    def test_valores_convertidos_con_el_campo(self):
+        respuesta = self.client.get('/registros/ingresos/?num-semestre=1&es-corte=no&carrera=ISC&tipo=EX,RE')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['count'], 2)
+        self.assertEqual(self.client.get('/registros/ingresos/?num-semestre=2').data['count'], 0)
+
+    def test_valores_invalidos_regresan_400(self):
+        for parametros in ('num-semestre=abc', 'es-corte=quizas'):
+            with self.subTest(parametros):
+                respuesta = self.client.get(f'/registros/ingresos/?{parametros}')
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertIn(parametros.split('=')[0], respuesta.data)
+
+    def test_cada_valor_de_una_lista(self):
+        filtro = QueryParamFilter()
+        self.assertEqual(filtro.parse_value(Ingreso, 'num-semestre', 'num_semestre__in', '1, 2'), [1, 2])
+        self.assertEqual(
+            filtro.parse_value(Personal, 'nacimiento', 'fecha_nacimiento__in', '1956-01-01'),
+            [datetime.date(1956, 1, 1)]
+        )
+        for lookup, valor in (('num_semestre__in', '1,abc'), ('alumno__curp__fecha_nacimiento__in', '1956-13-01')):
+            with self.subTest(lookup), self.assertRaises(DRFValidationError):
+                filtro.parse_value(Ingreso, 'valor', lookup, valor)
+
+class DryRunTests(CargaTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.subir('ingresos', archivoExcel([[*ENCABEZADOS_INGRESO, 20201], *filasIngreso(2)]))
+        self.cargas = Carga.objects.count()
+
+    def validar(self, ruta, filas):
+        respuesta = self.subir(ruta, archivoExcel(filas), parametros='?dry-run=1')
+        self.assertEqual(respuesta.status_code, 200, respuesta.data)
+        self.assertTrue(respuesta.data['dry_run'])
+        # La validación no deja registro en la bitácora de cargas
+        self.assertEqual(Carga.objects.count(), self.cargas)
+        return respuesta.data
+
+    def test_ingresos(self):
+        filas = filasIngreso(4)[2:]
+        filas[1][5] = 'XXX'
+        resultado = self.validar('ingresos', [[*ENCABEZADOS_INGRESO, 20203], *filas])
+        self.assertEqual(resultado['created'], 3)
+        self.assertEqual([error['row_index'] for error in resultado['errors']], [3])
+        self.assertEqual((Personal.objects.count(), Alumno.objects.count(), Ingreso.objects.count()), (2, 2, 2))
+
+    def test_egresos(self):
+        resultado = self.validar('egresos', [['no_control', 20233], ['20010001'], ['20019999']])
+        self.assertEqual(resultado['created'], 1)
+        self.assertEqual([error['row_index'] for error in resultado['errors']], [3])
+        self.assertFalse(Egreso.objects.exists())
+
+    def test_titulaciones(self):
+        Egreso.objects.create(periodo='20233', alumno_id='20010001')
+        resultado = self.validar('titulaciones', [['no_control', 20241], ['20010001', 'TE'], ['20010002', 'TE'], ['20019999', 'TE']])
+        self.assertEqual(resultado['created'], 1)
+        self.assertEqual([error['row_index'] for error in resultado['errors']], [3, 4])
+        self.assertFalse(Titulacion.objects.exists())
+
+    def test_liberaciones_ingles(self):
+        resultado = self.validar('liberaciones-ingles', [['no_control', 20233], ['20010001'], ['20019999']])
+        self.assertEqual(resultado['created'], 1)
+        self.assertEqual([error['row_index'] for error in resultado['errors']], [3])
+        self.assertFalse(LiberacionIngles.objects.exists())
+
+class CargaAsincronaTests(CargaTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.contenido = archivoExcel([[*ENCABEZADOS_INGRESO, 20201], *filasIngreso(2)])
+
+    def encolar(self, contenido):
+        with mock.patch('registros.views.encolarCarga') as encolar:
+            respuesta = self.subir('ingresos', contenido, parametros='?async=1')
+        self.assertEqual(respuesta.status_code, 202)
+        carga = Carga.objects.get(pk=respuesta.data['id'])
+        encolar.assert_called_once_with(carga, IngresoUpload)
+        self.assertEqual(respuesta['Location'], f'/registros/cargas/{carga.pk}/')
+        return respuesta, carga
+
+    def eventos(self, carga):
+        respuesta = self.client.get(f'/registros/cargas/{carga.pk}/eventos/')
+        self.assertEqual(respuesta['Content-Type'], 'text/event-stream')
+        texto = b''.join(respuesta.streaming_content).decode()
+        return [
+            (evento.split('\n')[0].removeprefix('event: '), json.loads(evento.split('\n')[1].removeprefix('data: ')))
+            for evento in texto.split('\n\n') if evento
+        ]
+
+    def test_carga_en_segundo_plano(self):
+        respuesta, carga = self.encolar(self.contenido)
+        self.assertEqual(respuesta.data['estado'], Carga.Estados.PENDIENTE)
+        self.assertFalse(Ingreso.objects.exists())
+
+        # El worker procesa la carga con la misma lógica que la vista
+        status, resultado = procesarCarga(carga.pk, IngresoUpload, cerrar_conexiones=False)
+        self.assertEqual((status, resultado['created']), (200, 6))
+        respuesta = self.client.get(respuesta['Location'])
+        self.assertEqual(respuesta.data['estado'], Carga.Estados.COMPLETADA)
+        self.assertEqual((respuesta.data['filas_leidas'], respuesta.data['creados']), (2, 6))
+        self.assertEqual(respuesta.data['periodo'], '20201')
+
+        eventos = self.eventos(carga)
+        self.assertEqual([nombre for nombre, _ in eventos], ['progreso'])
+        self.assertTrue(eventos[0][1]['terminada'])
+
+    def test_eventos_de_progreso(self):
+        _, carga = self.encolar(self.contenido)
+        avances = iter([
+            {'estado': Carga.Estados.PROCESANDO},
+            {'filas_leidas': 1},
+            {'filas_leidas': 2, 'creados': 6, 'estado': Carga.Estados.COMPLETADA},
+        ])
+
+        # Cada espera del stream avanza la carga; una espera sin cambios no envía evento
+        def avanzar(segundos):
+            Carga.objects.filter(pk=carga.pk).update(**next(avances, {}))
+
+        with mock.patch('registros.views.time.sleep', side_effect=avanzar):
+            eventos = self.eventos(carga)
+        self.assertEqual(
+            [(datos['estado'], datos['filas_leidas']) for _, datos in eventos],
+            [('PE', 0), ('PR', 0), ('PR', 1), ('CO', 2)]
+        )
+
+    def test_progreso_se_guarda_durante_la_carga(self):
+        _, carga = self.encolar(archivoExcel([[*ENCABEZADOS_INGRESO, 20201], *filasIngreso(30)]))
+        guardados = []
+        original = ProgresoCarga.guardar
+
+        def guardar(progreso, **campos):
+            original(progreso, **campos)
+            guardados.append(Carga.objects.values_list('estado', 'filas_leidas', 'filas_validadas').get(pk=carga.pk))
+
+        with mock.patch.object(ProgresoCarga, 'guardar', guardar), mock.patch.object(ProgresoCarga, 'INTERVALO', 0):
+            status, _ = procesarCarga(carga.pk, IngresoUpload, cerrar_conexiones=False)
+        self.assertEqual(status, 200)
+        # Los contadores avanzan mientras la carga está en proceso, antes del resultado final
+        en_proceso = [guardado[1:] for guardado in guardados if guardado[0] == Carga.Estados.PROCESANDO]
+        self.assertIn((30, 30), en_proceso)
+        self.assertEqual(en_proceso, sorted(en_proceso))
+        self.assertEqual(guardados[-1], (Carga.Estados.COMPLETADA, 30, 30))
+
+    def test_carga_con_error(self):
+        _, carga = self.encolar(b'no es un archivo de excel')
+        status, resultado = procesarCarga(carga.pk, IngresoUpload, cerrar_conexiones=False)
+        self.assertEqual(status, 400)
+        self.assertTrue(resultado['errors'])
+        carga.refresh_from_db()
+        self.assertEqual(carga.estado, Carga.Estados.ERROR)
+        self.assertTrue(carga.archivo)
+        eventos = self.eventos(carga)
+        self.assertEqual(eventos[-1][1]['estado'], Carga.Estados.ERROR)
+
+        # Un error inesperado del worker también deja la carga con error
+        with mock.patch.object(IngresoUpload, 'procesar', side_effect=RuntimeError('falla simulada')):
+            status, resultado = procesarCarga(carga.pk, IngresoUpload, cerrar_conexiones=False)
+        self.assertEqual(status, 500)
+        self.assertIn('falla simulada', Carga.objects.get(pk=carga.pk).resultado['message'])
+
+    def test_eventos_de_una_carga_inexistente(self):
+        respuesta = self.client.get('/registros/cargas/00000000-0000-0000-0000-000000000000/eventos/')
+        self.assertEqual(b''.join(respuesta.streaming_content).decode().split('\n')[0], 'event: error')
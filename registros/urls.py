@@ -5,6 +5,7 @@ urlpatterns = [
     path('ingresos/', views.IngresoList.as_view(), name='ingresos-list'),
     path('ingresos/<int:pk>/', views.IngresoDetail.as_view(), name='ingresos-detail'),
     re_path(r'^ingresos/subir/(?P<filename>[^/]+)$', views.IngresoUpload.as_view(), name='ingresos-upload'),
+    re_path(r'^ingresos/historial/subir/(?P<filename>[^/]+)$', views.IngresoHistorialUpload.as_view(), name='ingresos-historial-upload'),
     path('egresos/', views.EgresoList.as_view(), name='egresos-list'),
     path('egresos/<int:pk>/', views.EgresoDetail.as_view(), name='egresos-detail'),
     re_path(r'^egresos/subir/(?P<filename>[^/]+)$', views.EgresoUpload.as_view(), name='egresos-upload'),
@@ -14,5 +15,10 @@ urlpatterns = [
     path('liberaciones-ingles/', views.LiberacionInglesList.as_view(), name='liberaciones-ingles-list'),
     path('liberaciones-ingles/<int:pk>/', views.LiberacionInglesDetail.as_view(), name='liberaciones-ingles-detail'),
     re_path(r'^liberaciones-ingles/subir/(?P<filename>[^/]+)$', views.LiberacionInglesUpload.as_view(), name='liberaciones-ingles-upload'),
+    path('cargas/', views.CargaList.as_view(), name='cargas-list'),
+    path('cargas/<uuid:pk>/', views.CargaDetail.as_view(), name='cargas-detail'),
+    path('cargas/<uuid:pk>/eventos/', views.CargaEventos.as_view(), name='cargas-eventos'),
+    path('cargas/<uuid:pk>/reanudar/', views.CargaReanudar.as_view(), name='cargas-reanudar'),
     path('realizar-corte/', views.corte, name='corte'),
+    path('cortes/', views.CorteList.as_view(), name='cortes-list'),
 ]
\ No newline at end of file
@@ -0,0 +1,62 @@
+from django.db import models, router, transaction
+
+# Versión de los datos que usan las rutas de analítica (registros, alumnos, personal,
+# planes, carreras y cortes). Cada escritura la incrementa al confirmarse la
+# transacción; las rutas de analítica la usan en su ETag y Last-Modified
+
+def registrarCambio(using=None):
+    # Una transacción registra a lo más un incremento: el callback pendiente se guarda en
+    # la conexión y se limpia al ejecutarse. Si la transacción (o el savepoint donde se
+    # registró) se revierte, Django lo quita de run_on_commit y se vuelve a registrar
+    conexion = transaction.get_connection(using)
+    pendiente = getattr(conexion, 'cambio_pendiente', None)
+    if pendiente is not None and any(func is pendiente for _, func, _ in conexion.run_on_commit):
+        return
+
+    def incrementar():
+        conexion.cambio_pendiente = None
+        from .models import VersionDatos
+        VersionDatos.objects.incrementar()
+    if conexion.in_atomic_block:
+        conexion.cambio_pendiente = incrementar
+    transaction.on_commit(incrementar, using=using)
+
+def versionDatos():
+    """(versión, fecha de la última escritura) con una consulta por llave primaria"""
+    from .models import VersionDatos
+    return VersionDatos.objects.actual()
+
+def datosCambiados(sender, using=None, **kwargs):
+    # Receptor de post_save y post_delete, conectado en RegistrosConfig.ready()
+    registrarCambio(using)
+
+class VersionadoQuerySet(models.QuerySet):
+    # Las escrituras en bloque no envían señales, se registran aquí. El cambio se registra
+    # después de escribir (si falla no hay cambio) y en la base de escritura: antes de
+    # escribir, self.db es la base de lectura, que puede ser la réplica de analítica
+    def alias_escritura(self):
+        return self._db or router.db_for_write(self.model, **self._hints)
+
+    def bulk_create(self, *args, **kwargs):
+        resultado = super().bulk_create(*args, **kwargs)
+        registrarCambio(self.alias_escritura())
+        return resultado
+
+    def bulk_update(self, *args, **kwargs):
+        resultado = super().bulk_update(*args, **kwargs)
+        registrarCambio(self.alias_escritura())
+        return resultado
+    bulk_update.alters_data = True
+
+    def update(self, *args, **kwargs):
+        resultado = super().update(*args, **kwargs)
+        registrarCambio(self.alias_escritura())
+        return resultado
+    update.alters_data = True
+
+    def delete(self):
+        resultado = super().delete()
+        registrarCambio(self.alias_escritura())
+        return resultado
+    delete.alters_data = True
+    delete.queryset_only = True
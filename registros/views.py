@@ -1,28 +1,39 @@
 from django.forms import ValidationError
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from backend.permissions import IsAdminUserOrReadOnly
+from backend.pagination import KeysetPagination
+from backend.filters import QueryParamFilter, SparseFieldsMixin
+from backend.bulk import BulkMixin
 
 # Para hacer transacciones atómicas. Asegura que todas las operaciones se completen
-from django.db import transaction
+from django.db import transaction, connection, IntegrityError
+from django.db.models import Max
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.core.serializers.json import DjangoJSONEncoder
 
-from rest_framework import generics, views
+from rest_framework import generics, views, renderers
 from rest_framework.parsers import FileUploadParser
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes 
 
-# Procesar en chunks más pequeños pero con procesamiento paralelo
-from concurrent.futures import ThreadPoolExecutor
-
-from .serializers import IngresoSerializer, EgresoSerializer, TitulacionSerializer, LiberacionInglesSerializer
-from .models import Ingreso, Egreso, Titulacion, LiberacionIngles
-from .periodos import getPeriodoActual
+from .serializers import IngresoSerializer, EgresoSerializer, TitulacionSerializer, LiberacionInglesSerializer, CargaSerializer, CorteSerializer
+from .models import Ingreso, Egreso, Titulacion, LiberacionIngles, Carga, Corte, periodosRevisados
+from .periodos import getPeriodoActual, getNumSemestre
+from .lectores import obtenerLector
+from .ingesta import MotorIngesta, construirModelos
+from .tareas import ProgresoCarga, encolarCarga, identificadorWorker, procesarCarga, reclamarCarga
 
 from personal.models import Personal, obtenerFechaNac, obtenerGenero
 from alumnos.models import Alumno
 from carreras.models import Carrera
 from planes.models import Plan
 
-import openpyxl
+from contextlib import contextmanager
+from collections import deque
+import hashlib
+import itertools
+import json
 import re
 import pandas as pd
 import numpy as np
@@ -34,25 +45,236 @@ import psutil
 
 logger = logging.getLogger(__name__)
 
+class CargaMixin:
+    """
+    Comportamiento común de las vistas de subida de archivos.
+
+    Por defecto el archivo se procesa dentro de la solicitud. Con ?async=1 el
+    archivo se guarda, se responde de inmediato con la carga (202, con su dirección
+    en Location) y el procesamiento se realiza en el pool de workers local; el progreso
+    se consulta en registros/cargas/<id>/ o por eventos en registros/cargas/<id>/eventos/.
+    El parámetro ?modo= indica qué hacer con los registros existentes, cada vista
+    declara en `modos` los que soporta ('crear' por defecto).
+    Con ?dry-run=1 el archivo solo se valida contra la base de datos, sin escribir,
+    y se regresa lo que se crearía junto con los errores de cada fila.
+
+    Cada carga queda en la bitácora (Carga) con el hash de su contenido. Si se
+    recibe de nuevo el mismo archivo con las mismas opciones y ya se completó,
+    se regresa el resultado anterior sin procesarlo; si falló, se reanuda desde
+    el último lote escrito. Con ?forzar=1 se procesa como una carga nueva.
+    Cada vista implementa procesar(file_obj, filename, progreso, opciones) -> (status, data).
+    """
+    tipo_carga = None
+    modos = ['crear']
+    PREFETCH_BATCH_SIZE = 500  # Máximo de valores por consulta IN al obtener datos existentes
+
+    @staticmethod
+    def respuesta_encolada(carga):
+        """202 con la carga y su dirección, donde se consulta el progreso"""
+        return Response(
+            status=202,
+            data=CargaSerializer(carga).data,
+            headers={'Location': reverse('cargas-detail', kwargs={'pk': carga.pk})}
+        )
+
+    def get_opciones(self, request):
+        """Obtiene las opciones de procesamiento de los parámetros de la solicitud"""
+        modo = request.query_params.get('modo', self.modos[0]).lower()
+        if modo not in self.modos:
+            raise ValidationError(f'Modo no soportado: {modo}, opciones: {", ".join(self.modos)}')
+        dry_run = request.query_params.get('dry-run', '').lower() in ('1', 'true')
+        return {'modo': modo, 'dry_run': dry_run}
+
+    def prefetch_in_batches(self, queryset, field, values):
+        """Ejecuta la consulta con filtros IN en lotes para no exceder el límite de parámetros"""
+        values = list(values)
+        for i in range(0, len(values), self.PREFETCH_BATCH_SIZE):
+            batch = values[i:i + self.PREFETCH_BATCH_SIZE]
+            yield from queryset.filter(**{f'{field}__in': batch}).iterator()
+
+    def no_controls_lote(self, lote):
+        """Obtiene los no. de control de un lote para precargar sus registros"""
+        no_controls = set()
+        for _, row in lote:
+            try:
+                data = self.to_dict(row)
+            except Exception:
+                continue
+            if data is not None:
+                no_controls.add(data['no_control'])
+        return no_controls
+
+    def get_hash(self, file_obj):
+        """Calcula el hash SHA-256 del contenido del archivo"""
+        sha = hashlib.sha256()
+        for chunk in file_obj.chunks():
+            sha.update(chunk)
+        file_obj.seek(0)
+        return sha.hexdigest()
+
+    def post(self, request, filename, format=None):
+        file_obj = request.data['file']
+        try:
+            opciones = self.get_opciones(request)
+        except ValidationError as ex:
+            return Response(status=400, data={'message': ex.message})
+        en_segundo_plano = request.query_params.get('async', '').lower() in ('1', 'true')
+
+        # La validación sin escritura dentro de la solicitud no necesita bitácora
+        if opciones['dry_run'] and not en_segundo_plano:
+            status, data = self.procesar(file_obj, filename, ProgresoCarga(), opciones)
+            return Response(status=status, data=data)
+
+        hash_contenido = self.get_hash(file_obj)
+        carga = None
+        if request.query_params.get('forzar', '').lower() not in ('1', 'true'):
+            carga = Carga.objects.filter(
+                tipo=self.tipo_carga,
+                hash_contenido=hash_contenido,
+                opciones=opciones
+            ).first()
+
+        if carga is not None and carga.estado == Carga.Estados.COMPLETADA:
+            logger.info(f"Archivo {filename} ya procesado en la carga {carga.pk}")
+            return Response(status=200, data={**carga.resultado, 'carga': carga.pk, 'duplicado': True})
+        if carga is not None and not reclamarCarga(carga):
+            # Pendiente o en proceso en otro worker, se puede consultar su progreso
+            return self.respuesta_encolada(carga)
+
+        if carga is None:
+            carga = Carga.objects.create(
+                tipo=self.tipo_carga,
+                archivo=file_obj,
+                nombre_archivo=filename,
+                opciones=opciones,
+                hash_contenido=hash_contenido,
+                usuario=request.user,
+                worker=identificadorWorker()
+            )
+        else:
+            # La carga falló o se abandonó, se reanuda con el archivo que ya se tenía guardado
+            logger.info(f"Reanudando la carga {carga.pk} del archivo {filename}")
+
+        if en_segundo_plano:
+            encolarCarga(carga, self.__class__)
+            return self.respuesta_encolada(carga)
+
+        status, data = procesarCarga(carga.pk, self.__class__, cerrar_conexiones=False)
+        return Response(status=status, data={**data, 'carga': carga.pk})
+
+    def validar_periodos_abiertos(self, *periodos):
+        """Los periodos con corte ya no admiten registros, se revisan en la bitácora de cortes"""
+        cerrados = sorted(Corte.objects.filter(periodo__in=periodos).values_list('periodo', flat=True))
+        if len(cerrados) == 1:
+            raise Exception(f'El periodo {cerrados[0]} ya tiene corte, no se pueden agregar registros')
+        if cerrados:
+            raise Exception(f'Los periodos {", ".join(cerrados)} ya tienen corte, no se pueden agregar registros')
+
+    @contextmanager
+    def transaccion_lote(self, periodo):
+        """
+        Transacción de un lote de las cargas que guardan fila por fila. El corte del
+        periodo se revisa una vez para todo el lote y no en el save() de cada registro
+        """
+        with transaction.atomic():
+            self.validar_periodos_abiertos(periodo)
+            with periodosRevisados(periodo):
+                yield
+
+    def procesar(self, file_obj, filename, progreso, opciones=None):
+        raise NotImplementedError("Las subclases deben implementar procesar")
+
+# Filtros comunes de las listas de registros, ?tipo= acepta varios tipos separados por comas
+FILTROS_REGISTRO = {
+    'periodo': 'periodo',
+    'periodo-desde': 'periodo__gte',
+    'periodo-hasta': 'periodo__lte',
+    'alumno': 'alumno',
+    'carrera': 'alumno__plan__carrera',
+    'es-corte': 'es_corte',
+}
+
+class RegistroBulkMixin(BulkMixin):
+    """
+    Escrituras en bloque de registros (POST o PATCH con una lista). Además de las
+    validaciones de BulkMixin revisa lo que BaseRegistro.save() impide: periodos
+    con corte y registros ya cortados. Cada vista agrega en validate_batch las
+    reglas del clean() de su modelo, consultadas una vez para todo el lote.
+    """
+    def validate_batch(self, batch):
+        cerrados = Corte.objects.periodos_cerrados()
+        for index, registro in batch.pending():
+            if not batch.creating and registro.es_corte:
+                batch.add_error(index, 'Este registro ya no puede ser modificado')
+            elif registro.periodo in cerrados:
+                batch.add_error(index, f'El periodo {registro.periodo} ya tiene corte, no se pueden agregar ni modificar sus registros', 'periodo')
+
+    def registros_por_alumno(self, model, batch):
+        """{alumno: {pk de sus registros}} de los alumnos del lote, para las reglas de un registro por alumno"""
+        alumnos = {registro.alumno_id for _, registro in batch.pending()}
+        registros = {}
+        for alumno, pk in self.filter_in_batches(model.objects.values_list('alumno', 'pk'), 'alumno', alumnos):
+            registros.setdefault(alumno, set()).add(pk)
+        return registros
+
+    def validar_unico_por_alumno(self, batch, registros, mensaje):
+        """Un registro por alumno, contando los existentes y los anteriores del mismo lote"""
+        for index, registro in batch.pending():
+            otros = registros.setdefault(registro.alumno_id, set()) - {registro.pk}
+            if otros:
+                batch.add_error(index, mensaje)
+            else:
+                registros[registro.alumno_id].add(registro.pk or f'lote-{index}')
+
 ### INGRESO
-class IngresoList(generics.ListCreateAPIView):
+class IngresoList(SparseFieldsMixin, RegistroBulkMixin, generics.ListCreateAPIView):
     queryset = Ingreso.objects.all()
     serializer_class = IngresoSerializer
     permission_classes = [IsAuthenticated&IsAdminUserOrReadOnly]
+    pagination_class = KeysetPagination
+    filter_backends = [QueryParamFilter]
+    query_filters = {**FILTROS_REGISTRO, 'tipo': 'tipo__in', 'num-semestre': 'num_semestre'}
+
+    def validate_batch(self, batch):
+        super().validate_batch(batch)
+        alumnos = {ingreso.alumno_id for _, ingreso in batch.pending()}
+        egresados = set(self.filter_in_batches(Egreso.objects.values_list('alumno', flat=True), 'alumno', alumnos))
+        exclusivos = {}
+        consulta = Ingreso.objects.filter(tipo__in=Ingreso.TIPOS_EXCLUSIVOS).values_list('alumno', 'pk')
+        for alumno, pk in self.filter_in_batches(consulta, 'alumno', alumnos):
+            exclusivos.setdefault(alumno, set()).add(pk)
+
+        for index, ingreso in batch.pending():
+            if ingreso.alumno_id in egresados:
+                batch.add_error(index, 'No se puede registrar un ingreso para un alumno egresado')
+                continue
+            otros = exclusivos.setdefault(ingreso.alumno_id, set()) - {ingreso.pk}
+            if ingreso.tipo not in Ingreso.TIPOS_EXCLUSIVOS:
+                # Un cambio de tipo deja libre el ingreso exclusivo del alumno
+                exclusivos[ingreso.alumno_id].discard(ingreso.pk)
+            elif otros:
+                batch.add_error(index, 'Solo puede existir un ingreso de EXAMEN, EQUIVALENCIA, TRASLADO o CONVALIDACION', 'tipo')
+            else:
+                exclusivos[ingreso.alumno_id].add(ingreso.pk or f'lote-{index}')
 
 class IngresoDetail(generics.RetrieveUpdateDestroyAPIView):
     queryset = Ingreso.objects.all()
     serializer_class = IngresoSerializer
     permission_classes = [IsAuthenticated&IsAdminUserOrReadOnly]
 
-# FORMATO DE EXCEL [CURP, NO_CONTROL, PATERNO, MATERNO, NOMBRE, CARRERA, (PERIODO+TIPO)]
-class IngresoUpload(views.APIView):
+# FORMATO DE ARCHIVO (EXCEL, CSV, PARQUET O ARROW) [CURP, NO_CONTROL, PATERNO, MATERNO, NOMBRE, CARRERA, (PERIODO+TIPO)]
+class IngresoUpload(CargaMixin, views.APIView):
     parser_classes = [FileUploadParser]
+    tipo_carga = Carga.Tipos.INGRESOS
+    modos = ['crear', 'upsert']  # upsert: corrige nombres del personal y el plan de los alumnos existentes
     permission_classes = [IsAuthenticated & IsAdminUser]
     CHUNK_SIZE = 300  # Reducido para archivos pequeños/medianos | El más adecuado para la aplicación
+    MIN_ROWS_PROCESS_POOL = 5000  # A partir de este tamaño la validación se reparte en varios procesos
+    PERSONAL_UPDATE_FIELDS = ['paterno', 'materno', 'nombre']
+    ALUMNO_UPDATE_FIELDS = ['plan']
 
-    def validate_data(self, df):
-        """Valida el DataFrame y extrae el periodo de la última columna"""
+    def validate_data(self, df, periodo_col):
+        """Valida el DataFrame y agrega el periodo tomado del encabezado de la última columna"""
         if df.empty:
             raise Exception('Archivo vacío')
 
@@ -60,65 +282,129 @@ class IngresoUpload(views.APIView):
         if len(df.columns) != 7:
             raise Exception('Número incorrecto de columnas')
 
-        # Obtener y validar periodo de la última columna
-        periodo_col = str(df.columns[-1])
-        if not re.match(r'^[12][0-9]{3}[13]$', periodo_col):
-            raise Exception(f'Formato de periodo inválido: {periodo_col}')
-
         # Renombrar columnas
         df.columns = ['curp', 'no_control', 'paterno', 'materno', 'nombre', 'carrera', 'tipo']
 
         # Añadir columna de periodo
         df['periodo'] = periodo_col
 
-        # Limpiar datos
-        df = df.apply(lambda x: x.str.strip() if x.dtype == "object" else x)
-
         # Validar datos requeridos
         required_fields = ['curp', 'no_control', 'nombre', 'carrera', 'tipo']
         df = df.dropna(subset=required_fields)
 
         return df
 
-    def get_cached_data(self):
-        """Obtiene y cachea los datos necesarios de manera más eficiente"""
+    def validate_headers(self, encabezados):
+        """Valida los encabezados del archivo y extrae el periodo de la última columna"""
+        if len(encabezados) != 7:
+            raise Exception('Número incorrecto de columnas')
+
+        periodo_col = str(encabezados[-1])
+        if not re.match(r'^[12][0-9]{3}[13]$', periodo_col):
+            raise Exception(f'Formato de periodo inválido: {periodo_col}')
+        return periodo_col
+
+    def to_dataframe(self, lote, encabezados):
+        """Convierte un lote de filas del lector en un DataFrame indexado por número de fila"""
+        numeros_fila = [numero_fila for numero_fila, _ in lote]
+        valores = [fila for _, fila in lote]
+        df = pd.DataFrame(valores, columns=list(encabezados), index=numeros_fila, dtype=object)
+        # Las celdas vacías se tratan como cadenas vacías para que fallen en la validación de la fila
+        return df.fillna('')
+
+    def get_catalogos(self):
+        """Obtiene los catálogos de carreras y planes, son tablas pequeñas y se leen una sola vez"""
+        # Obtener solo los datos necesarios de carreras
+        carreras = {
+            c.clave: c 
+            for c in Carrera.objects.only('clave').all()
+        }
+
+        # Obtener planes con su carrera relacionada
+        planes = {
+            p.carrera.clave: p 
+            for p in Plan.objects.select_related('carrera').only(
+                'clave',
+                'carrera'
+            ).all()
+        }
+
+        return carreras, planes
+
+    def get_cached_data(self, chunk):
+        """Obtiene solo los registros existentes relacionados con los no. de control y CURPs del chunk"""
+        no_controls = set(chunk['no_control'])
+        curps = set(chunk['curp'])
+
+        existentes = {
+            'ingresos': set(),      # (alumno, periodo, tipo) ya registrados, se omiten sin error
+            'periodos': set(),      # (alumno, periodo) para la restricción unique_ingreso
+            'semestres': set(),     # (alumno, num_semestre) para la restricción unique_num_semestre
+            'exclusivos': set(),    # alumnos que ya tienen un ingreso de tipo exclusivo
+            'primeros': {},         # primer ingreso de cada alumno para calcular el número de semestre
+        }
+
         with transaction.atomic():
-            # Obtener ingresos existentes usando iterator() para mejor memoria
-            existing_ingresos = set(
-                Ingreso.objects.values_list(
-                    'alumno_id', 'periodo', 'tipo'
-                ).iterator()
+            # Ingresos existentes de los alumnos del chunk, con ellos se validan las
+            # reglas del modelo sin consultas por fila
+            for alumno_id, periodo, tipo, num_semestre in self.prefetch_in_batches(
+                Ingreso.objects.values_list('alumno_id', 'periodo', 'tipo', 'num_semestre'),
+                'alumno_id',
+                no_controls
+            ):
+                existentes['ingresos'].add((alumno_id, periodo, tipo))
+                existentes['periodos'].add((alumno_id, periodo))
+                existentes['semestres'].add((alumno_id, num_semestre))
+                if tipo in Ingreso.TIPOS_EXCLUSIVOS:
+                    existentes['exclusivos'].add(alumno_id)
+                primero = existentes['primeros'].get(alumno_id)
+                if primero is None or periodo < primero[0]:
+                    existentes['primeros'][alumno_id] = (periodo, num_semestre)
+
+            # Alumnos del chunk que ya egresaron
+            existentes['egresados'] = set(
+                self.prefetch_in_batches(
+                    Egreso.objects.values_list('alumno_id', flat=True),
+                    'alumno_id',
+                    no_controls
+                )
             )
 
-            # Obtener alumnos con datos relacionados en una sola consulta
-            existing_alumnos = {
+            # Obtener alumnos del chunk con datos relacionados
+            existentes['alumnos'] = {
                 a.no_control: a 
-                for a in Alumno.objects.select_related(
-                    'plan',
-                    'plan__carrera'
-                ).only(
+                for a in self.prefetch_in_batches(
+                    Alumno.objects.select_related(
+                        'plan',
+                        'plan__carrera'
+                    ).only(
+                        'no_control',
+                        'plan__carrera__clave',
+                        'curp_id'
+                    ),
                     'no_control',
-                    'plan__carrera__clave',
-                    'curp_id'
-                ).all()
+                    no_controls
+                )
             }
 
-            # Obtener solo los datos necesarios de carreras
-            carreras = {
-                c.clave: c 
-                for c in Carrera.objects.only('clave').all()
+            # Información personal existente de las CURPs del chunk, los nombres se
+            # comparan en modo upsert para actualizar solo lo que cambió
+            existentes['personal'] = {
+                curp: nombres
+                for curp, *nombres in self.prefetch_in_batches(
+                    Personal.objects.values_list('curp', *self.PERSONAL_UPDATE_FIELDS),
+                    'curp',
+                    curps
+                )
             }
 
-            # Obtener planes con su carrera relacionada
-            planes = {
-                p.carrera.clave: p 
-                for p in Plan.objects.select_related('carrera').only(
-                    'clave',
-                    'carrera'
-                ).all()
-            }
+        return existentes
 
-            return existing_ingresos, existing_alumnos, carreras, planes
+    def to_columns(self, chunk):
+        """Convierte el chunk en un diccionario de listas por columna para enviarlo al pool de procesos"""
+        columnas = {columna: chunk[columna].tolist() for columna in chunk.columns}
+        columnas['fila'] = chunk.index.tolist()
+        return columnas
 
     def get_optimal_workers(self, total_records):
         """Determinar número óptimo de workers según tamaño de datos"""
@@ -138,14 +424,25 @@ class IngresoUpload(views.APIView):
         else:
             return 500
 
-    def bulk_create_with_progress(self, model, objects, batch_size=100):
-        """Creación en lotes optimizada con mejor manejo de memoria y errores"""
+    def bulk_create_with_progress(self, model, objects, batch_size=100, progreso=None, update_fields=None):
+        """
+        Creación en lotes optimizada con mejor manejo de memoria y errores.
+        Con update_fields los registros existentes se actualizan (insert or update)
+        en lugar de ignorarse.
+        """
         if not objects:
             return 0
         
         total = len(objects)
         created = 0
         max_retries = 3
+
+        opciones = {'ignore_conflicts': True}
+        if update_fields:
+            opciones = {'update_conflicts': True, 'update_fields': update_fields}
+            # MySQL resuelve el conflicto con cualquier llave única y no acepta indicarla
+            if connection.features.supports_update_conflicts_with_target:
+                opciones['unique_fields'] = [model._meta.pk.name]
         
         def create_batch_with_retry(batch):
             """Función auxiliar para crear un batch con reintentos"""
@@ -154,8 +451,8 @@ class IngresoUpload(views.APIView):
                     with transaction.atomic():
                         return len(model.objects.bulk_create(
                             batch,
-                            ignore_conflicts=True,
-                            batch_size=len(batch)
+                            batch_size=len(batch),
+                            **opciones
                         ))
                 except Exception as ex:
                     if attempt == max_retries - 1:
@@ -173,7 +470,10 @@ class IngresoUpload(views.APIView):
         # Procesar cada batch
         for batch in batches:
             try:
-                created += create_batch_with_retry(batch)
+                created_batch = create_batch_with_retry(batch)
+                created += created_batch
+                if progreso is not None:
+                    progreso.actualizar(creados=created_batch)
                 del batch
                 
                 # Limpiar memoria periódicamente
@@ -186,14 +486,15 @@ class IngresoUpload(views.APIView):
         
         return created
 
-    def get_optimal_chunk_configuration(self, df):
+    def get_optimal_chunk_configuration(self, df, total_records=None):
         """Configuración optimizada de chunks basada en recursos del sistema"""
         try:
-            # Calcular memoria disponible y tamaño de registros
+            # Calcular memoria disponible y tamaño de registros a partir de la muestra
             memory = psutil.virtual_memory()
             available_memory = memory.available
             record_size = df.memory_usage(deep=True).sum() / len(df)
-            total_records = len(df)
+            if total_records is None:
+                total_records = len(df)
 
             # Calcular tamaño óptimo de chunk basado en memoria disponible
             # Usar solo 30% de la memoria disponible para ser conservadores
@@ -223,191 +524,500 @@ class IngresoUpload(views.APIView):
         except Exception as ex:
             logger.warning(f"Error al calcular tamaño de chunk: {str(ex)}")
             # Fallback a configuración estática si hay error
-            return self.get_optimal_chunk_size(len(df))
+            return self.get_optimal_chunk_size(total_records or len(df))
 
-    def post(self, request, filename, format=None):
+    def procesar(self, file_obj, filename, progreso, opciones=None):
         start_time = time.time()
-        file_obj = request.data['file']
         results = {"errors": [], "created": 0}
+        # Los errores de filas se reportan con 200; un error que detiene la carga la marca con error
+        status = 200
+        total_rows = 0
+        upsert = (opciones or {}).get('modo') == 'upsert'
+        dry_run = (opciones or {}).get('dry_run', False)
+        if upsert:
+            results['updated'] = 0
+        if dry_run:
+            results['dry_run'] = True
 
         try:
-            # Tu código existente de lectura
-            df = pd.read_excel(
-                file_obj,
-                header=0,
-                engine='openpyxl',
-                na_filter=False,
-                usecols="A:G",
-                converters={
-                    'curp': lambda x: str(x).strip() if pd.notna(x) else '',
-                    'no_control': lambda x: str(x).strip() if pd.notna(x) else '',
-                    'paterno': lambda x: str(x).strip() if pd.notna(x) else '',
-                    'materno': lambda x: str(x).strip() if pd.notna(x) else '',
-                    'nombre': lambda x: str(x).strip() if pd.notna(x) else '',
-                    'carrera': lambda x: str(x).strip() if pd.notna(x) else ''
+            with obtenerLector(file_obj, filename, num_columnas=7) as lector:
+                periodo_col = self.validate_headers(lector.encabezados)
+                self.validar_periodos_abiertos(periodo_col)
+                progreso.registrar_periodo(periodo_col)
+                carreras, planes = self.get_catalogos()
+
+                # El número de filas declarado en el archivo es solo una estimación,
+                # el primer lote sirve como muestra para ajustar el tamaño de los siguientes
+                total_estimado = lector.total_filas or self.CHUNK_SIZE
+                lotes = lector.lotes(self.get_optimal_chunk_size(total_estimado))
+                primer_lote = next(lotes, None)
+                if primer_lote is None:
+                    raise Exception('Archivo vacío')
+
+                muestra = self.to_dataframe(primer_lote, lector.encabezados)
+                # Los lotes siguientes salen del mismo generador con el tamaño ajustado
+                lector.tamano_lote = self.get_optimal_chunk_configuration(muestra, total_estimado)
+
+                # Iniciar procesos tiene un costo fijo, en archivos pequeños se valida en este proceso
+                num_procesos = 1
+                if total_estimado >= self.MIN_ROWS_PROCESS_POOL:
+                    num_procesos = self.get_optimal_workers(total_estimado)
+
+                # Registros agregados durante esta carga, para validar filas repetidas entre chunks
+                estado = {'alumnos': {}, 'personal': set(), 'periodos': set()}
+                # Objetos a crear y, en modo upsert, a actualizar
+                objetos = {
+                    'personal': [],
+                    'alumnos': [],
+                    'ingresos': [],
+                    'personal_actualizar': [],
+                    'alumnos_actualizar': [],
                 }
-            )
-
-            df = self.validate_data(df)
-            existing_data = self.get_cached_data()
 
-            # Usar la nueva configuración optimizada
-            chunk_size = self.get_optimal_chunk_configuration(df)
-            num_workers = self.get_optimal_workers(len(df))
-            
-            chunks = [
-                df.iloc[i:i + chunk_size] 
-                for i in range(0, len(df), chunk_size)
-            ]
-            
-            all_personal = []
-            all_alumnos = []
-            all_ingresos = []
-
-            # Procesamiento paralelo optimizado
-            with ThreadPoolExecutor(max_workers=num_workers) as executor:
-                futures = [
-                    executor.submit(self.process_chunk, chunk, existing_data, results)
-                    for chunk in chunks
-                ]
-
-                for future in futures:
-                    personal_chunk, alumnos_chunk, ingresos_chunk = future.result()
-                    all_personal.extend(personal_chunk)
-                    all_alumnos.extend(alumnos_chunk)
-                    all_ingresos.extend(ingresos_chunk)
-
-            # Tu código existente de bulk_create
-            try:
-                with transaction.atomic():
-                    results['created'] += self.bulk_create_with_progress(Personal, all_personal)
-                    results['created'] += self.bulk_create_with_progress(Alumno, all_alumnos)
-                    results['created'] += self.bulk_create_with_progress(Ingreso, all_ingresos)
+                def aplicar(pendiente):
+                    existentes, future = pendiente
+                    resultados = construirModelos(future.result())
+                    errores_chunk = self.apply_business_rules(
+                        resultados, existentes, planes, estado, objetos, results['errors'], upsert
+                    )
+                    progreso.actualizar(validadas=len(resultados) - errores_chunk, errores=errores_chunk)
+
+                # La validación de cada chunk se envía al pool en cuanto se lee, y los resultados
+                # se aplican en el orden de entrada para que los errores siempre salgan en el mismo orden
+                with MotorIngesta(num_procesos) as motor:
+                    pendientes = deque()
+                    for lote in itertools.chain([primer_lote], lotes):
+                        chunk = self.validate_data(self.to_dataframe(lote, lector.encabezados), periodo_col)
+                        total_rows += len(chunk)
+                        progreso.actualizar(leidas=len(lote))
+                        existentes = self.get_cached_data(chunk)
+                        pendientes.append((existentes, motor.enviar(self.to_columns(chunk), set(carreras))))
+
+                        # Limitar los chunks en espera para mantener acotada la memoria
+                        while len(pendientes) > num_procesos * 2:
+                            aplicar(pendientes.popleft())
+
+                    while pendientes:
+                        aplicar(pendientes.popleft())
+
+            # En dry-run solo se reporta lo que se crearía o actualizaría
+            if dry_run:
+                results['created'] = len(objetos['personal']) + len(objetos['alumnos']) + len(objetos['ingresos'])
+                if upsert:
+                    results['updated'] = len(objetos['personal_actualizar']) + len(objetos['alumnos_actualizar'])
+            else:
+                # Las escrituras se realizan en este proceso dentro de una sola transacción.
+                # Los conteos pasan al resultado solo si la transacción se confirma
+                try:
+                    creados = actualizados = 0
+                    with transaction.atomic():
+                        creados += self.bulk_create_with_progress(Personal, objetos['personal'], progreso=progreso)
+                        creados += self.bulk_create_with_progress(Alumno, objetos['alumnos'], progreso=progreso)
+                        creados += self.bulk_create_with_progress(Ingreso, objetos['ingresos'], progreso=progreso)
+                        if upsert:
+                            actualizados += self.bulk_create_with_progress(
+                                Personal, objetos['personal_actualizar'], update_fields=self.PERSONAL_UPDATE_FIELDS
+                            )
+                            actualizados += self.bulk_create_with_progress(
+                                Alumno, objetos['alumnos_actualizar'], update_fields=self.ALUMNO_UPDATE_FIELDS
+                            )
+                    results['created'] += creados
+                    if upsert:
+                        results['updated'] += actualizados
 
-            except Exception as ex:
-                results['errors'].append({
-                    'type': str(type(ex)),
-                    'message': 'Error en bulk create: ' + str(ex)
-                })
+                except Exception as ex:
+                    # La transacción se revirtió, la carga queda con error para poder reanudarla
+                    status = 500
+                    results['errors'].append({
+                        'type': str(type(ex)),
+                        'message': 'Error en bulk create: ' + str(ex)
+                    })
 
             # Logging del rendimiento
             processing_time = time.time() - start_time
             logger.info(
                 f"Archivo procesado: {filename} "
                 f"Tiempo: {processing_time:.2f}s "
-                f"Registros: {len(df)} "
+                f"Procesos: {num_procesos} "
+                f"Registros: {total_rows} "
                 f"Creados: {results['created']}"
             )
 
             # Limpiar memoria final
-            del df
             gc.collect()
 
         except Exception as ex:
+            status = 400
             results['errors'].append({
                 'type': str(type(ex)),
                 'message': 'Error en el procesamiento: ' + str(ex)
             })
 
-        return Response(status=200, data=results)
+        return status, results
 
-    def process_chunk(self, chunk_data, existing_data, results):
-        """Procesa un chunk de datos y retorna las listas de objetos a crear"""
-        personal_chunk = []
-        alumnos_chunk = []
-        ingresos_chunk = []
+    def apply_business_rules(self, resultados, existentes, planes, estado, objetos, errors, upsert=False):
+        """
+        Aplica a las filas ya validadas por el pool las reglas que dependen de otros
+        registros, usando los datos precargados del chunk en lugar de full_clean().
+        Agrega a `objetos` los registros a crear (y a actualizar en modo upsert) y
+        retorna el número de filas con error.
+        """
+        errores_chunk = 0
 
-        existing_ingresos, existing_alumnos, carreras, planes = existing_data
+        for index, error, carrera, personal, ingreso in resultados:
+            if error is not None:
+                errores_chunk += 1
+                errors.append(error)
+                continue
 
-        try:
-            for index, row in chunk_data.iterrows():
-                try:
-                    # Las mismas validaciones que ya tienes
-                    Personal.validate_curp(row['curp'])
-                    Alumno.validate_nocontrol(row['no_control'])
-
-                    if row['carrera'] not in carreras:
-                        results['errors'].append({
-                            'type': 'CarreraDoesNotExist',
-                            'message': f'La carrera {row["carrera"]} no existe',
-                            'row_index': index + 2
-                        })
-                        continue
+            no_control = ingreso.alumno_id
+            try:
+                # Sin plan de estudios no se podría crear el alumno
+                if carrera not in planes:
+                    raise ValidationError(f'La carrera {carrera} no tiene un plan de estudios')
+
+                alumno = existentes['alumnos'].get(no_control)
+                carrera_alumno = estado['alumnos'].get(no_control)
+                if carrera_alumno is None and alumno is not None:
+                    carrera_alumno = alumno.plan.carrera.clave
+                    # En modo upsert el plan del alumno se actualiza a la carrera del archivo
+                    if upsert and carrera_alumno != carrera:
+                        alumno.plan = planes.get(carrera)
+                        objetos['alumnos_actualizar'].append(alumno)
+                        estado['alumnos'][no_control] = carrera_alumno = carrera
+                if carrera_alumno is not None and carrera_alumno != carrera:
+                    errores_chunk += 1
+                    errors.append({
+                        'type': 'Carrera',
+                        'message': "Carrera no coincide",
+                        'row_index': index
+                    })
+                    continue
 
-                    # Tu lógica existente de verificación de alumno
-                    alumno = existing_alumnos.get(row['no_control'])
-                    if alumno:
-                        if alumno.plan.carrera.clave != row['carrera']:
-                            results['errors'].append({
-                                'type': 'Carrera',
-                                'message': "Carrera no coincide",
-                                'row_index': index + 2
-                            })
-                            continue
-                    else:
-                        personal_chunk.append(
+                if personal.curp not in estado['personal']:
+                    nombres = existentes['personal'].get(personal.curp)
+                    if nombres is None and alumno is None:
+                        objetos['personal'].append(personal)
+                        estado['personal'].add(personal.curp)
+                    elif upsert and nombres is not None:
+                        # Normalizar igual que Personal.save() para comparar con lo guardado
+                        nuevos = [valor.upper() if valor else None for valor in (personal.paterno, personal.materno, personal.nombre)]
+                        if nuevos != nombres:
+                            personal.paterno, personal.materno, personal.nombre = nuevos
+                            objetos['personal_actualizar'].append(personal)
+                            estado['personal'].add(personal.curp)
+
+                if carrera_alumno is None:
+                    objetos['alumnos'].append(
+                        Alumno(
+                            no_control=no_control,
+                            curp_id=personal.curp,
+                            plan=planes.get(carrera)
+                        )
+                    )
+                    estado['alumnos'][no_control] = carrera
+
+                ingreso_key = (no_control, ingreso.periodo, ingreso.tipo)
+                if ingreso_key in existentes['ingresos']:
+                    continue
+
+                # Calcular número de semestre con el primer ingreso ya obtenido
+                primer_ingreso = existentes['primeros'].get(no_control)
+                if primer_ingreso is not None:
+                    ingreso.num_semestre = getNumSemestre(primer_ingreso[0], primer_ingreso[1], ingreso.periodo)
+                else:
+                    ingreso.num_semestre = 1
+                ingreso.clean_fields(exclude=[
+                    field.name for field in Ingreso._meta.fields if field.name != 'num_semestre'
+                ])
+
+                # Las mismas reglas de Ingreso.clean() y de las restricciones del modelo
+                if ingreso.tipo in Ingreso.TIPOS_EXCLUSIVOS and no_control in existentes['exclusivos']:
+                    raise ValidationError({'tipo': 'Solo puede existir un ingreso de EXAMEN, EQUIVALENCIA, TRASLADO o CONVALIDACION'})
+                if no_control in existentes['egresados']:
+                    raise ValidationError('No se puede registrar un ingreso para un alumno egresado')
+                if (no_control, ingreso.periodo) in existentes['periodos'] or (no_control, ingreso.periodo) in estado['periodos']:
+                    raise ValidationError('Ya existe un registro con este periodo para el alumno')
+                if (no_control, ingreso.num_semestre) in existentes['semestres']:
+                    raise ValidationError('Ya se tiene un ingreso con este número de semestre')
+
+                objetos['ingresos'].append(ingreso)
+                estado['periodos'].add((no_control, ingreso.periodo))
+
+            except Exception as ex:
+                errores_chunk += 1
+                errors.append({
+                    'type': str(type(ex)),
+                    'message': str(ex),
+                    'row_index': index
+                })
+
+        return errores_chunk
+
+# FORMATO DE ARCHIVO (EXCEL, CSV, PARQUET O ARROW) [CURP, NO_CONTROL, PATERNO, MATERNO, NOMBRE, CARRERA, PERIODO_1, ..., PERIODO_N]
+# Cada columna de periodo contiene el tipo de ingreso del alumno en ese periodo o se deja vacía
+class IngresoHistorialUpload(IngresoUpload):
+    """
+    Carga histórica de ingresos en formato ancho: un alumno por fila y una
+    columna por periodo. Cada lote de alumnos se valida fila por fila y sus
+    periodos se convierten a formato largo (un ingreso por fila) con pandas,
+    donde el número de semestre y las reglas de Ingreso se calculan por columnas.
+    """
+    tipo_carga = Carga.Tipos.HISTORIAL
+    modos = ['crear']
+    CHUNK_SIZE = 1000  # Alumnos por lote, cada uno puede tener decenas de ingresos
+    REQUIRED_FIELDS = ['curp', 'no_control', 'nombre', 'carrera']
+
+    def to_wide_dataframe(self, lote, campos, periodos):
+        """Convierte un lote de filas en un DataFrame con los campos del alumno y una columna por periodo"""
+        df = pd.DataFrame(
+            [fila for _, fila in lote],
+            index=[numero_fila for numero_fila, _ in lote],
+            dtype=object
+        )
+        columnas = {index: campo for campo, index in campos.items()}
+        columnas.update({index: periodo for periodo, index in periodos})
+        df = df[list(columnas)].rename(columns=columnas)
+        for campo in ('paterno', 'materno'):
+            if campo not in df.columns:
+                df[campo] = None
+        return df
+
+    def validate_alumnos(self, df, existentes, carreras, planes, estado, objetos, errores):
+        """Valida los datos de cada alumno del lote, regresa los no. de control válidos"""
+        validos = []
+        for row in df[['curp', 'no_control', 'paterno', 'materno', 'nombre', 'carrera']].itertuples():
+            try:
+                faltantes = [campo for campo in self.REQUIRED_FIELDS if getattr(row, campo) is None]
+                if faltantes:
+                    raise ValidationError(f'Faltan datos requeridos: {", ".join(faltantes)}')
+                Personal.validate_curp(row.curp)
+                Alumno.validate_nocontrol(row.no_control)
+                if row.carrera not in carreras:
+                    raise ValidationError(f'La carrera {row.carrera} no existe')
+                if row.carrera not in planes:
+                    raise ValidationError(f'La carrera {row.carrera} no tiene un plan de estudios')
+                if row.no_control in estado['alumnos']:
+                    raise ValidationError('El alumno aparece más de una vez en el archivo')
+
+                alumno = existentes['alumnos'].get(row.no_control)
+                if alumno is not None:
+                    if alumno.plan.carrera.clave != row.carrera:
+                        raise ValidationError('Carrera no coincide')
+                else:
+                    if row.curp not in existentes['personal'] and row.curp not in estado['personal']:
+                        # Misma regla que la restricción personal_paterno_o_materno
+                        if row.paterno is None and row.materno is None:
+                            raise ValidationError('Necesita por lo menos un apellido paterno o materno')
+                        objetos['personal'].append(
                             Personal(
-                                curp=row['curp'],
-                                paterno=row['paterno'],
-                                materno=row['materno'],
-                                nombre=row['nombre'],
-                                fecha_nacimiento=obtenerFechaNac(row['curp']),
-                                genero=obtenerGenero(row['curp'])
+                                curp=row.curp,
+                                paterno=row.paterno,
+                                materno=row.materno,
+                                nombre=row.nombre,
+                                fecha_nacimiento=obtenerFechaNac(row.curp),
+                                genero=obtenerGenero(row.curp)
                             )
                         )
+                        estado['personal'].add(row.curp)
+                    objetos['alumnos'].append(
+                        Alumno(
+                            no_control=row.no_control,
+                            curp_id=row.curp,
+                            plan=planes[row.carrera]
+                        )
+                    )
+                estado['alumnos'].add(row.no_control)
+                validos.append(row.Index)
 
-                        plan = planes.get(row['carrera'])
-                        alumnos_chunk.append(
-                            Alumno(
-                                no_control=row['no_control'],
-                                curp_id=row['curp'],
-                                plan=plan
+            except Exception as ex:
+                errores.append({
+                    'type': str(type(ex)),
+                    'message': ex.message if isinstance(ex, ValidationError) else str(ex),
+                    'row_index': row.Index
+                })
+        return validos
+
+    def to_long_dataframe(self, df, periodos):
+        """Convierte las columnas de periodo en un ingreso por fila (fila, no_control, periodo, tipo)"""
+        largo = df[['no_control'] + periodos].rename_axis('fila').reset_index().melt(
+            id_vars=['fila', 'no_control'],
+            var_name='periodo',
+            value_name='tipo'
+        ).dropna(subset=['tipo'])
+        largo['tipo'] = largo['tipo'].astype(str).str[0:2]
+        return largo.sort_values(['fila', 'periodo'], ignore_index=True)
+
+    def validate_ingresos(self, largo, existentes):
+        """
+        Calcula el número de semestre y aplica las reglas de Ingreso a todos los ingresos
+        del lote por columnas. Agrega la columna `error` con el mensaje de cada ingreso inválido
+        y elimina los que ya estaban registrados.
+        """
+        claves = pd.MultiIndex.from_arrays([largo['no_control'], largo['periodo'], largo['tipo']])
+        largo = largo[~claves.isin(list(existentes['ingresos']))].copy()
+        if largo.empty:
+            return largo.assign(num_semestre=None, error=None)
+
+        # Número de semestre: cada año son dos semestres. Se cuenta desde el primer ingreso
+        # registrado del alumno o, si no tiene, desde su primer periodo en el archivo
+        orden = largo['periodo'].str[0:4].astype(int) * 2 + (largo['periodo'].str[4] == '3').astype(int)
+        # Con tipos explícitos, porque sin ingresos registrados (la primera carga) el mapeo
+        # solo tiene valores vacíos y pandas lo dejaría como float
+        primeros = pd.DataFrame.from_dict(existentes['primeros'], orient='index', columns=['periodo', 'num_semestre'])
+        primer_periodo = largo['no_control'].map(primeros['periodo']).astype('string')
+        primer_orden = (primer_periodo.str[0:4].astype('Float64') * 2 + (primer_periodo.str[4] == '3').astype('Float64')).fillna(
+            orden.groupby(largo['no_control']).transform('min')
+        )
+        primer_num = largo['no_control'].map(primeros['num_semestre']).astype('Float64').fillna(1)
+        largo['num_semestre'] = (primer_num + orden - primer_orden).astype(int)
+
+        largo['error'] = None
+        def marcar(mascara, mensaje):
+            largo.loc[mascara & largo['error'].isna(), 'error'] = mensaje
+
+        marcar(~largo['tipo'].isin(Ingreso.TiposIngresos.values), 'Tipo de ingreso inválido')
+        marcar(
+            pd.MultiIndex.from_arrays([largo['no_control'], largo['periodo']]).isin(list(existentes['periodos'])),
+            'Ya existe un registro con este periodo para el alumno'
+        )
+        marcar((largo['num_semestre'] < 1) | (largo['num_semestre'] > 16), 'Número de semestre fuera de rango')
+        marcar(
+            pd.MultiIndex.from_arrays([largo['no_control'], largo['num_semestre']]).isin(list(existentes['semestres'])),
+            'Ya se tiene un ingreso con este número de semestre'
+        )
+        marcar(largo['no_control'].isin(existentes['egresados']), 'No se puede registrar un ingreso para un alumno egresado')
+
+        # Solo el primer ingreso exclusivo de cada alumno es válido si no tenía uno registrado
+        exclusivos = largo['tipo'].isin(Ingreso.TIPOS_EXCLUSIVOS) & largo['error'].isna()
+        previos = largo[exclusivos].groupby('no_control').cumcount()
+        repetidos = (previos > 0) | largo.loc[exclusivos, 'no_control'].isin(existentes['exclusivos'])
+        marcar(largo.index.isin(repetidos[repetidos].index), 'Solo puede existir un ingreso de EXAMEN, EQUIVALENCIA, TRASLADO o CONVALIDACION')
+
+        return largo
+
+    def procesar(self, file_obj, filename, progreso, opciones=None):
+        start_time = time.time()
+        results = {"errors": [], "created": 0}
+        # Los errores de filas se reportan con 200; un error que detiene la carga la marca con error
+        status = 200
+        dry_run = (opciones or {}).get('dry_run', False)
+        if dry_run:
+            results['dry_run'] = True
+        total_rows = 0
+
+        try:
+            with obtenerLector(file_obj, filename) as lector:
+                campos, periodos = classify_headers(lector.encabezados)
+                faltantes = [campo for campo in self.REQUIRED_FIELDS if campo not in campos]
+                if faltantes:
+                    raise Exception(f'Faltan las columnas: {", ".join(faltantes)}')
+                if not periodos:
+                    raise Exception('El archivo no tiene columnas de periodo')
+                # Los periodos se validan una sola vez por columna
+                for periodo, _ in periodos:
+                    Ingreso.validate_registro(periodo)
+                columnas_periodo = [periodo for periodo, _ in periodos]
+                self.validar_periodos_abiertos(*columnas_periodo)
+
+                carreras, planes = self.get_catalogos()
+                estado = {'alumnos': set(), 'personal': set()}
+                objetos = {'personal': [], 'alumnos': [], 'ingresos': []}
+
+                for lote in lector.lotes(self.CHUNK_SIZE):
+                    total_rows += len(lote)
+                    progreso.actualizar(leidas=len(lote))
+                    df = self.to_wide_dataframe(lote, campos, periodos)
+                    existentes = self.get_cached_data(df.dropna(subset=['curp', 'no_control']))
+
+                    errores = []
+                    validos = self.validate_alumnos(df, existentes, carreras, planes, estado, objetos, errores)
+                    largo = self.validate_ingresos(self.to_long_dataframe(df.loc[validos], columnas_periodo), existentes)
+
+                    for row in largo.itertuples():
+                        if row.error is not None:
+                            errores.append({
+                                'type': str(ValidationError),
+                                'message': row.error,
+                                'row_index': row.fila,
+                                'periodo': row.periodo
+                            })
+                        else:
+                            objetos['ingresos'].append(
+                                Ingreso(alumno_id=row.no_control, periodo=row.periodo, tipo=row.tipo, num_semestre=row.num_semestre)
                             )
-                        )
 
-                    # Tu lógica existente de creación de ingreso
-                    ingreso_key = (row['no_control'], row['periodo'], row['tipo'])
-                    if ingreso_key not in existing_ingresos:
-                        ingreso = Ingreso(
-                            alumno_id=row['no_control'],
-                            periodo=row['periodo'],
-                            tipo=row['tipo']
-                        )
-                        ingreso.calcular_num_semestre()
-                        ingreso.full_clean()
-                        ingresos_chunk.append(ingreso)
+                    # Los errores del lote se reportan en el orden del archivo
+                    errores.sort(key=lambda error: (error['row_index'], error.get('periodo', '')))
+                    results['errors'].extend(errores)
+                    progreso.actualizar(validadas=len(validos), errores=len(lote) - len(validos))
+
+            if dry_run:
+                results['created'] = len(objetos['personal']) + len(objetos['alumnos']) + len(objetos['ingresos'])
+            else:
+                # Las escrituras se realizan dentro de una sola transacción. Los conteos
+                # pasan al resultado solo si la transacción se confirma
+                try:
+                    creados = 0
+                    with transaction.atomic():
+                        creados += self.bulk_create_with_progress(Personal, objetos['personal'], progreso=progreso)
+                        creados += self.bulk_create_with_progress(Alumno, objetos['alumnos'], progreso=progreso)
+                        creados += self.bulk_create_with_progress(Ingreso, objetos['ingresos'], batch_size=500, progreso=progreso)
+                    results['created'] += creados
 
                 except Exception as ex:
+                    # La transacción se revirtió, la carga queda con error para poder reanudarla
+                    status = 500
                     results['errors'].append({
                         'type': str(type(ex)),
-                        'message': str(ex),
-                        'row_index': index + 2
+                        'message': 'Error en bulk create: ' + str(ex)
                     })
 
-            # Liberar memoria del chunk procesado
-            del chunk_data
-            gc.collect()
+            logger.info(
+                f"Historial procesado: {filename} "
+                f"Tiempo: {time.time() - start_time:.2f}s "
+                f"Alumnos: {total_rows} "
+                f"Creados: {results['created']}"
+            )
 
         except Exception as ex:
-            logger.error(f"Error en procesamiento de chunk: {str(ex)}")
-            raise
+            status = 400
+            results['errors'].append({
+                'type': str(type(ex)),
+                'message': 'Error en el procesamiento: ' + str(ex)
+            })
 
-        return personal_chunk, alumnos_chunk, ingresos_chunk
+        return status, results
 
 ### EGRESO
-class EgresoList(generics.ListCreateAPIView):
+class EgresoList(SparseFieldsMixin, RegistroBulkMixin, generics.ListCreateAPIView):
     queryset = Egreso.objects.all()
     serializer_class = EgresoSerializer
     permission_classes = [IsAuthenticated&IsAdminUserOrReadOnly]
+    pagination_class = KeysetPagination
+    filter_backends = [QueryParamFilter]
+    query_filters = FILTROS_REGISTRO
+
+    def validate_batch(self, batch):
+        super().validate_batch(batch)
+        alumnos = {egreso.alumno_id for _, egreso in batch.pending()}
+        consulta = Ingreso.objects.values('alumno').annotate(ultimo=Max('periodo')).values_list('alumno', 'ultimo')
+        ultimos_ingresos = dict(self.filter_in_batches(consulta, 'alumno', alumnos))
+        for index, egreso in batch.pending():
+            ultimo = ultimos_ingresos.get(egreso.alumno_id)
+            if ultimo is None or ultimo > egreso.periodo:
+                batch.add_error(index, 'El periodo de egreso debe ser igual o mayor al del último ingreso', 'periodo')
+        self.validar_unico_por_alumno(batch, self.registros_por_alumno(Egreso, batch), 'Solo puede existir un egreso por alumno')
 
 class EgresoDetail(generics.RetrieveUpdateDestroyAPIView):
     queryset = Egreso.objects.all()
     serializer_class = EgresoSerializer
     permission_classes = [IsAuthenticated&IsAdminUserOrReadOnly]
 
-# FORMATO DE EXCEL [NO_CONTROL, PERIODO]
-class EgresoUpload(views.APIView):
+# FORMATO DE ARCHIVO (EXCEL, CSV, PARQUET O ARROW) [NO_CONTROL, PERIODO]
+class EgresoUpload(CargaMixin, views.APIView):
     parser_classes = [FileUploadParser]
+    tipo_carga = Carga.Tipos.EGRESOS
     permission_classes = [IsAuthenticated&IsAdminUser]
 
     def validate_period(self, period):
@@ -435,97 +1045,171 @@ class EgresoUpload(views.APIView):
     def to_dict(self, row):
         """Valida y convierte una fila a diccionario"""
         # Validar fila vacía
-        if all(cell.value is None for cell in row):
+        if all(value is None for value in row):
             return None
 
-        if row[0].value is None:
+        if row[0] is None:
             raise Exception('Se necesita un no. de control')
 
         return {
-            'no_control': str(row[0].value).strip(),
+            'no_control': row[0],
         }
-    def post(self, request, filename, format=None):
+
+    def validar_lote(self, lote, periodo, results, estado):
+        """
+        Valida un lote sin escribir (dry-run) con las mismas reglas de Egreso.clean(),
+        usando los registros precargados de los alumnos del lote.
+        `estado` guarda los alumnos que ya tendrían egreso en esta carga.
+        """
+        no_controls = self.no_controls_lote(lote)
+        alumnos = set(self.prefetch_in_batches(Alumno.objects.values_list('no_control', flat=True), 'no_control', no_controls))
+        egresados = set(self.prefetch_in_batches(Egreso.objects.values_list('alumno_id', flat=True), 'alumno_id', no_controls))
+        ultimos_ingresos = {}
+        for alumno_id, periodo_ingreso in self.prefetch_in_batches(
+            Ingreso.objects.values_list('alumno_id', 'periodo'), 'alumno_id', no_controls
+        ):
+            if periodo_ingreso > ultimos_ingresos.get(alumno_id, ''):
+                ultimos_ingresos[alumno_id] = periodo_ingreso
+
+        for numero_fila, row in lote:
+            try:
+                data = self.to_dict(row)
+                if data is None:
+                    continue
+
+                no_control = data['no_control']
+                if no_control not in alumnos:
+                    results['errors'].append({
+                        'type': 'Alumno.DoesNotExist',
+                        'message': f'No se encontró alumno con no. control {no_control}',
+                        'row_index': numero_fila
+                    })
+                    continue
+
+                if no_control in egresados or no_control in estado:
+                    raise ValidationError('Solo puede existir un egreso por alumno')
+                ultimo_ingreso = ultimos_ingresos.get(no_control)
+                if ultimo_ingreso is None or ultimo_ingreso > periodo:
+                    raise ValidationError({'periodo': 'El periodo de egreso debe ser igual o mayor al del último ingreso'})
+
+                estado.add(no_control)
+                results['created'] += 1
+
+            except Exception as ex:
+                results['errors'].append({
+                    'type': str(type(ex)),
+                    'message': str(ex),
+                    'row_index': numero_fila
+                })
+
+    def procesar(self, file_obj, filename, progreso, opciones=None):
         try:
-            file_obj = request.data['file']
-            results = {"errors": [], "created": 0}
+            results = progreso.resultado_parcial or {"errors": [], "created": 0}
+            dry_run = (opciones or {}).get('dry_run', False)
+            if dry_run:
+                results['dry_run'] = True
             
             # Agregar logging
             logger.info(f"Procesando archivo de egreso: {filename}")
 
-            wb = openpyxl.load_workbook(file_obj, data_only=True)
-            ws = wb.active
-            
-            # Validar encabezados
-            header_row = ws['A1':'B1'][0]
-            periodo_raw = header_row[1].value
-
-            logger.info(f"Periodo raw: {periodo_raw}, tipo: {type(periodo_raw)}")
+            with obtenerLector(file_obj, filename, num_columnas=2) as lector:
+                # Validar encabezados
+                periodo_raw = lector.encabezados[1]
 
-            # Validar formato del periodo
-            periodo = self.validate_period(periodo_raw)
-            
-            logger.info(f"Periodo detectado: {periodo}")
+                logger.info(f"Periodo raw: {periodo_raw}, tipo: {type(periodo_raw)}")
 
-            # Procesar filas
-            for row in ws.iter_rows(min_row=2):
-                try:
-                    data = self.to_dict(row)
-                    if data is None:
-                        continue
+                # Validar formato del periodo
+                periodo = self.validate_period(periodo_raw)
 
-                    # Buscar alumno
-                    try:
-                        alumno = Alumno.objects.get(pk=data['no_control'])
-                        
-                        # Crear registro de egreso
-                        egresado = Egreso.objects.create(
-                            periodo=periodo,
-                            alumno=alumno
-                        )
-                        results['created'] += 1
-                        
-                        logger.info(f"Egreso creado: {alumno.no_control} - {periodo}")
-
-                    except Alumno.DoesNotExist:
-                        error_msg = f'No se encontró alumno con no. control {data["no_control"]}'
-                        logger.warning(error_msg)
-                        results['errors'].append({
-                            'type': 'Alumno.DoesNotExist',
-                            'message': error_msg,
-                            'row_index': row[0].row
-                        })
+                logger.info(f"Periodo detectado: {periodo}")
+                self.validar_periodos_abiertos(periodo)
+                progreso.registrar_periodo(periodo)
 
-                except Exception as ex:
-                    logger.error(f"Error procesando fila {row[0].row}: {str(ex)}")
-                    results['errors'].append({
-                        'type': str(type(ex)),
-                        'message': str(ex),
-                        'row_index': row[0].row
-                    })
+                # Procesar filas por lotes conforme se leen del archivo
+                estado = set()
+                for numero_lote, lote in enumerate(lector.lotes()):
+                    # Los lotes escritos en un intento anterior de la carga se omiten
+                    if numero_lote < progreso.lotes_confirmados:
+                        continue
+                    # Cada lote se escribe en una transacción junto con su punto de control
+                    with self.transaccion_lote(periodo):
+                        if dry_run:
+                            self.validar_lote(lote, periodo, results, estado)
+                        else:
+                            for numero_fila, row in lote:
+                                try:
+                                    data = self.to_dict(row)
+                                    if data is None:
+                                        continue
+
+                                    # Buscar alumno
+                                    try:
+                                        alumno = Alumno.objects.get(pk=data['no_control'])
+
+                                        # Crear registro de egreso, con su propio savepoint para que
+                                        # un error de la fila no invalide la transacción del lote
+                                        with transaction.atomic():
+                                            egresado = Egreso.objects.create(
+                                                periodo=periodo,
+                                                alumno=alumno
+                                            )
+                                        results['created'] += 1
+
+                                        logger.info(f"Egreso creado: {alumno.no_control} - {periodo}")
+
+                                    except Alumno.DoesNotExist:
+                                        error_msg = f'No se encontró alumno con no. control {data["no_control"]}'
+                                        logger.warning(error_msg)
+                                        results['errors'].append({
+                                            'type': 'Alumno.DoesNotExist',
+                                            'message': error_msg,
+                                            'row_index': numero_fila
+                                        })
+
+                                except Exception as ex:
+                                    logger.error(f"Error procesando fila {numero_fila}: {str(ex)}")
+                                    results['errors'].append({
+                                        'type': str(type(ex)),
+                                        'message': str(ex),
+                                        'row_index': numero_fila
+                                    })
+                        progreso.confirmar_lote(len(lote), results)
 
             logger.info(f"Proceso completado. Creados: {results['created']}, Errores: {len(results['errors'])}")
-            return Response(status=200, data=results)
+            return 200, results
 
         except Exception as e:
             logger.error(f"Error general: {str(e)}")
-            return Response(
-                status=400, 
-                data={'message': f'Error procesando archivo: {str(e)}'}
-            )
+            return 400, {'message': f'Error procesando archivo: {str(e)}'}
+
 ### TITULACION
-class TitulacionList(generics.ListCreateAPIView):
+class TitulacionList(SparseFieldsMixin, RegistroBulkMixin, generics.ListCreateAPIView):
     queryset = Titulacion.objects.all()
     serializer_class = TitulacionSerializer
     permission_classes = [IsAuthenticated&IsAdminUserOrReadOnly]
+    filter_backends = [QueryParamFilter]
+    query_filters = {**FILTROS_REGISTRO, 'tipo': 'tipo__in'}
+
+    def validate_batch(self, batch):
+        super().validate_batch(batch)
+        alumnos = {titulacion.alumno_id for _, titulacion in batch.pending()}
+        egresos = dict(self.filter_in_batches(Egreso.objects.values_list('alumno', 'periodo'), 'alumno', alumnos))
+        for index, titulacion in batch.pending():
+            if titulacion.alumno_id not in egresos:
+                batch.add_error(index, 'No se puede crear una titulacion sin un egreso existente')
+            elif egresos[titulacion.alumno_id] > titulacion.periodo:
+                batch.add_error(index, 'El periodo de titulación debe ser igual o mayor al de egreso', 'periodo')
+        self.validar_unico_por_alumno(batch, self.registros_por_alumno(Titulacion, batch), 'Solo puede existir una titulacion por alumno')
 
 class TitulacionDetail(generics.RetrieveUpdateDestroyAPIView):
     queryset = Titulacion.objects.all()
     serializer_class = TitulacionSerializer
     permission_classes = [IsAuthenticated&IsAdminUserOrReadOnly]
 
-# FORMATO DE EXCEL [NO_CONTROL, (PERIODO+TIPO)]
-class TitulacionUpload(views.APIView):
+# FORMATO DE ARCHIVO (EXCEL, CSV, PARQUET O ARROW) [NO_CONTROL, (PERIODO+TIPO)]
+class TitulacionUpload(CargaMixin, views.APIView):
     parser_classes = [FileUploadParser]
+    tipo_carga = Carga.Tipos.TITULACIONES
     permission_classes = [IsAuthenticated&IsAdminUser]
 
     def validate_period(self, period):
@@ -553,210 +1237,425 @@ class TitulacionUpload(views.APIView):
     def to_dict(self, row):
         """Valida y convierte una fila a diccionario"""
         # Validar fila vacía
-        if all(cell.value is None for cell in row):
+        if all(value is None for value in row):
             return None
 
-        if row[0].value is None:
+        if row[0] is None:
             raise Exception('Se necesita un no. de control')
             
-        if row[1].value is None:
+        if row[1] is None:
             raise Exception('Se necesita el tipo de titulación')
         
         logger.info(f"""
-            no_control: {row[0].value},
-            tipo_titulacion: {row[1].value}
+            no_control: {row[0]},
+            tipo_titulacion: {row[1]}
         """)
 
         return {
-            'no_control': str(row[0].value).strip(),
-            'tipo_titulacion': str(row[1].value).strip()  # Agregar tipo_titulacion
+            'no_control': row[0],
+            'tipo_titulacion': row[1]  # Agregar tipo_titulacion
         }
 
-    def post(self, request, filename, format=None):
+    def validar_lote(self, lote, periodo, results, estado):
+        """
+        Valida un lote sin escribir (dry-run) con las mismas reglas de get_or_create()
+        y Titulacion.clean(), usando los registros precargados de los alumnos del lote.
+        `estado` guarda la titulación (periodo, tipo) que se crearía para cada alumno en esta carga.
+        """
+        no_controls = self.no_controls_lote(lote)
+        alumnos = set(self.prefetch_in_batches(Alumno.objects.values_list('no_control', flat=True), 'no_control', no_controls))
+        egresos = dict(self.prefetch_in_batches(Egreso.objects.values_list('alumno_id', 'periodo'), 'alumno_id', no_controls))
+        titulaciones = {}
+        for alumno_id, periodo_titulacion, tipo in self.prefetch_in_batches(
+            Titulacion.objects.values_list('alumno_id', 'periodo', 'tipo'), 'alumno_id', no_controls
+        ):
+            titulaciones.setdefault(alumno_id, set()).add((periodo_titulacion, tipo))
+
+        for numero_fila, row in lote:
+            try:
+                data = self.to_dict(row)
+                if data is None:
+                    continue
+
+                no_control = data['no_control']
+                if no_control not in alumnos:
+                    results['errors'].append({
+                        'type': str(Alumno.DoesNotExist),
+                        'message': f'No se encontró un alumno con no. de control {no_control}',
+                        'row_index': numero_fila
+                    })
+                    continue
+
+                # get_or_create() no hace nada si la titulación ya existe
+                titulacion = (periodo, data['tipo_titulacion'])
+                if titulacion in titulaciones.get(no_control, ()) or estado.get(no_control) == titulacion:
+                    continue
+
+                if no_control in titulaciones or no_control in estado:
+                    raise ValidationError('Solo puede existir una titulacion por alumno')
+                if no_control not in egresos:
+                    raise ValidationError('No se puede crear una titulacion sin un egreso existente')
+                if egresos[no_control] > periodo:
+                    raise ValidationError({'periodo': 'El periodo de titulación debe ser igual o mayor al de egreso'})
+
+                estado[no_control] = titulacion
+                results['created'] += 1
+
+            except Exception as ex:
+                results['errors'].append({
+                    'type': str(type(ex)),
+                    'message': str(ex),
+                    'row_index': numero_fila
+                })
+
+    def procesar(self, file_obj, filename, progreso, opciones=None):
         ESTRUCTURA = [(r'^no_control$', 'NO_CONTROL'), (r'^[12][0-9]{3}[13]$', 'NUMERO DE PERIODO')]
-        file_obj = request.data['file']
-        results = {"errors": [], "created": 0}  # Mover esta línea al inicio
+        results = progreso.resultado_parcial or {"errors": [], "created": 0}  # Mover esta línea al inicio
+        dry_run = (opciones or {}).get('dry_run', False)
+        if dry_run:
+            results['dry_run'] = True
         
         logger.info(f"Procesando archivo de titulación: {filename}")
         
-        wb = openpyxl.load_workbook(file_obj, data_only=True)
-        ws = wb.active
+        try:
+            with obtenerLector(file_obj, filename, num_columnas=2) as lector:
+                # Validar encabezados
+                periodo_raw = lector.encabezados[1]
 
-        # Validar encabezados
-        header_row = ws['A1':'B1'][0]
-        periodo_raw = header_row[1].value
+                # Validar formato del periodo
+                periodo = self.validate_period(periodo_raw)
 
-        # Validar formato del periodo
-        periodo = self.validate_period(periodo_raw)
+                logger.info(f"Encabezados detectados: {lector.encabezados[0]} y {periodo}")
+                self.validar_periodos_abiertos(periodo)
+                progreso.registrar_periodo(periodo)
 
-        logger.info(f"Encabezados detectados: {header_row[0].value} y {periodo}")
-        
-        try:
-            for row in ws.iter_rows(min_row=2):
-                try:
-                    data = self.to_dict(row)
-                    if data is None:
+                estado = {}
+                for numero_lote, lote in enumerate(lector.lotes()):
+                    # Los lotes escritos en un intento anterior de la carga se omiten
+                    if numero_lote < progreso.lotes_confirmados:
                         continue
-                    
-                    alumno = Alumno.objects.get(pk=data['no_control'])
-                    titulacion, created = Titulacion.objects.get_or_create(
-                        periodo=periodo,  # Usar el periodo validado
-                        tipo=data['tipo_titulacion'], 
-                        alumno=alumno
-                    )
-                    if created:
-                        results['created'] += 1
-                        logger.info(f"Titulación creada: {alumno.no_control} - {periodo}")
-
-                except Alumno.DoesNotExist as ex:
-                    results['errors'].append({
-                        'type': str(type(ex)), 
-                        'message': f'No se encontró un alumno con no. de control {data["no_control"]}', 
-                        'row_index': row[0].row
-                    })
-                except Exception as ex:
-                    logger.error(f"Error procesando fila {row[0].row}: {str(ex)}")
-                    results['errors'].append({
-                        'type': str(type(ex)), 
-                        'message': str(ex), 
-                        'row_index': row[0].row
-                    })
+                    # Cada lote se escribe en una transacción junto con su punto de control
+                    with self.transaccion_lote(periodo):
+                        if dry_run:
+                            self.validar_lote(lote, periodo, results, estado)
+                        else:
+                            for numero_fila, row in lote:
+                                try:
+                                    data = self.to_dict(row)
+                                    if data is None:
+                                        continue
+
+                                    alumno = Alumno.objects.get(pk=data['no_control'])
+                                    titulacion, created = Titulacion.objects.get_or_create(
+                                        periodo=periodo,  # Usar el periodo validado
+                                        tipo=data['tipo_titulacion'], 
+                                        alumno=alumno
+                                    )
+                                    if created:
+                                        results['created'] += 1
+                                        logger.info(f"Titulación creada: {alumno.no_control} - {periodo}")
+
+                                except Alumno.DoesNotExist as ex:
+                                    results['errors'].append({
+                                        'type': str(type(ex)), 
+                                        'message': f'No se encontró un alumno con no. de control {data["no_control"]}', 
+                                        'row_index': numero_fila
+                                    })
+                                except Exception as ex:
+                                    logger.error(f"Error procesando fila {numero_fila}: {str(ex)}")
+                                    results['errors'].append({
+                                        'type': str(type(ex)), 
+                                        'message': str(ex), 
+                                        'row_index': numero_fila
+                                    })
+                        progreso.confirmar_lote(len(lote), results)
                     
             logger.info(f"Proceso completado. Creados: {results['created']}, Errores: {len(results['errors'])}")
-            return Response(status=200, data=results)
+            return 200, results
 
         except Exception as e:
             logger.error(f"Error general: {str(e)}")
-            return Response(
-                status=400, 
-                data={'message': f'Error procesando archivo: {str(e)}'}
-            )
+            return 400, {'message': f'Error procesando archivo: {str(e)}'}
+
 ### LIBERACION DE INGLES
-class LiberacionInglesList(generics.ListCreateAPIView):
+class LiberacionInglesList(SparseFieldsMixin, RegistroBulkMixin, generics.ListCreateAPIView):
     queryset = LiberacionIngles.objects.all()
     serializer_class = LiberacionInglesSerializer
     permission_classes = [IsAuthenticated&IsAdminUserOrReadOnly]
+    filter_backends = [QueryParamFilter]
+    query_filters = FILTROS_REGISTRO
+
+    def validate_batch(self, batch):
+        super().validate_batch(batch)
+        self.validar_unico_por_alumno(batch, self.registros_por_alumno(LiberacionIngles, batch), 'Solo puede existir una liberación de inglés por alumno')
 
 class LiberacionInglesDetail(generics.RetrieveUpdateDestroyAPIView):
     queryset = LiberacionIngles.objects.all()
     serializer_class = LiberacionInglesSerializer
     permission_classes = [IsAuthenticated&IsAdminUserOrReadOnly]
 
-# FORMATO DE EXCEL [NO_CONTROL, PERIODO]
-class LiberacionInglesUpload(views.APIView):
+# FORMATO DE ARCHIVO (EXCEL, CSV, PARQUET O ARROW) [NO_CONTROL, PERIODO]
+class LiberacionInglesUpload(CargaMixin, views.APIView):
     parser_classes = [FileUploadParser]
+    tipo_carga = Carga.Tipos.LIBERACIONES_INGLES
     permission_classes = [IsAuthenticated&IsAdminUser]
 
     def to_dict(self, row):
         # regresa None si el renglon son solo celdas vacias
-        for cell in row:
-            if cell.value is not None:
-                break
+        if all(value is None for value in row):
             return None
 
-        if row[0].value is None:
+        if row[0] is None:
             raise Exception('Se necesita un no. de control')
 
         data = {
-            'no_control': str(row[0].value).strip(),
+            'no_control': row[0],
         }
         return data
 
-    def post(self, request, filename, format=None):
+    def validar_lote(self, lote, periodo, results, estado):
+        """
+        Valida un lote sin escribir (dry-run) con las mismas reglas de get_or_create()
+        y LiberacionIngles.clean(), usando los registros precargados de los alumnos del lote.
+        `estado` guarda los alumnos que ya tendrían liberación en esta carga.
+        """
+        no_controls = self.no_controls_lote(lote)
+        alumnos = set(self.prefetch_in_batches(Alumno.objects.values_list('no_control', flat=True), 'no_control', no_controls))
+        liberaciones = dict(self.prefetch_in_batches(
+            LiberacionIngles.objects.values_list('alumno_id', 'periodo'), 'alumno_id', no_controls
+        ))
+
+        for numero_fila, row in lote:
+            try:
+                data = self.to_dict(row)
+                if data is None:
+                    continue
+
+                no_control = data['no_control']
+                if no_control not in alumnos:
+                    results['errors'].append({'type': str(Alumno.DoesNotExist), 'message': f'No se encontro un alumno con no. de control {no_control}', 'row_index': numero_fila})
+                    continue
+
+                # get_or_create() no hace nada si la liberación ya existe
+                if liberaciones.get(no_control) == periodo or no_control in estado:
+                    continue
+                if no_control in liberaciones:
+                    raise ValidationError('Solo puede existir una liberación de inglés por alumno')
+
+                estado.add(no_control)
+                results['created'] += 1
+            except Exception as ex:
+                results['errors'].append({'type': str(type(ex)), 'message': str(ex), 'row_index': numero_fila})
+
+    def procesar(self, file_obj, filename, progreso, opciones=None):
         ESTRUCTURA = [(r'^no_control$', 'NO_CONTROL'), (r'^[12][0-9]{3}[13]$', 'NUMERO DE PERIODO')]
-        # Obtiene el archivo enviado en la solicitud HTTP
-        file_obj = request.data['file']
+        dry_run = (opciones or {}).get('dry_run', False)
 
-        # Carga el archivo Excel en un objeto Workbook de openpyxl, 
-        # con data_only=True para obtener los valores calculados en lugar de las fórmulas
-        wb = openpyxl.load_workbook(file_obj, data_only=True)
+        try:
+            # Abre el archivo (Excel, CSV, Parquet o Arrow), las filas se leen conforme se procesan
+            # y se obtienen los valores calculados en lugar de las fórmulas
+            with obtenerLector(file_obj, filename, num_columnas=2) as lector:
+                results = progreso.resultado_parcial or {"errors": [], "created": 0}
+                if dry_run:
+                    results['dry_run'] = True
+                header_row = lector.encabezados
+
+                # VALIDAR ESTRUCTURA DEL ARCHIVO COMO:
+                # no_control | periodo
+                for i, expresion in enumerate(ESTRUCTURA):
+                    match = re.match(expresion[0], str(header_row[i]).lower())
+                    if match is None:
+                        return 400, {'message': f'Se esperaba el campo {expresion[1]} pero se obtuvo {header_row[i]}'}
+                try:
+                    self.validar_periodos_abiertos(header_row[1])
+                except Exception as ex:
+                    return 400, {'message': str(ex)}
+                progreso.registrar_periodo(header_row[1])
 
-        # Selecciona la hoja activa del archivo Excel
-        ws = wb.active
+                estado = set()
+                for numero_lote, lote in enumerate(lector.lotes()):
+                    # Los lotes escritos en un intento anterior de la carga se omiten
+                    if numero_lote < progreso.lotes_confirmados:
+                        continue
+                    # Cada lote se escribe en una transacción junto con su punto de control
+                    with self.transaccion_lote(header_row[1]):
+                        if dry_run:
+                            self.validar_lote(lote, header_row[1], results, estado)
+                        else:
+                            for numero_fila, row in lote:
+                                try:
+                                    data = self.to_dict(row)
+                                    if data is None:
+                                        continue
+                                    alumno = Alumno.objects.get(pk=data['no_control'])
+                                    liberacion, created = LiberacionIngles.objects.get_or_create(periodo=header_row[1], alumno=alumno)
+                                    if created:
+                                        results['created'] += 1
+                                except Alumno.DoesNotExist as ex:
+                                    results['errors'].append({'type': str(type(ex)), 'message': f'No se encontro un alumno con no. de control {data["no_control"]}', 'row_index': numero_fila})
+                                except Exception as ex:
+                                    results['errors'].append({'type': str(type(ex)), 'message': str(ex), 'row_index': numero_fila})
+                        progreso.confirmar_lote(len(lote), results)
+            return 200, results
 
-        results = {"errors": [], "created": 0}
-        header_row = ws['A1':'B1'][0] # ws['A1':'B1'] regresa una tupla de renglones, pero solo necesitamos la primera
+        except Exception as e:
+            logger.error(f"Error general: {str(e)}")
+            return 400, {'message': f'Error procesando archivo: {str(e)}'}
 
-        # VALIDAR ESTRUCTURA DEL ARCHIVO COMO:
-        # no_control | periodo
-        for i, expresion in enumerate(ESTRUCTURA):
-            match = re.match(expresion[0], str(header_row[i].value).lower())
-            if match is None:
-                return Response(status=400, data={'message': f'Se esperaba el campo {expresion[i]} pero se obtuvo {header_row[i].value}'})
+### CARGAS
+class CargaList(generics.ListAPIView):
+    queryset = Carga.objects.all()
+    serializer_class = CargaSerializer
+    permission_classes = [IsAuthenticated&IsAdminUser]
 
-        for row in ws.iter_rows(min_row=2):
-            try:
-                data = self.to_dict(row)
-                if data is None:
-                    continue
-                alumno = Alumno.objects.get(pk=data['no_control'])
-                liberacion, created = LiberacionIngles.objects.get_or_create(periodo=str(header_row[1].value), alumno=alumno)
-                if created:
-                    results['created'] += 1
-            except Alumno.DoesNotExist as ex:
-                results['errors'].append({'type': str(type(ex)), 'message': f'No se encontro un alumno con no. de control {data["no_control"]}', 'row_index': row[0].row})
-            except Exception as ex:
-                results['errors'].append({'type': str(type(ex)), 'message': str(ex), 'row_index': row[0].row})
-        return Response(status=200, data=results)
+class CargaDetail(generics.RetrieveAPIView):
+    queryset = Carga.objects.all()
+    serializer_class = CargaSerializer
+    permission_classes = [IsAuthenticated&IsAdminUser]
+
+class CargaReanudar(views.APIView):
+    """
+    Vuelve a encolar una carga que terminó con error o que quedó abandonada, por
+    ejemplo si el servidor se reinició mientras se procesaba (ver cargaAbandonada).
+    Continúa desde el último lote escrito.
+    """
+    permission_classes = [IsAuthenticated&IsAdminUser]
+
+    def post(self, request, pk, format=None):
+        carga = generics.get_object_or_404(Carga, pk=pk)
+        if carga.estado == Carga.Estados.COMPLETADA or not carga.archivo:
+            return Response(status=400, data={'message': 'La carga ya se completó'})
+
+        vistas = {
+            Carga.Tipos.INGRESOS: IngresoUpload,
+            Carga.Tipos.HISTORIAL: IngresoHistorialUpload,
+            Carga.Tipos.EGRESOS: EgresoUpload,
+            Carga.Tipos.TITULACIONES: TitulacionUpload,
+            Carga.Tipos.LIBERACIONES_INGLES: LiberacionInglesUpload,
+        }
+        # Solo se reanudan cargas con error o abandonadas, nunca una que otro worker procesa
+        if not reclamarCarga(carga):
+            return Response(status=409, data={'message': 'La carga se está procesando'})
+        encolarCarga(carga, vistas[carga.tipo])
+        return CargaMixin.respuesta_encolada(carga)
+
+class EventStreamRenderer(renderers.BaseRenderer):
+    media_type = 'text/event-stream'
+    format = 'txt'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, (str, bytes)):
+            return data
+        # Respuestas de error (autenticación, permisos) se envían como un evento
+        return f'event: error\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n'
+
+class CargaEventos(views.APIView):
+    """
+    Envía el progreso de una carga como server-sent events hasta que termina.
+
+    Cada evento contiene la carga serializada, se envía solo cuando cambia.
+    """
+    permission_classes = [IsAuthenticated&IsAdminUser]
+    renderer_classes = [EventStreamRenderer, renderers.JSONRenderer]
+    INTERVALO = 1.0
+
+    def eventos(self, pk):
+        anterior = None
+        while True:
+            carga = Carga.objects.filter(pk=pk).first()
+            if carga is None:
+                yield 'event: error\ndata: {"message": "La carga no existe"}\n\n'
+                return
+            data = json.dumps(CargaSerializer(carga).data, cls=DjangoJSONEncoder)
+            if data != anterior:
+                yield f'event: progreso\ndata: {data}\n\n'
+                anterior = data
+            if carga.terminada:
+                return
+            time.sleep(self.INTERVALO)
+
+    def get(self, request, pk, format=None):
+        response = StreamingHttpResponse(self.eventos(pk), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
 
 ### CORTE
 @api_view(['POST',])
 @permission_classes([IsAuthenticated&IsAdminUser])
 def corte(request):
     periodo = getPeriodoActual()
-    # Verificar si no existen registros que pertenezcan a un corte para el periodo actual
-    if not Ingreso.objects.contiene_corte(periodo) and not Egreso.objects.contiene_corte(periodo) and not Titulacion.objects.contiene_corte(periodo) and not LiberacionIngles.objects.contiene_corte(periodo):
-        # Realizar corte
-        ingresos = Ingreso.objects.realizar_corte(periodo)
-        egresos = Egreso.objects.realizar_corte(periodo)
-        titulaciones = Titulacion.objects.realizar_corte(periodo)
-        liberaciones = LiberacionIngles.objects.realizar_corte(periodo)
-        return Response(status=200, data={'periodo': periodo, 'updated': {'ingresos': ingresos, 'egresos': egresos, 'titulaciones': titulaciones, 'liberaciones-ingles': liberaciones}})
-    else:
+    # La bitácora de cortes indica si el periodo ya se cerró; su restricción única evita
+    # que dos solicitudes simultáneas realicen el mismo corte
+    try:
+        with transaction.atomic():
+            registro_corte = Corte.objects.create(periodo=periodo, usuario=request.user)
+            # Un UPDATE por tipo de registro, todos en la misma transacción
+            registro_corte.ingresos = Ingreso.objects.realizar_corte(periodo)
+            registro_corte.egresos = Egreso.objects.realizar_corte(periodo)
+            registro_corte.titulaciones = Titulacion.objects.realizar_corte(periodo)
+            registro_corte.liberaciones_ingles = LiberacionIngles.objects.realizar_corte(periodo)
+            registro_corte.save(update_fields=['ingresos', 'egresos', 'titulaciones', 'liberaciones_ingles'])
+    except IntegrityError:
         return Response(status=400, data={'periodo': periodo ,'message': f'No se puede realizar un corte ya que existen registros que pertenecen a un corte para el periodo {periodo}.'})
+    return Response(status=200, data={
+        'periodo': periodo,
+        'corte': registro_corte.pk,
+        'updated': {
+            'ingresos': registro_corte.ingresos,
+            'egresos': registro_corte.egresos,
+            'titulaciones': registro_corte.titulaciones,
+            'liberaciones-ingles': registro_corte.liberaciones_ingles
+        }
+    })
 
-# Esta función convierte una fila de Excel en un diccionario basado en los encabezados
-def row_to_dict(header_row, data_row):
-    # Limpia las filas eliminando celdas vacías
-    clean_header = clean_row(header_row)  # Limpia la fila de encabezados
-    clean_data = clean_row(data_row)      # Limpia la fila de datos
-    
-    # Lista de campos esperados en el archivo Excel
+class CorteList(generics.ListAPIView):
+    queryset = Corte.objects.all()
+    serializer_class = CorteSerializer
+    permission_classes = [IsAuthenticated&IsAdminUser]
+
+# Esta función clasifica los encabezados de un archivo con formato de historial
+# Regresa el índice de cada campo esperado y la lista de columnas de periodo como (periodo, índice)
+def classify_headers(header_row):
+    # Lista de campos esperados en el archivo
     keywords = ['curp', 'no_control', 'paterno', 'materno', 'nombre', 'carrera']
-    
-    # Inicializa el diccionario con una lista vacía para los periodos
-    row_dict = {'periodos': []}
-    
-    # Procesa cada celda en la fila de datos
-    for cell in clean_data:
-        # Obtiene el índice de la columna (restando 1 porque Excel empieza en 1)
-        index = cell.column - 1
+
+    campos = {}
+    periodos = []
+    for index, value in clean_row(header_row).items():
         # Convierte el encabezado a minúsculas
-        header = str(clean_header[index].value).lower()
-        # Obtiene el valor de la celda, si es None retorna None
-        value = str(cell.value) if cell.value else None
-        
+        header = str(value).lower()
         # Si el encabezado es uno de los campos esperados
         if header in keywords:
-            row_dict[header] = value
+            campos[header] = index
         # Si el encabezado es un periodo (formato: YYYYS donde Y=año, S=semestre)
         elif re.match(r'^[12][0-9]{3}[13]$', header):
-            # Si hay un valor, agrega una tupla (periodo, tipo) a la lista de periodos
-            if value: row_dict['periodos'].append((header, value[0:2]))
+            periodos.append((header, index))
         else:
             # Si el encabezado no es reconocido, lanza una excepción
             raise Exception(f'Campo "{header}" no es reconocido')
-    
+    return campos, periodos
+
+# Esta función convierte una fila del archivo en un diccionario basado en los encabezados
+def row_to_dict(header_row, data_row):
+    campos, periodos = classify_headers(header_row)
+    # Limpia la fila de datos eliminando celdas vacías
+    clean_data = clean_row(data_row)
+
+    # Inicializa el diccionario con los campos esperados
+    row_dict = {campo: clean_data.get(index) for campo, index in campos.items()}
+    # Si hay un valor en la columna de un periodo, agrega una tupla (periodo, tipo) a la lista de periodos
+    row_dict['periodos'] = [
+        (periodo, str(clean_data[index])[0:2])
+        for periodo, index in periodos
+        if index in clean_data
+    ]
+
     # Ordena los periodos cronológicamente
     row_dict['periodos'].sort(key=lambda x: x[0])
     return row_dict
 
-# Esta función limpia una fila de Excel eliminando las celdas vacías
+# Esta función limpia una fila eliminando las celdas vacías
+# Regresa un diccionario con el índice de cada columna con valor
 def clean_row(row):
-    clean = []
-    # Recorre cada celda en la fila
-    for cell in row:
-        # Si la celda tiene un valor, la agrega a la lista limpia
-        if cell.value is not None:
-            clean.append(cell)
-    return clean
\ No newline at end of file
+    return {index: value for index, value in enumerate(row) if value is not None}
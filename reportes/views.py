@@ -5,12 +5,15 @@ from django.db.models.functions import Coalesce
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import permissions
+from backend.authentication import ANALITICA_AUTHENTICATION_CLASSES
+from backend.conditional import ConditionalGetMixin
+from backend.routers import AnalyticsDatabaseMixin
 
 from registros.models import Ingreso, Egreso, Titulacion
 from planes.models import Plan
 from carreras.models import Carrera
 from registros.periodos import calcularPeriodos, getPeriodoActual
-from guardian.shortcuts import get_objects_for_user
+from carreras.permisos import carrerasPermitidas
 
 from decimal import Decimal
 from indices.views import obtenerPoblacionEgreso, obtenerPoblacionInactiva, obtenerPoblacionTitulada, obtenerPoblacionActiva, calcularTasa, calcularTipos
@@ -26,7 +29,8 @@ logging.basicConfig(
 )
 
 def get_carreras_permitidas(user):
-    return get_objects_for_user(user, 'ver_carrera', klass=Carrera)
+    # Claves de las carreras permitidas, del caché por usuario
+    return carrerasPermitidas(user)
 
 # Configurar el logger
 logger = logging.getLogger(__name__)
@@ -91,9 +95,10 @@ def obtenerPoblacionEgresoMultiple(tipos, cohorte, periodos, carrera_pk):
         total=Count('pk')
     ).order_by('periodo')  # Ordenar por periodo para acumulación correcta
 
-class ReportesBase(APIView):
+class ReportesBase(AnalyticsDatabaseMixin, ConditionalGetMixin, APIView):
     """Clase base para todos los reportes"""
     permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = ANALITICA_AUTHENTICATION_CLASSES
 
     def get_base_params(self, request):
         """Obtiene parámetros base comunes para todos los reportes"""
@@ -107,7 +112,7 @@ class ReportesBase(APIView):
     def get_base_data(self, request, params):
         """Obtiene datos base comunes para todos los reportes"""
         carreras_permitidas = get_carreras_permitidas(request.user)
-        todas_carreras = Carrera.objects.filter(pk__in=[c.pk for c in carreras_permitidas]).values('pk', 'nombre')
+        todas_carreras = Carrera.objects.filter(pk__in=carreras_permitidas).values('pk', 'nombre')
         carreras_dict = {carrera['pk']: {
             'clave': carrera['pk'],
             'nombre': carrera['nombre']
@@ -1,3 +1,141 @@
-from django.test import TestCase
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from unittest import mock
 
-# Create your tests here.
+import datetime
+
+from backend.metrics import registry
+from backend.routers import ANALYTICS_DB_ALIAS, AnalyticsRouter, analytics_reads, default_reads
+
+from carreras.models import Carrera
+from usuario.models import Usuario
+
+class ConditionalGetTests(TestCase):
+    URL = '/tablas/poblacion/?nuevo-ingreso=true&cohorte=20201&semestres=2'
+
+    def setUp(self):
+        Carrera.objects.create(clave='ISC', nombre='SISTEMAS')
+        admin = Usuario.objects.create(
+            username='admin', first_name='A', paternal_surname='B', email='a@a.com', is_staff=True, is_superuser=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def test_etag_cambia_con_los_datos(self):
+        respuesta = self.client.get(self.URL)
+        self.assertEqual(respuesta.status_code, 200)
+        etag = respuesta['ETag']
+        self.assertIn('Last-Modified', respuesta)
+
+        respuesta = self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(respuesta['ETag'], etag)
+
+        # Otros parámetros son otra respuesta
+        self.assertEqual(self.client.get(self.URL + '&semestres=3', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Carrera.objects.create(clave='IIA', nombre='INDUSTRIAL')
+        respuesta = self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+
+    @mock.patch('backend.conditional.ultimoCambioPermisos', return_value=None)
+    @mock.patch('backend.conditional.versionDatos', return_value=(1, datetime.datetime(2020, 3, 1, tzinfo=datetime.timezone.utc)))
+    def test_last_modified_cambia_con_el_periodo(self, version, permisos):
+        with mock.patch('backend.conditional.getPeriodoActual', return_value='20201'):
+            respuesta = self.client.get(self.URL)
+            modificado = respuesta['Last-Modified']
+            self.assertEqual(self.client.get(self.URL, HTTP_IF_MODIFIED_SINCE=modificado).status_code, 304)
+        # Sin escrituras nuevas, el cambio de periodo también cambia la respuesta
+        with mock.patch('backend.conditional.getPeriodoActual', return_value='20203'):
+            respuesta = self.client.get(self.URL, HTTP_IF_MODIFIED_SINCE=modificado)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['Last-Modified'], modificado)
+
+@mock.patch('backend.routers.analytics_enabled', return_value=True)
+class AnalyticsRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = AnalyticsRouter()
+
+    def test_lecturas_de_analitica_van_a_la_replica(self, enabled):
+        self.assertIsNone(self.router.db_for_read(Carrera))
+        with analytics_reads():
+            self.assertEqual(self.router.db_for_read(Carrera), ANALYTICS_DB_ALIAS)
+            with default_reads():
+                self.assertIsNone(self.router.db_for_read(Carrera))
+        enabled.return_value = False
+        with analytics_reads():
+            self.assertIsNone(self.router.db_for_read(Carrera))
+
+    def test_lecturas_despues_de_escribir_van_a_default(self, enabled):
+        with analytics_reads():
+            self.assertEqual(self.router.db_for_write(Carrera), DEFAULT_DB_ALIAS)
+            self.assertIsNone(self.router.db_for_read(Carrera))
+        # Cada solicitud empieza de nuevo
+        with analytics_reads():
+            self.assertEqual(self.router.db_for_read(Carrera), ANALYTICS_DB_ALIAS)
+
+    def test_lecturas_en_una_transaccion_van_a_default(self, enabled):
+        with analytics_reads(), mock.patch.object(connections[DEFAULT_DB_ALIAS], 'in_atomic_block', True):
+            self.assertIsNone(self.router.db_for_read(Carrera))
+
+    def test_la_replica_no_se_migra(self, enabled):
+        self.assertFalse(self.router.allow_migrate(ANALYTICS_DB_ALIAS, 'carreras'))
+        self.assertTrue(self.router.allow_migrate(DEFAULT_DB_ALIAS, 'carreras'))
+
+class MetricasTests(TestCase):
+    URL = ConditionalGetTests.URL
+
+    def setUp(self):
+        registry.clear()
+        self.addCleanup(registry.clear)
+        Carrera.objects.create(clave='ISC', nombre='SISTEMAS')
+        self.admin = Usuario.objects.create(
+            username='admin', first_name='A', paternal_surname='B', email='a@a.com', is_staff=True, is_superuser=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_consultas_por_ruta(self):
+        # La solicitud del cliente de pruebas reinicia connection.queries, se cuentan aparte
+        consultas = []
+
+        def contar(execute, sql, *args):
+            consultas.append(sql)
+            return execute(sql, *args)
+
+        with connections[DEFAULT_DB_ALIAS].execute_wrapper(contar):
+            self.assertEqual(self.client.get(self.URL).status_code, 200)
+        self.client.get('/alumnos/')
+        self.client.get('/alumnos/')
+
+        poblacion = registry.histograms['http_request_sql_queries'][('TablasPoblacion', 'GET')]
+        self.assertGreater(len(consultas), 0)
+        self.assertEqual((poblacion.count, poblacion.sum), (1, len(consultas)))
+        self.assertEqual(registry.histograms['http_request_sql_queries'][('AlumnoList', 'GET')].count, 2)
+        self.assertEqual(registry.requests[('AlumnoList', 'GET', '200')], 2)
+
+    def test_exporta_formato_prometheus_solo_a_administradores(self):
+        self.client.get(self.URL)
+        respuesta = self.client.get('/metricas/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta['Content-Type'].startswith('text/plain; version=0.0.4'))
+        texto = respuesta.content.decode()
+        self.assertIn('# TYPE http_request_sql_queries histogram', texto)
+        self.assertIn('http_requests_total{view="TablasPoblacion",method="GET",status="200"} 1', texto)
+        self.assertIn('http_request_duration_seconds_bucket{view="TablasPoblacion",method="GET",le="+Inf"} 1', texto)
+
+        usuario = Usuario.objects.create(username='consulta', first_name='A', paternal_surname='B', email='c@a.com')
+        self.client.force_authenticate(usuario)
+        self.assertEqual(self.client.get('/metricas/').status_code, 403)
+        self.client.force_authenticate(None)
+        self.assertIn(self.client.get('/metricas/').status_code, (401, 403))
+
+    def test_server_timing_solo_si_esta_activo(self):
+        with override_settings(METRICAS_SERVER_TIMING=False):
+            self.assertNotIn('Server-Timing', self.client.get(self.URL))
+        with override_settings(METRICAS_SERVER_TIMING=True):
+            respuesta = self.client.get(self.URL)
+        self.assertRegex(respuesta['Server-Timing'], r'^sql;desc="\d+ consultas";dur=[\d.]+, app;dur=[\d.]+, total;dur=[\d.]+$')
@@ -2,7 +2,10 @@ from django.db.models import Count, F, Q
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import permissions
-from guardian.shortcuts import get_objects_for_user
+from backend.authentication import ANALITICA_AUTHENTICATION_CLASSES
+from backend.conditional import ConditionalGetMixin
+from backend.routers import AnalyticsDatabaseMixin
+from carreras.permisos import carrerasPermitidas
 
 from registros.models import Ingreso
 from registros.periodos import calcularPeriodos, getPeriodoActual
@@ -13,9 +16,10 @@ import logging
 logger = logging.getLogger(__name__)
 
 def get_carreras_permitidas(user):
-    return get_objects_for_user(user, 'ver_carrera', klass=Carrera)
+    # Claves de las carreras permitidas, del caché por usuario
+    return carrerasPermitidas(user)
 
-class TablasPoblacion(APIView):
+class TablasPoblacion(AnalyticsDatabaseMixin, ConditionalGetMixin, APIView):
     """
     Vista para listar la cantidad de alumnos por carrera.
 
@@ -27,6 +31,7 @@ class TablasPoblacion(APIView):
     ** semestres: Cuantos semestres seran calculados desde el cohorte
     """
     permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = ANALITICA_AUTHENTICATION_CLASSES
 
     def get(self, request, format=None):
         try:
@@ -82,12 +87,13 @@ class TablasPoblacion(APIView):
                 ------------------------
             """)
 
+            # Obtener solo las carreras permitidas para el usuario, una vez para todos los periodos
+            carreras_permitidas = get_carreras_permitidas(request.user)
+            todas_carreras = list(Carrera.objects.filter(pk__in=carreras_permitidas).values('pk', 'nombre'))
+
             for periodo in periodos:
                 logger.info(f"Procesando período: {periodo}")
                 
-                # Obtener solo las carreras permitidas para el usuario
-                carreras_permitidas = get_carreras_permitidas(request.user)
-                todas_carreras = Carrera.objects.filter(pk__in=[c.pk for c in carreras_permitidas]).values('pk', 'nombre')
                 carreras_dict = {carrera['pk']: {
                     'clave': carrera['pk'],
                     'nombre': carrera['nombre'],
@@ -132,7 +138,7 @@ class TablasPoblacion(APIView):
             logger.error(f"Error en TablasPoblacion: {str(e)}")
             return Response({'error': str(e)}, status=500)
 
-class TablasCrecimiento(APIView):
+class TablasCrecimiento(AnalyticsDatabaseMixin, ConditionalGetMixin, APIView):
     """
     Vista para listar la cantidad de alumnos por carrera.
 
@@ -144,6 +150,7 @@ class TablasCrecimiento(APIView):
     ** semestres: Cuantos semestres seran calculados desde el cohorte
     """
     permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = ANALITICA_AUTHENTICATION_CLASSES
 
     def get(self, request, format=None):
         # Convertir explícitamente a booleano
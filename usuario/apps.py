@@ -1,6 +1,19 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_save, post_delete
 
 
 class UsuarioConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'usuario'
+
+    def ready(self):
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+        from backend.authentication import clear_revoked, revoke_deleted_user
+        from .models import Usuario
+
+        # Tokens revocados y usuarios inactivos de la autenticación de analítica
+        for nombre, senal in (('save', post_save), ('delete', post_delete)):
+            senal.connect(clear_revoked, sender=BlacklistedToken, dispatch_uid=f'jwt_revocados_token_{nombre}')
+            senal.connect(clear_revoked, sender=Usuario, dispatch_uid=f'jwt_revocados_usuario_{nombre}')
+        # Los usuarios eliminados ya no aparecen en la consulta de inactivos
+        post_delete.connect(revoke_deleted_user, sender=Usuario, dispatch_uid='jwt_revocados_usuario_eliminado')
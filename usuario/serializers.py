@@ -1,10 +1,14 @@
 from .models import Usuario
 from django.contrib.auth.password_validation import validate_password
 from django.utils.translation import gettext_lazy as _
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework import serializers
+from .tokens import TokenRefresco
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = TokenRefresco
+
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
@@ -20,6 +24,25 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
 
         return token
 
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = TokenRefresco
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        data = {}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+
+        # El token de acceso sale del token de refresco nuevo, el anterior ya está en la lista negra
+        data['access'] = str(refresh.access_token)
+        return data
+
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, style={'input_type': 'password'}, validators=[validate_password])
     password2 = serializers.CharField(write_only=True, required=True, style={'input_type': 'password'})
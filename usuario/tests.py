@@ -1,3 +1,42 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.models import TokenUser
 
-# Create your tests here.
+from backend.authentication import REVOKED_CACHE_KEY
+from carreras.permisos import carrerasPermitidas, invalidarPermisos
+from .models import Usuario
+from .tokens import TokenRefresco
+
+class UsuarioEliminadoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.usuario = Usuario.objects.create(username='coordinador', first_name='A', paternal_surname='B', email='c@a.com')
+        self.refresco = TokenRefresco.for_user(self.usuario)
+
+    def test_refrescar_token_de_usuario_eliminado(self):
+        refresco = str(self.refresco)
+        self.usuario.delete()
+        respuesta = APIClient().post('/usuario/token/refresh/', {'refresh': refresco}, format='json')
+        self.assertEqual(respuesta.status_code, 401)
+
+    def test_carreras_de_usuario_eliminado(self):
+        acceso = TokenUser(self.refresco.access_token)
+        self.usuario.delete()
+        # Sin claims vigentes las carreras se buscan en la base
+        invalidarPermisos()
+        self.assertEqual(carrerasPermitidas(acceso), frozenset())
+
+    @override_settings(ANALITICA_JWT_STATELESS=True)
+    def test_token_de_acceso_de_usuario_eliminado(self):
+        cliente = APIClient()
+        cliente.credentials(HTTP_AUTHORIZATION=f'Bearer {self.refresco.access_token}')
+        url = '/tablas/poblacion/?nuevo-ingreso=true&cohorte=20201&semestres=2'
+        self.assertNotEqual(cliente.get(url).status_code, 401)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.usuario.delete()
+        self.assertEqual(cliente.get(url).status_code, 401)
+        # La revocación sobrevive a que se reconstruya el conjunto
+        cache.delete(REVOKED_CACHE_KEY)
+        self.assertEqual(cliente.get(url).status_code, 401)
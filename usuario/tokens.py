@@ -0,0 +1,34 @@
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from carreras.permisos import agregarClaimsCarreras
+from .models import Usuario
+
+# jti del token de refresco del que salió un token de acceso, para revocarlo junto con él
+CLAIM_REFRESH_JTI = 'rjti'
+
+class TokenRefresco(RefreshToken):
+    """
+    Token de refresco cuyos tokens de acceso llevan las carreras permitidas del
+    usuario y el jti del token de refresco, que usa la autenticación sin estado de
+    las rutas de analítica (backend.authentication).
+    """
+    usuario = None
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token.usuario = user
+        return token
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        access[CLAIM_REFRESH_JTI] = self[api_settings.JTI_CLAIM]
+        usuario = self.usuario or Usuario.objects.filter(**{api_settings.USER_ID_FIELD: self[api_settings.USER_ID_CLAIM]}).first()
+        if usuario is None:
+            # El usuario se eliminó mientras el token de refresco seguía vigente
+            raise AuthenticationFailed('Usuario no encontrado', code='user_not_found')
+        agregarClaimsCarreras(access, usuario)
+        return access
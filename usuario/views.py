@@ -3,17 +3,20 @@ from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from backend.permissions import IsAdminUserOrReadOnly, IsOwnerOrReadOnly
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 from carreras.models import Carrera
 
-from .serializers import CustomTokenObtainPairSerializer, RegisterSerializer, UserSerializer, UserListSerializer
+from .serializers import CustomTokenObtainPairSerializer, CustomTokenRefreshSerializer, RegisterSerializer, UserSerializer, UserListSerializer
 from .models import Usuario
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
+class CustomTokenRefreshView(TokenRefreshView):
+    serializer_class = CustomTokenRefreshSerializer
+
 
 class RegisterView(generics.CreateAPIView):
     queryset = Usuario.objects.all()